@@ -1,130 +1,61 @@
 # app.py
-import os
-import re
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from datetime import datetime
-from datetime import datetime, timedelta
-import requests
 import streamlit as st
 from dotenv import load_dotenv
 
-from rag_qianfan import generate_answer
+from itinerary import extract_places, parse_days
+from metrics import profile_next, start_http_server
+from rag_qianfan import generate_answer_stream, last_timings, readiness, start_warmup
+from weather_client import get_weather_summary
 from trip_storage import (
     create_or_get_trip,
     add_item,
-    get_all_trips,
-    get_items,
+    count_trips,
+    get_trips_with_items,
     delete_item,
     update_note,
 )
 
 load_dotenv()
 
-# ---------- 工具函数 ----------
-
-
-def extract_places(text: str):
-    """
-    提取可能是景点/地点的英文短语：
-    - 至少两个单词
-    - 大写开头
-    - 排除 Day / Morning / Afternoon / Evening 等无关词
-    """
-    # 匹配类似 "Eiffel Tower", "Louvre Museum", "Notre Dame Cathedral"
-    pattern = r"\b([A-Z][a-z]+(?:\s+(?:of|the|and|de|la|du|des|[A-Z][a-z]+)){1,3})\b"
-    matches = re.findall(pattern, text)
-
-    stopwords = {"Day", "Morning", "Afternoon", "Evening", "注意事项"}
-    cleaned = []
-    for m in matches:
-        head = m.split()[0]
-        if head in stopwords:
-            continue
-        cleaned.append(m.strip())
-
-    return sorted(set(cleaned))
+# “我的收藏”每页展示的行程数
+TRIPS_PAGE_SIZE = 10
 
+# 天气最多等待的秒数（从点击开始计时），超时不阻塞行程展示，下次刷新时再补上
+WEATHER_TIMEOUT = 6.0
 
-def parse_days(answer: str):
-    """
-    解析模型输出中的 Day 1 / Day 2 / ... 段落。
-    返回: [{'day': 'Day 1 ｜ ...', 'text': '该天对应的全部文本'}, ...]
-    """
-    pattern = r"(Day\s*\d+[^\n]*)([\s\S]*?)(?=Day\s*\d+|$)"
-    matches = re.findall(pattern, answer, flags=re.IGNORECASE)
-    blocks = []
-    if matches:
-        for title, body in matches:
-            full = (title + "\n" + body).strip()
-            blocks.append({"day": title.strip(), "text": full})
-    else:
-        # 兜底：如果没匹配到，就把全文当成一个 Day 1
-        blocks.append({"day": "Day 1", "text": answer})
-    return blocks
-
-
-def get_weather_summary(city: str):
-    """
-    统一返回：从今天开始未来 7 天的天气概览
-    """
-    try:
-        today = datetime.today().date()
-        start_date = today.strftime("%Y-%m-%d")
-        end_date = (today + timedelta(days=6)).strftime("%Y-%m-%d")
-
-        geo_resp = requests.get(
-            "https://geocoding-api.open-meteo.com/v1/search",
-            params={"name": city, "count": 1, "language": "en", "format": "json"},
-            timeout=5,
-        )
-        geo_data = geo_resp.json()
-        if "results" not in geo_data or len(geo_data["results"]) == 0:
-            return "未能找到该城市的天气信息。"
-
-        lat = geo_data["results"][0]["latitude"]
-        lon = geo_data["results"][0]["longitude"]
-
-        weather_resp = requests.get(
-            "https://api.open-meteo.com/v1/forecast",
-            params={
-                "latitude": lat,
-                "longitude": lon,
-                "daily": "temperature_2m_max,temperature_2m_min,precipitation_probability_max",
-                "timezone": "auto",
-                "start_date": start_date,
-                "end_date": end_date,
-            },
-            timeout=5,
-        )
-        w = weather_resp.json()
-        if "daily" not in w:
-            return "天气接口暂无数据。"
-
-        daily = w["daily"]
-        lines = []
-        for date, tmax, tmin, rain in zip(
-            daily["time"],
-            daily["temperature_2m_max"],
-            daily["temperature_2m_min"],
-            daily["precipitation_probability_max"],
-        ):
-            lines.append(f"{date}: 最高 {tmax}°C / 最低 {tmin}°C，降水概率约 {rain}%")
+# ---------- 工具函数 ----------
 
-        return "未来 7 天天气概览：\n" + "\n".join(lines)
 
-    except Exception as e:
-        return f"获取天气失败：{e}"
+@st.cache_resource
+def get_executor():
+    """进程内共享的线程池（所有会话共用），用于把天气请求与检索/生成并行。"""
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="app-io")
 
 
 # ---------- Streamlit 配置 ----------
 st.set_page_config(page_title="AI 旅行助手", layout="wide")
 st.title("🌍 AI 旅行助手（基于真实游记 + 千帆大模型）")
 
+# 后台加载检索模型和向量库（每个进程只启动一次，所有会话共用），页面不用等它
+start_warmup()
+start_http_server()  # 设置了 RAG_METRICS_PORT 时提供 /metrics（Prometheus）与 /metrics.json
+_rag_status = readiness()
+if _rag_status["state"] == "loading":
+    st.caption("⏳ 检索模型加载中，第一次生成可能稍慢…")
+elif _rag_status["state"] == "error":
+    st.caption(f"⚠️ 检索模型预热失败，生成时会重新加载：{_rag_status['error']}")
+
 # 初始化 session_state
 for key, default in [
     ("answer", None),
     ("used_chunks", []),
     ("trip_meta", None),
     ("weather_info", None),
+    ("weather_future", None),
+    ("timings", {}),
 ]:
     if key not in st.session_state:
         st.session_state[key] = default
@@ -188,17 +119,33 @@ with tab1:
 补充说明：{user_free_text or "（用户未补充）"}
 """
 
-            with st.spinner("正在获取天气信息…"):
-                weather_info = get_weather_summary(dest_city)
+            # 天气请求在后台线程里跑，与检索 + 大模型生成同时进行
+            started = time.monotonic()
+            weather_future = get_executor().submit(get_weather_summary, dest_city)
 
-            with st.spinner("正在检索游记并生成建议…"):
-                answer, used_chunks = generate_answer(
-                    user_question, days=days, top_k=5, 
+            with st.spinner("正在检索游记…"):
+                tokens, used_chunks = generate_answer_stream(
+                    user_question, days=days, top_k=5, city=dest_city,
                 )
 
+            # 边生成边显示；生成完毕后清掉，由下方统一渲染（含按天解析 / 地点提取）
+            stream_box = st.empty()
+            with stream_box.container():
+                st.markdown("### ✨ 定制旅行建议（生成中…）")
+                answer = st.write_stream(tokens)
+            stream_box.empty()
+
+            remaining = WEATHER_TIMEOUT - (time.monotonic() - started)
+            try:
+                weather_info = weather_future.result(timeout=max(0.0, remaining))
+                weather_future = None
+            except FutureTimeout:
+                weather_info = None  # 继续在后台获取，展示时再取结果
+
             # 写入 session_state，避免刷新丢失
             st.session_state["answer"] = answer
             st.session_state["used_chunks"] = used_chunks
+            st.session_state["timings"] = last_timings()  # 流式输出读完后才完整
             st.session_state["trip_meta"] = {
                 "city": dest_city,
                 "start_date": start_str,
@@ -206,6 +153,7 @@ with tab1:
                 "days": days,
             }
             st.session_state["weather_info"] = weather_info
+            st.session_state["weather_future"] = weather_future
 
     # 如果 session_state 里已有结果，就展示
     if st.session_state["answer"]:
@@ -214,6 +162,16 @@ with tab1:
         trip_meta = st.session_state["trip_meta"]
         weather_info = st.session_state["weather_info"]
 
+        # 天气请求超时的话，这里看一眼后台任务是否已经完成
+        weather_future = st.session_state["weather_future"]
+        if weather_info is None and weather_future is not None:
+            if weather_future.done():
+                weather_info = weather_future.result()
+                st.session_state["weather_info"] = weather_info
+                st.session_state["weather_future"] = None
+            else:
+                weather_info = "天气信息仍在获取中，稍后刷新页面即可看到。"
+
         st.markdown("### ☁️ 天气概览")
         st.text(weather_info or "（暂无天气信息）")
 
@@ -246,12 +204,25 @@ with tab1:
                         st.success(f"已收藏 {p} 到 {day_label}")
 
         with st.expander("查看检索到的游记片段（调试用）"):
+            timings = st.session_state["timings"]
+            if timings:
+                st.caption(
+                    " · ".join(f"{k}={v:.0f}ms" for k, v in timings.items() if k.endswith("_ms"))
+                )
+            if st.button("剖析下一次生成（cProfile）", key="profile_next"):
+                profile_next("cprofile")
+                st.caption("下一次生成结束后，profile 写入 ./profiles/")
             for i, r in enumerate(used_chunks):
                 md = r.get("metadata", {}) or {}
                 url = md.get("url", "")
                 title = md.get("title") or md.get("file") or md.get("source", "")
-                score = r.get("score", 0.0)
-                st.markdown(f"**[{i+1}] {title}** — score: {score:.4f}")
+                # score 为稠密检索分数；混合检索时另有 RRF 融合分数，重排时另有交叉编码器分数
+                scores = [
+                    (label, r.get(key))
+                    for label, key in (("rerank", "rerank_score"), ("rrf", "rrf_score"), ("score", "score"))
+                ]
+                score_str = " / ".join(f"{label}: {v:.4f}" for label, v in scores if v is not None)
+                st.markdown(f"**[{i+1}] {title}** — {score_str}")
                 st.write(r.get("chunk", ""))
                 if url:
                     st.write("来源链接:", url)
@@ -260,22 +231,30 @@ with tab1:
 # ---------------- TAB 2：我的收藏 ----------------
 with tab2:
     st.header("⭐ 我的收藏行程")
-    trips = get_all_trips()
+    total_trips = count_trips()
 
-    if not trips:
+    if not total_trips:
         st.info("你还没有收藏任何地点，回到“规划行程”生成方案后可以收藏。")
     else:
-        for trip in trips:
+        pages = (total_trips + TRIPS_PAGE_SIZE - 1) // TRIPS_PAGE_SIZE
+        page = 1
+        if pages > 1:
+            page = st.number_input("页码", min_value=1, max_value=pages, value=1, step=1)
+
+        # 一次查询取回本页全部行程和收藏项，不再每个行程单独查一次
+        trips = get_trips_with_items(
+            limit=TRIPS_PAGE_SIZE, offset=(int(page) - 1) * TRIPS_PAGE_SIZE
+        )
+        for trip, items in trips:
             trip_id, city, start_date, end_date, title = trip
             st.subheader(f"🗂 {title} — {city}（{start_date} ~ {end_date}）")
 
-            items = get_items(trip_id)
             if not items:
                 st.write("（暂无收藏地点）")
             else:
                 for item in items:
-                    item_id, name, day, time, note = item
-                    st.markdown(f"**📍 {name}** — {day or ''} {time or ''}")
+                    item_id, name, day, item_time, note = item
+                    st.markdown(f"**📍 {name}** — {day or ''} {item_time or ''}")
 
                     new_note = st.text_input(
                         f"备注：{name}", value=note or "", key=f"note_{item_id}"
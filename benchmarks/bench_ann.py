@@ -0,0 +1,88 @@
+"""
+近似检索基准：各索引类型/查询参数下的 recall@k 与单查询延迟，以 Flat 为基准。
+
+向量来源：优先读取当前版本的 embeddings.npy（ingest 的产物），否则生成随机向量。
+用法（在项目根目录运行）：
+    python benchmarks/bench_ann.py --k 5 --queries 500
+    python benchmarks/bench_ann.py --synthetic 200000 --dim 384
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from store_generations import current_dir  # noqa: E402
+from vector_index import build_index, default_nlist, make_search_params  # noqa: E402
+
+EMB_PATH = os.path.join(current_dir("vector_store"), "embeddings.npy")
+
+
+def load_vectors(args):
+    if not args.synthetic and os.path.exists(EMB_PATH):
+        return np.load(EMB_PATH, mmap_mode="r")
+    n = args.synthetic or 50000
+    rng = np.random.default_rng(0)
+    # 带簇结构的随机向量，比纯高斯更接近真实分布
+    centers = rng.normal(size=(max(8, n // 500), args.dim)).astype(np.float32)
+    labels = rng.integers(0, len(centers), size=n)
+    return centers[labels] + 0.3 * rng.normal(size=(n, args.dim)).astype(np.float32)
+
+
+def run(index, queries, k, params):
+    t0 = time.perf_counter()
+    _, I = index.search(queries, k, params=params)
+    elapsed = time.perf_counter() - t0
+    return I, elapsed / len(queries) * 1000
+
+
+def recall_at_k(I, gt):
+    hits = sum(len(set(a) & set(b)) for a, b in zip(I, gt))
+    return hits / gt.size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--synthetic", type=int, default=0, help="使用 N 条随机向量")
+    parser.add_argument("--dim", type=int, default=384)
+    args = parser.parse_args()
+
+    xb = np.ascontiguousarray(load_vectors(args), dtype=np.float32)
+    n, dim = xb.shape
+    rng = np.random.default_rng(1)
+    qidx = rng.choice(n, size=min(args.queries, n), replace=False)
+    # 查询向量：库内向量加一点噪声，避免完全命中自身
+    xq = xb[qidx] + 0.05 * rng.normal(size=(len(qidx), dim)).astype(np.float32)
+    print(f"corpus={n} dim={dim} queries={len(xq)} k={args.k}")
+
+    configs = [
+        ("flat", {}, [{}]),
+        ("ivf_flat", {}, [{"nprobe": p} for p in (1, 4, 16, 64)]),
+        ("ivf_pq", {"pq_m": 16 if dim % 16 == 0 else 8}, [{"nprobe": p} for p in (4, 16, 64)]),
+        ("hnsw", {}, [{"ef_search": e} for e in (16, 64, 128)]),
+    ]
+
+    gt = None
+    print(f"{'index':<10} {'params':<18} {'build_s':>8} {'recall@k':>9} {'ms/query':>9}")
+    for kind, build_kwargs, query_settings in configs:
+        if kind.startswith("ivf"):
+            build_kwargs = {"nlist": default_nlist(n), **build_kwargs}
+        t0 = time.perf_counter()
+        index = build_index(xb, kind=kind, **build_kwargs)
+        build_s = time.perf_counter() - t0
+        for qs in query_settings:
+            params = make_search_params(index, **qs)
+            I, ms = run(index, xq, args.k, params)
+            if gt is None:
+                gt = I
+            label = ",".join(f"{k}={v}" for k, v in qs.items()) or "-"
+            print(f"{kind:<10} {label:<18} {build_s:>8.2f} {recall_at_k(I, gt):>9.3f} {ms:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+BM25 查询延迟基准：在现有向量库的 bm25/ 上跑一批查询，输出 p50 / p99 / max（毫秒）。
+不需要加载 embedding 模型；向量库还没有 bm25/ 时先按 docstore 补建。
+
+用法（在项目根目录运行）：
+    python benchmarks/bench_bm25.py
+    python benchmarks/bench_bm25.py --queries 2000 --k 50 --city paris
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from bm25 import BM25Index, tokenize, write_bm25  # noqa: E402
+from doc_store import DocStore  # noqa: E402
+from store_generations import current_dir  # noqa: E402
+
+VECTOR_DIR = "./vector_store"
+
+FIXED_QUERIES = [
+    "Sagrada Familia",
+    "Charles Bridge at sunrise",
+    "Schönbrunn palace gardens",
+    "best food near the Colosseum",
+    "cheap hostel in the city center",
+    "is the metro safe at night",
+]
+
+
+def sample_queries(store: DocStore, n: int, seed: int = 0) -> list[str]:
+    """固定的地名查询 + 从随机 chunk 里截取 2~6 个词。"""
+    rng = np.random.default_rng(seed)
+    queries = list(FIXED_QUERIES)
+    while len(queries) < n:
+        words = store.chunk(int(rng.integers(len(store)))).split()
+        if len(words) <= 6:
+            continue
+        start = int(rng.integers(len(words) - 6))
+        queries.append(" ".join(words[start : start + int(rng.integers(2, 7))]))
+    return queries[:n]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=50)
+    parser.add_argument("--city", help="只在该城市的 chunk 里检索（测试过滤开销）")
+    args = parser.parse_args()
+
+    store_dir = current_dir(VECTOR_DIR)
+    store = DocStore(os.path.join(store_dir, "docstore"))
+    bm25_dir = os.path.join(store_dir, "bm25")
+    if not os.path.exists(os.path.join(bm25_dir, "meta.json")):
+        t0 = time.perf_counter()
+        write_bm25(
+            bm25_dir,
+            [f"{store.value('title', i)}\n{store.chunk(i)}" for i in range(len(store))],
+        )
+        print(f"built bm25/ in {time.perf_counter() - t0:.2f}s")
+    index = BM25Index(bm25_dir)
+    print(f"docs={len(index)} terms={index.meta['terms']} postings={index.meta['postings']}")
+
+    allowed = None
+    if args.city:
+        allowed = store.positions(store.ids_by_value("city").get(args.city, []))
+        print(f"city={args.city}: {len(allowed)} chunks")
+
+    queries = sample_queries(store, args.queries)
+    index.search(queries[0], args.k, allowed=allowed)  # 预热 mmap
+
+    latencies = []
+    hits = 0
+    for q in queries:
+        t0 = time.perf_counter()
+        positions, _ = index.search(q, args.k, allowed=allowed)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        hits += len(positions) > 0
+    lat = np.array(latencies)
+    print(
+        f"queries={len(queries)} avg_terms={np.mean([len(tokenize(q)) for q in queries]):.1f} "
+        f"with_hits={hits}"
+    )
+    print(
+        f"p50={np.percentile(lat, 50):.3f}ms p99={np.percentile(lat, 99):.3f}ms max={lat.max():.3f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
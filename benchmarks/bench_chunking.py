@@ -0,0 +1,90 @@
+"""
+分块基准：对比旧的"按空格切 200 个词"与 chunker.TokenChunker（按模型 token 数 + 句子边界 + 去页面残留）。
+
+输出每种分块的 chunk 数、平均 token 数、超过模型上限被截断的 chunk 数/丢掉的 token 数、
+分块耗时，以及（--embed-docs > 0 时）对前 N 篇游记的分块结果做向量化的耗时。
+
+用法（在项目根目录运行）：
+    python benchmarks/bench_chunking.py
+    python benchmarks/bench_chunking.py --overlaps 0,32,64 --embed-docs 300
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+import ingest  # noqa: E402
+from chunker import TokenChunker  # noqa: E402
+
+
+def legacy_chunks(texts, max_words=200):
+    """改造前的 ingest.chunk_text：按空格切成 200 个词的窗口，不重叠。"""
+    out = []
+    for i, text in enumerate(texts):
+        words = str(text).split()
+        for start in range(0, len(words), max_words):
+            out.append((i, " ".join(words[start : start + max_words])))
+    return out
+
+
+def token_stats(tokenizer, chunks, limit):
+    lengths = np.array(
+        [len(ids) for ids in tokenizer([c for _, c in chunks], add_special_tokens=False)["input_ids"]]
+    )
+    over = lengths > limit
+    return lengths.mean() if len(lengths) else 0.0, int(over.sum()), int((lengths[over] - limit).sum())
+
+
+def embed_seconds(chunks, n_docs):
+    sample = [c for i, c in chunks if i < n_docs]
+    t0 = time.perf_counter()
+    ingest.vectorize_chunks(sample)
+    return time.perf_counter() - t0, len(sample)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--overlaps", default=f"0,{ingest.CHUNK_OVERLAP_TOKENS}")
+    parser.add_argument("--embed-docs", type=int, default=0, help="向量化前 N 篇游记的分块结果（0 表示跳过）")
+    args = parser.parse_args()
+
+    rows, _ = ingest.read_rows(ingest.load_all_csv())
+    texts = rows["text"]
+    embedder = ingest.get_embedder()
+    tokenizer = embedder.tokenizer
+    limit = embedder.max_seq_length - 2
+
+    runs = [("words=200", lambda: legacy_chunks(texts))]
+    for overlap in [int(x) for x in args.overlaps.split(",") if x]:
+        chunker = TokenChunker(tokenizer, max_tokens=limit, overlap=overlap)
+        runs.append((f"tokens ov={overlap}", lambda c=chunker: list(c.iter_chunks(texts))))
+
+    print(f"docs={len(texts)} model_limit={limit} tokens")
+    header = f"{'chunker':>14} {'chunks':>7} {'avg_tok':>8} {'truncated':>9} {'lost_tok':>9} {'chunk_s':>8}"
+    if args.embed_docs:
+        header += f" {'embed_n':>8} {'embed_s':>8}"
+    print(header)
+
+    base_chunks = None
+    for name, fn in runs:
+        t0 = time.perf_counter()
+        chunks = fn()
+        chunk_s = time.perf_counter() - t0
+        avg, truncated, lost = token_stats(tokenizer, chunks, limit)
+        line = f"{name:>14} {len(chunks):>7} {avg:>8.1f} {truncated:>9} {lost:>9} {chunk_s:>8.2f}"
+        if args.embed_docs:
+            seconds, n = embed_seconds(chunks, args.embed_docs)
+            line += f" {n:>8} {seconds:>8.2f}"
+        print(line)
+        if base_chunks is None:
+            base_chunks = len(chunks)
+        else:
+            print(f"{'':>14} chunk count vs words=200: {len(chunks) / base_chunks - 1:+.1%}")
+
+
+if __name__ == "__main__":
+    main()
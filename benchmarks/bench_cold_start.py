@@ -0,0 +1,89 @@
+"""
+冷启动基准：每种场景起一个新进程，测
+- import：import rag_qianfan（app 启动时要等的部分）的耗时，以及此时是否已经加载了 faiss / torch；
+- cold：不预热，第一个 / 第二个请求的 prepare_prompt 耗时（检索 + 重排，不调用大模型）；
+- warm：start_warmup() 后台预热完成后，第一个 / 第二个请求的耗时，以及预热各步耗时。
+
+用法（在项目根目录运行）：
+    python benchmarks/bench_cold_start.py
+    python benchmarks/bench_cold_start.py --repeat 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("faiss", "torch", "sentence_transformers")
+QUERIES = ["巴黎 浪漫 步行 美食", "布拉格 老城 夜景 预算不高"]
+
+
+def child(mode: str):
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    out = {}
+    t0 = time.perf_counter()
+    import rag_qianfan
+
+    out["import_s"] = time.perf_counter() - t0
+    out["heavy_loaded"] = [m for m in HEAVY if m in sys.modules]
+
+    if mode == "warm":
+        t0 = time.perf_counter()
+        rag_qianfan.start_warmup()
+        rag_qianfan.wait_ready()
+        out["warmup_s"] = time.perf_counter() - t0
+        out["readiness"] = rag_qianfan.readiness()
+    if mode in ("cold", "warm"):
+        for name, q in zip(("first_query_s", "second_query_s"), QUERIES):
+            t0 = time.perf_counter()
+            rag_qianfan.prepare_prompt(q, days=2)
+            out[name] = time.perf_counter() - t0
+    print(json.dumps(out, ensure_ascii=False))
+
+
+def spawn(mode: str) -> dict:
+    env = dict(os.environ)
+    env.pop("RAG_CACHE_PATH", None)  # 持久化缓存会让"冷"请求直接命中
+    env.setdefault("QIANFAN_API_KEY", "bench")  # 不调用大模型，只需要能 import
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", mode],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        sys.exit(f"{mode} run failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--child", choices=("import", "cold", "warm"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child)
+        return
+
+    print(f"{'mode':<7} {'import_s':>9} {'warmup_s':>9} {'first_s':>8} {'second_s':>9}  heavy modules after import")
+    for mode in ("import", "cold", "warm"):
+        for _ in range(args.repeat):
+            r = spawn(mode)
+            cols = [r.get(k) for k in ("import_s", "warmup_s", "first_query_s", "second_query_s")]
+            cells = " ".join(
+                f"{v:>{w}.2f}" if v is not None else f"{'-':>{w}}" for v, w in zip(cols, (9, 9, 8, 9))
+            )
+            print(f"{mode:<7} {cells}  {','.join(r['heavy_loaded']) or '(none)'}")
+            if mode == "warm":
+                steps = r["readiness"]["timings"]
+                print(
+                    "        warm-up steps: "
+                    + " ".join(f"{k}={v:.0f}ms" for k, v in steps.items() if v is not None)
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+CSV 加载基准：对比旧的 pd.read_csv + iterrows 逐行处理与 csv_loader 的列式加载。
+分块的耗时见 bench_chunking.py。
+
+用法（在项目根目录运行）：
+    python benchmarks/bench_csv_loading.py
+    python benchmarks/bench_csv_loading.py --repeat 5 --workers 1,4
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import csv_loader  # noqa: E402
+import ingest  # noqa: E402
+
+
+def legacy_read_rows(csv_files):
+    """改造前 ingest.read_rows 的做法：整表读入，iterrows 逐行构造 dict。"""
+    import pandas as pd
+
+    rows = []
+    for csv_path in csv_files:
+        df = pd.read_csv(csv_path)
+        title_col, url_col, text_col = csv_loader.resolve_columns(list(df.columns))
+        city = csv_loader.infer_city_from_path(csv_path)
+        source_type = csv_loader.infer_source_type(csv_path)
+        for i, row in df.iterrows():
+            raw_text = str(row.get(text_col, ""))
+            if not raw_text.strip():
+                continue
+            title = str(row.get(title_col, "")) if title_col else ""
+            url = str(row.get(url_col, "")) if url_col else ""
+            rows.append(
+                {
+                    "source": csv_path,
+                    "row": int(i),
+                    "title": title,
+                    "url": url,
+                    "city": city,
+                    "source_type": source_type,
+                    "text": raw_text,
+                    "hash": csv_loader.row_hash(title, url, raw_text),
+                }
+            )
+    return rows
+
+
+def run_legacy(csv_files):
+    return len(legacy_read_rows(csv_files))
+
+
+def run_loader(csv_files, workers):
+    rows, _ = csv_loader.load_csvs(csv_files, workers=workers)
+    return len(rows["text"])
+
+
+def timeit(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}")
+    args = parser.parse_args()
+
+    csv_files = ingest.load_all_csv()
+    print(f"pyarrow: {'yes' if csv_loader.HAS_PYARROW else 'no (pandas chunks)'}")
+
+    base, n_rows = timeit(lambda: run_legacy(csv_files), args.repeat)
+    print(f"{'loader':>16} {'rows':>7} {'seconds':>9} {'speedup':>8}")
+    print(f"{'iterrows':>16} {n_rows:>7} {base:>9.3f} {1.0:>7.1f}x")
+
+    for w in [int(x) for x in args.workers.split(",") if x]:
+        elapsed, n_rows = timeit(lambda: run_loader(csv_files, w), args.repeat)
+        print(f"{f'csv_loader w={w}':>16} {n_rows:>7} {elapsed:>9.3f} {base / elapsed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Embedding 后端基准：对比 embedders.EMBEDDERS 里各个模型/后端的
+- load_s：加载耗时；
+- q_p50_ms / q_p99_ms：单条查询编码延迟；
+- docs/s：批量编码 chunk 的吞吐（batch_size=64）；
+- agree@k：英文查询的 top-k 与第一个后端（基准，默认 minilm）的重合度；
+- zh~en@k：同一个后端里，中文问题与对应英文问题 top-k 的重合度（跨语言检索能力）。
+
+语料：vector_store/docstore 里的前 --n 个 chunk，没有向量库时从 CSV 按词数切块。
+加载失败的后端（例如没装 onnxruntime）会跳过并打印原因。
+
+用法（在项目根目录运行）：
+    python benchmarks/bench_embedders.py
+    python benchmarks/bench_embedders.py --backends minilm,minilm-onnx-int8 --n 5000 --k 10
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from embedders import EMBEDDERS, load_embedder  # noqa: E402
+from store_generations import current_dir  # noqa: E402
+
+DOCSTORE_DIR = os.path.join(current_dir("vector_store"), "docstore")
+
+# (英文, 中文) 成对的查询
+QUERY_PAIRS = [
+    ("romantic walk along the river at night", "晚上沿着河边浪漫散步"),
+    ("cheap local food markets", "便宜的本地美食市场"),
+    ("best museums for a rainy day", "下雨天适合去的博物馆"),
+    ("is public transport safe at night", "晚上坐公共交通安全吗"),
+    ("day trip to the countryside by train", "坐火车去郊区一日游"),
+    ("family friendly things to do with kids", "适合带小孩的亲子活动"),
+    ("nightlife and bars for young travellers", "适合年轻人的夜生活和酒吧"),
+    ("quiet neighbourhood to stay in", "适合住宿的安静街区"),
+    ("sunrise view over the old town", "老城区看日出的地方"),
+    ("how many days are enough to visit", "需要玩几天才够"),
+    ("tourist traps to avoid", "需要避开的游客陷阱"),
+    ("hidden gems away from the crowds", "人少的小众景点"),
+]
+
+
+def load_corpus(n: int) -> list[str]:
+    if os.path.exists(os.path.join(DOCSTORE_DIR, "meta.json")):
+        from doc_store import DocStore
+
+        store = DocStore(DOCSTORE_DIR)
+        return [store.chunk(i) for i in range(min(n, len(store)))]
+
+    import ingest
+    from chunker import TokenChunker
+
+    rows, _ = ingest.read_rows(ingest.load_all_csv())
+    chunker = TokenChunker(None, max_tokens=200, overlap=0)  # 不加载分词器，按词数切
+    out = []
+    for _, chunk in chunker.iter_chunks(rows["text"]):
+        out.append(chunk)
+        if len(out) >= n:
+            break
+    return out
+
+
+def encode(model, texts, batch_size=64) -> np.ndarray:
+    vecs = model.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+    vecs = np.asarray(vecs, dtype=np.float32)
+    return vecs / np.maximum(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12)
+
+
+def top_k(doc_vecs, q_vecs, k) -> list[set]:
+    scores = q_vecs @ doc_vecs.T
+    return [set(row) for row in np.argsort(-scores, axis=1)[:, :k]]
+
+
+def overlap(a: list[set], b: list[set]) -> float:
+    return float(np.mean([len(x & y) / max(1, len(y)) for x, y in zip(a, b)]))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", default=",".join(EMBEDDERS))
+    parser.add_argument("--n", type=int, default=2000, help="语料 chunk 数")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3, help="单条查询延迟的重复轮数")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.n)
+    en = [e for e, _ in QUERY_PAIRS]
+    zh = [z for _, z in QUERY_PAIRS]
+    print(f"corpus={len(corpus)} queries={len(QUERY_PAIRS)} pairs k={args.k}")
+    print(
+        f"{'backend':<18} {'load_s':>7} {'q_p50_ms':>9} {'q_p99_ms':>9} {'docs/s':>8} "
+        f"{'agree@k':>8} {'zh~en@k':>8}"
+    )
+
+    reference = None
+    for name in [b for b in args.backends.split(",") if b]:
+        t0 = time.perf_counter()
+        try:
+            model = load_embedder(name)
+        except Exception as e:
+            print(f"{name:<18} skipped: {type(e).__name__}: {str(e).splitlines()[0][:80]}")
+            continue
+        load_s = time.perf_counter() - t0
+        model.encode(["warm up"], show_progress_bar=False)
+
+        latencies = []
+        for _ in range(args.repeat):
+            for q in en + zh:
+                t0 = time.perf_counter()
+                model.encode(q, show_progress_bar=False)
+                latencies.append((time.perf_counter() - t0) * 1000)
+
+        t0 = time.perf_counter()
+        doc_vecs = encode(model, corpus)
+        docs_per_s = len(corpus) / (time.perf_counter() - t0)
+
+        hits_en = top_k(doc_vecs, encode(model, en), args.k)
+        hits_zh = top_k(doc_vecs, encode(model, zh), args.k)
+        if reference is None:
+            reference = hits_en
+        print(
+            f"{name:<18} {load_s:>7.2f} {np.percentile(latencies, 50):>9.2f} "
+            f"{np.percentile(latencies, 99):>9.2f} {docs_per_s:>8.0f} "
+            f"{overlap(hits_en, reference):>8.2f} {overlap(hits_zh, hits_en):>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
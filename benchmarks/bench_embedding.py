@@ -0,0 +1,63 @@
+"""
+向量化吞吐基准：对比不同 batch_size（以及可选的多进程）下的 chunks/sec。
+
+用法（在项目根目录运行）：
+    python benchmarks/bench_embedding.py --n 2000 --batch-sizes 1,16,32,64,128
+    python benchmarks/bench_embedding.py --n 20000 --workers 4
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ingest  # noqa: E402
+
+
+def sample_chunks(n: int) -> list[str]:
+    """优先用真实 CSV 的分块结果，不够时循环复用。"""
+    import pandas as pd
+
+    texts = []
+    for csv_path in ingest.load_all_csv():
+        df = pd.read_csv(csv_path)
+        for col in df.columns:
+            if col.lower() in ("content", "selftext"):
+                for t in df[col].dropna().astype(str):
+                    texts.extend(ingest.chunk_text(t))
+        if len(texts) >= n:
+            break
+    if not texts:
+        texts = ["Paris is a walkable city with great food and museums."]
+    return [texts[i % len(texts)] for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=2000, help="chunk 数量")
+    parser.add_argument("--batch-sizes", default="1,16,32,64,128")
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--memmap", action="store_true", help="写入临时 .npy memmap")
+    args = parser.parse_args()
+
+    chunks = sample_chunks(args.n)
+    ingest.get_embedder()  # 模型加载不计入耗时
+
+    print(f"{'batch':>6} {'workers':>7} {'seconds':>9} {'chunks/sec':>11}")
+    for bs in [int(x) for x in args.batch_sizes.split(",") if x]:
+        out_path = None
+        if args.memmap:
+            out_path = os.path.join(ingest.VECTOR_DIR, f"bench_embeddings_{bs}.npy")
+        t0 = time.perf_counter()
+        ingest.vectorize_chunks(
+            chunks, batch_size=bs, num_workers=args.workers, out_path=out_path
+        )
+        elapsed = time.perf_counter() - t0
+        print(f"{bs:>6} {args.workers:>7} {elapsed:>9.2f} {len(chunks) / elapsed:>11.1f}")
+        if out_path and os.path.exists(out_path):
+            os.remove(out_path)
+
+
+if __name__ == "__main__":
+    main()
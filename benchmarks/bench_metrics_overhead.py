@@ -0,0 +1,89 @@
+"""
+metrics 开销基准：
+- span：空 span 的单次开销（纳秒），分 RAG_METRICS=0 / 开启 / 开启且在 Trace 内三种情况，
+  与一次空循环对比；
+- search：同一批查询（每次清空检索缓存）在 metrics 关 / 开下的 rag_retrieval.search 每查询耗时，
+  差值即一次检索里几个 span 的实际开销。
+
+用法（在项目根目录运行）：
+    python benchmarks/bench_metrics_overhead.py
+    python benchmarks/bench_metrics_overhead.py --spans 200000 --queries 200 --repeat 3
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import metrics  # noqa: E402
+import rag_retrieval  # noqa: E402
+from bench_bm25 import sample_queries  # noqa: E402
+from doc_store import DocStore  # noqa: E402
+from store_generations import current_dir  # noqa: E402
+
+
+def span_ns(n: int, enabled: bool, in_trace: bool) -> float:
+    metrics.ENABLED = enabled
+    trace = metrics.Trace("bench", auto_finish=False) if in_trace else None
+    if trace is not None:
+        trace.__enter__()
+    t0 = time.perf_counter()
+    for _ in range(n):
+        with metrics.span("bench"):
+            pass
+    elapsed = time.perf_counter() - t0
+    if trace is not None:
+        trace.__exit__(None, None, None)
+    return elapsed / n * 1e9
+
+
+def loop_ns(n: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        pass
+    return (time.perf_counter() - t0) / n * 1e9
+
+
+def search_ms(queries, enabled: bool) -> float:
+    metrics.ENABLED = enabled
+    rag_retrieval.clear_caches()
+    t0 = time.perf_counter()
+    for q in queries:
+        rag_retrieval.search(q, top_k=5)
+    return (time.perf_counter() - t0) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--spans", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3, help="取最好的一次，减少抖动")
+    args = parser.parse_args()
+
+    print(f"{'case':<22} {'ns/span':>9}")
+    print(f"{'empty loop':<22} {min(loop_ns(args.spans) for _ in range(args.repeat)):>9.0f}")
+    for name, enabled, in_trace in (
+        ("span (disabled)", False, False),
+        ("span (enabled)", True, False),
+        ("span (in trace)", True, True),
+    ):
+        ns = min(span_ns(args.spans, enabled, in_trace) for _ in range(args.repeat))
+        print(f"{name:<22} {ns:>9.0f}")
+
+    store = DocStore(os.path.join(current_dir(rag_retrieval.VECTOR_DIR), "docstore"))
+    queries = sample_queries(store, args.queries, seed=11)
+    rag_retrieval.warm_up()
+    # 关 / 开交替跑，取各自最好的一次
+    runs = [(search_ms(queries, False), search_ms(queries, True)) for _ in range(args.repeat)]
+    off = min(r[0] for r in runs)
+    on = min(r[1] for r in runs)
+    print(f"\nsearch, {len(queries)} queries, caches cleared each run")
+    print(f"{'metrics':<8} {'ms/query':>9}")
+    print(f"{'off':<8} {off:>9.3f}")
+    print(f"{'on':<8} {on:>9.3f}  ({(on - off) / off * 100:+.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+交叉编码器重排基准：对一批查询先检索 --candidates 条，再在不同延迟预算下重排取 top-k。
+输出每个预算下 rerank 的 p50 / p99 耗时、退回检索顺序（预算用完）的比例，
+以及重排后的 top-k 与检索原 top-k 的重合度（越低说明重排改动越大）。
+
+每个预算之前清空分数缓存，测的是冷缓存耗时；--warm 时再跑一遍测缓存命中后的耗时。
+
+用法（在项目根目录运行）：
+    python benchmarks/bench_rerank.py
+    python benchmarks/bench_rerank.py --budgets 100,200,400,0 --candidates 50 --k 5 --warm
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+import rag_retrieval  # noqa: E402
+import reranker  # noqa: E402
+from bench_bm25 import FIXED_QUERIES  # noqa: E402
+
+EXTRA_QUERIES = [
+    "romantic walk along the river in the evening",
+    "where to eat local food on a budget",
+    "day trip from the city by train",
+    "museums worth visiting on a rainy day",
+    "quiet neighbourhood to stay with kids",
+    "nightlife and bars for young travellers",
+]
+
+
+def run(queries, pools, k, budget):
+    totals, fallbacks, overlaps = [], 0, []
+    for q, cands in zip(queries, pools):
+        results, info = reranker.rerank(q, cands, top_k=k, budget_ms=budget)
+        totals.append(info["total_ms"])
+        fallbacks += info["fallback"]
+        before = {c["chunk"] for c in cands[:k]}
+        overlaps.append(len(before & {r["chunk"] for r in results}) / max(1, len(before)))
+    return np.array(totals), fallbacks, float(np.mean(overlaps))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budgets", default=f"100,200,{reranker.RERANK_BUDGET_MS:g},100000")
+    parser.add_argument("--candidates", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--warm", action="store_true", help="再跑一遍缓存命中后的耗时")
+    args = parser.parse_args()
+
+    queries = FIXED_QUERIES + EXTRA_QUERIES
+    pools = rag_retrieval.search_batch(queries, top_k=args.candidates)
+    if reranker.get_cross_encoder() is None:
+        sys.exit("cross-encoder not available")
+    reranker.rerank("warm up", pools[0][:2], top_k=1, budget_ms=1e9)  # 首次前向的初始化不计入
+
+    print(f"model={reranker.RERANK_MODEL} queries={len(queries)} candidates={args.candidates} k={args.k}")
+    print(f"{'budget_ms':>10} {'cache':>6} {'p50_ms':>8} {'p99_ms':>8} {'fallback':>9} {'overlap@k':>10}")
+    for budget in [float(b) for b in args.budgets.split(",") if b]:
+        reranker._score_cache.clear()
+        passes = ["cold", "warm"] if args.warm else ["cold"]
+        for name in passes:
+            totals, fallbacks, overlap = run(queries, pools, args.k, budget)
+            print(
+                f"{budget:>10g} {name:>6} {np.percentile(totals, 50):>8.1f} "
+                f"{np.percentile(totals, 99):>8.1f} {fallbacks / len(queries):>9.0%} {overlap:>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
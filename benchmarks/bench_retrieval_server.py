@@ -0,0 +1,121 @@
+"""
+检索服务压测：N 个并发用户各发 M 条查询，对比
+- inproc：每个线程直接调用 rag_retrieval.search（现在 Streamlit 会话的做法）；
+- server：通过 RetrievalClient 发给 retrieval_server（子进程，micro-batching）。
+输出每种模式、每个并发数下的 p50 / p99 延迟（毫秒）与 QPS，server 模式另附平均批大小。
+
+每次运行用不重复的查询（从 docstore 随机截取），避免命中检索缓存。
+
+用法（在项目根目录运行）：
+    python benchmarks/bench_retrieval_server.py
+    python benchmarks/bench_retrieval_server.py --users 1,8,32 --requests 50 --max-wait-ms 5
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+import rag_retrieval  # noqa: E402
+from bench_bm25 import sample_queries  # noqa: E402
+from doc_store import DocStore  # noqa: E402
+from store_generations import current_dir  # noqa: E402
+from retrieval_client import RetrievalClient  # noqa: E402
+
+
+def load(fn, queries, users):
+    """users 个线程平分 queries，返回 (每条延迟 ms, 总耗时 s)。"""
+    per_user = [queries[i::users] for i in range(users)]
+
+    def worker(qs):
+        out = []
+        for q in qs:
+            t0 = time.perf_counter()
+            fn(q)
+            out.append((time.perf_counter() - t0) * 1000)
+        return out
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        latencies = [x for part in pool.map(worker, per_user) for x in part]
+    return np.array(latencies), time.perf_counter() - t0
+
+
+def start_server(args):
+    env = dict(os.environ)
+    env.pop("RAG_CACHE_PATH", None)
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.join(ROOT, "retrieval_server.py"),
+            "--port", str(args.port),
+            "--max-batch", str(args.max_batch),
+            "--max-wait-ms", str(args.max_wait_ms),
+        ],
+        cwd=ROOT,
+        env=env,
+    )
+    client = RetrievalClient(f"http://127.0.0.1:{args.port}")
+    deadline = time.monotonic() + 300
+    while True:
+        health = client.health()
+        if health["ready"]:
+            return proc, client
+        if health["state"] == "error" or proc.poll() is not None or time.monotonic() > deadline:
+            proc.terminate()
+            sys.exit(f"retrieval server failed to start: {health}")
+        time.sleep(0.5)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", default="1,4,16")
+    parser.add_argument("--requests", type=int, default=40, help="每个用户的查询数")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    levels = [int(u) for u in args.users.split(",") if u]
+    store = DocStore(os.path.join(current_dir(rag_retrieval.VECTOR_DIR), "docstore"))
+    n = sum(levels) * args.requests
+    pool = sample_queries(store, 2 * n, seed=7)  # 两种模式各用一半，互不重复
+
+    rag_retrieval.warm_up()
+    proc, client = start_server(args)
+    try:
+        print(f"top_k={args.top_k} requests/user={args.requests} max_batch={args.max_batch} max_wait={args.max_wait_ms}ms")
+        print(f"{'mode':<7} {'users':>5} {'p50_ms':>8} {'p99_ms':>8} {'qps':>8} {'avg_batch':>9}")
+        start = 0
+        for mode, fn in (
+            ("inproc", lambda q: rag_retrieval.search(q, top_k=args.top_k)),
+            ("server", lambda q: client.search(q, top_k=args.top_k)),
+        ):
+            for users in levels:
+                queries = pool[start : start + users * args.requests]
+                start += len(queries)
+                before = client.stats()["batching"] if mode == "server" else None
+                lat, elapsed = load(fn, queries, users)
+                batch = "-"
+                if before is not None:
+                    after = client.stats()["batching"]
+                    batches = after["batches"] - before["batches"]
+                    batch = f"{(after['requests'] - before['requests']) / max(1, batches):.1f}"
+                print(
+                    f"{mode:<7} {users:>5} {np.percentile(lat, 50):>8.2f} {np.percentile(lat, 99):>8.2f} "
+                    f"{len(queries) / elapsed:>8.1f} {batch:>9}"
+                )
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+trip_storage 并发写入基准：N 个线程（模拟 N 个 Streamlit 会话）同时收藏/改备注/读列表，
+对比旧的"每次操作 connect + commit + close"写法与当前的线程复用连接 + WAL。
+
+用法（在项目根目录运行，使用临时数据库，不会动 trips.db）：
+    python benchmarks/bench_trip_storage.py --writers 1,4,16 --ops 500
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+_tmpdir = tempfile.mkdtemp(prefix="bench_trips_")
+os.environ["TRIPS_DB_PATH"] = os.path.join(_tmpdir, "pooled.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import trip_storage  # noqa: E402
+
+
+# ---------- 旧写法（改造前的 trip_storage），作为基线 ----------
+class Legacy:
+    def __init__(self, path):
+        self.path = path
+        conn = sqlite3.connect(path)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS trips(id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "city TEXT, start_date TEXT, end_date TEXT, title TEXT)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS items(id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "trip_id INTEGER, name TEXT, day TEXT, time TEXT, note TEXT)"
+        )
+        conn.commit()
+        conn.close()
+
+    def _run(self, sql, args=(), fetch=False, commit=True):
+        conn = sqlite3.connect(self.path)
+        cur = conn.cursor()
+        cur.execute(sql, args)
+        out = cur.fetchall() if fetch else cur.lastrowid
+        if commit:
+            conn.commit()
+        conn.close()
+        return out
+
+    def create_or_get_trip(self, city, start, end):
+        rows = self._run(
+            "SELECT id FROM trips WHERE city=? AND start_date=? AND end_date=?",
+            (city, start, end), fetch=True, commit=False,
+        )
+        if rows:
+            return rows[0][0]
+        return self._run(
+            "INSERT INTO trips (city, start_date, end_date, title) VALUES (?, ?, ?, ?)",
+            (city, start, end, city),
+        )
+
+    def add_item(self, trip_id, name, day, t):
+        return self._run(
+            "INSERT INTO items (trip_id, name, day, time, note) VALUES (?, ?, ?, ?, ?)",
+            (trip_id, name, day, t, ""),
+        )
+
+    def update_note(self, item_id, note):
+        self._run("UPDATE items SET note=? WHERE id=?", (note, item_id))
+
+    def get_items(self, trip_id):
+        return self._run(
+            "SELECT id, name, day, time, note FROM items WHERE trip_id=?",
+            (trip_id,), fetch=True, commit=False,
+        )
+
+
+def session(api, wid, ops, errors):
+    """一次"会话"循环：取行程 -> 收藏 -> 改备注 -> 读列表，每轮 4 个操作。"""
+    try:
+        for i in range(ops // 4):
+            trip_id = api.create_or_get_trip(f"city{wid}", "2026-01-01", "2026-01-03")
+            api.add_item(trip_id, f"Place {i}", "Day 1", "")
+            items = api.get_items(trip_id)
+            api.update_note(items[-1][0], f"note {i}")
+    except sqlite3.OperationalError as e:
+        errors.append(str(e))
+
+
+def run(api, writers, ops):
+    errors = []
+    threads = [
+        threading.Thread(target=session, args=(api, w, ops, errors)) for w in range(writers)
+    ]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    return writers * (ops // 4) * 4 / elapsed, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", default="1,4,16")
+    parser.add_argument("--ops", type=int, default=400, help="每个会话的操作数")
+    args = parser.parse_args()
+
+    print(f"{'mode':<8} {'writers':>7} {'ops/sec':>10} {'errors':>7}")
+    for n in [int(x) for x in args.writers.split(",") if x]:
+        legacy = Legacy(os.path.join(_tmpdir, f"legacy_{n}.db"))
+        ops_s, errs = run(legacy, n, args.ops)
+        print(f"{'legacy':<8} {n:>7} {ops_s:>10.0f} {errs:>7}")
+
+        ops_s, errs = run(trip_storage, n, args.ops)
+        print(f"{'pooled':<8} {n:>7} {ops_s:>10.0f} {errs:>7}")
+
+
+if __name__ == "__main__":
+    main()
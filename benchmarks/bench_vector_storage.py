@@ -0,0 +1,99 @@
+"""
+向量存储格式基准：今天的 float32 + L2 对比归一化内积（cosine）+ fp16 / int8 标量量化，
+以及 int8 + 原始向量精确重排。输出索引内存（总量与每条向量字节数）、单查询延迟、
+recall@k（以 float32 cosine 精确检索为基准）。
+
+注意 all-MiniLM-L6-v2 输出本身已归一化，真实 embeddings.npy 上 l2 与 cosine 排序相同，
+区别在于 score 的含义；--synthetic 的随机向量未归一化，能看出两者的排序差异。
+
+用法（在项目根目录运行）：
+    python benchmarks/bench_vector_storage.py --k 5 --queries 500
+    python benchmarks/bench_vector_storage.py --synthetic 200000 --kind hnsw
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import faiss
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_ann import load_vectors, recall_at_k  # noqa: E402
+from vector_index import base_index, build_index, exact_scores, prepare_vectors  # noqa: E402
+
+
+def index_bytes(index) -> int:
+    """序列化后的大小，约等于常驻内存（不含 IDMap 的 id 映射）。"""
+    return faiss.serialize_index(base_index(index)).nbytes
+
+
+def run(index, xq, k, xb=None, factor=4):
+    """逐条查询计时；给出 xb 时多取 factor 倍候选，用原始向量重排后取前 k。"""
+    out = np.full((len(xq), k), -1, dtype=np.int64)
+    t0 = time.perf_counter()
+    for row, q in enumerate(prepare_vectors(index, xq)):
+        if xb is None:
+            _, I = index.search(q[None, :], k)
+            out[row] = I[0]
+            continue
+        _, I = index.search(q[None, :], k * factor)
+        cand = I[0][I[0] >= 0]
+        scores = exact_scores(index, q, xb[cand])
+        order = np.argsort(-scores if index.metric_type == faiss.METRIC_INNER_PRODUCT else scores)
+        out[row, : min(k, len(cand))] = cand[order[:k]]
+    return out, (time.perf_counter() - t0) / len(xq) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--synthetic", type=int, default=0, help="使用 N 条随机向量")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--kind", default="flat", help="索引类型：flat / ivf_flat / hnsw")
+    parser.add_argument("--factor", type=int, default=4, help="精确重排时多取的候选倍数")
+    args = parser.parse_args()
+
+    xb = np.ascontiguousarray(load_vectors(args), dtype=np.float32)
+    n, dim = xb.shape
+    rng = np.random.default_rng(1)
+    qidx = rng.choice(n, size=min(args.queries, n), replace=False)
+    xq = xb[qidx] + 0.05 * rng.normal(size=(len(qidx), dim)).astype(np.float32)
+    norms = np.linalg.norm(xb[: min(n, 10000)], axis=1)
+    print(
+        f"corpus={n} dim={dim} queries={len(xq)} k={args.k} kind={args.kind} "
+        f"norm={norms.mean():.3f}±{norms.std():.3f}"
+    )
+
+    configs = [
+        ("l2 float32 (today)", {"metric": "l2"}, False),
+        ("cosine float32", {"metric": "cosine"}, False),
+        ("cosine fp16", {"metric": "cosine", "sq": "fp16"}, False),
+        ("cosine int8", {"metric": "cosine", "sq": "int8"}, False),
+        ("cosine int8+rerank", {"metric": "cosine", "sq": "int8"}, True),
+    ]
+
+    # 基准：float32 cosine 精确检索
+    gt, _ = run(build_index(xb, kind="flat", metric="cosine"), xq, args.k)
+
+    print(f"{'format':<20} {'build_s':>8} {'MB':>8} {'B/vec':>7} {'recall@k':>9} {'ms/query':>9}")
+    built = {}
+    for label, params, rerank in configs:
+        key = tuple(sorted(params.items()))
+        t0 = time.perf_counter()
+        if key not in built:
+            built[key] = build_index(xb, kind=args.kind, **params)
+        index = built[key]
+        build_s = time.perf_counter() - t0
+        I, ms = run(index, xq, args.k, xb if rerank else None, args.factor)
+        size = index_bytes(index)
+        print(
+            f"{label:<20} {build_s:>8.2f} {size / 2**20:>8.1f} {size / n:>7.0f} "
+            f"{recall_at_k(I, gt):>9.3f} {ms:>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+"""
+微基准回归套件：覆盖 ingest 与检索的热路径，全部离线运行（合成语料 + 替身 embedding / 大模型，
+见 synthetic.py），结果写成 JSON，可以在两次提交之间对比。
+
+用例（名字里带规模，JSON 与对比都按名字对齐）：
+- chunk_text                 每篇合成游记的分块耗时
+- build_chunks               合成 CSV 的读取 + 分块 + 去重（打标签用替身）
+- vectorize_chunks           替身 embedding 下的向量化流水线开销
+- save_vector_store / load_vector_store
+- search[n=...]              不同语料规模下单条检索（稠密 / 混合），每轮清空检索缓存
+- build_context / parse_days / extract_places
+- trip_storage.*             收藏相关的增删改查（临时数据库）
+
+时间指标是每次操作的秒数：min / median / p95；重复执行同一操作的用例对比 min（最稳定），
+逐条查询各不相同的 search 用例对比 median（每项的 "stat" 字段）。
+
+用法（在项目根目录运行）：
+    python benchmarks/suite.py                              # 默认规模，结果写到 benchmarks/results/<commit>.json
+    python benchmarks/suite.py --quick                      # 小规模冒烟
+    python benchmarks/suite.py --sizes 10000,100000,1000000 --only search
+    python benchmarks/suite.py --compare benchmarks/results/<old>.json benchmarks/results/<new>.json
+"""
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stderr, redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 在 import 项目模块之前：临时数据库、不用持久化缓存、大模型 key 只是占位（不会发请求）
+_tmpdir = tempfile.mkdtemp(prefix="bench_suite_")
+os.environ["TRIPS_DB_PATH"] = os.path.join(_tmpdir, "trips.db")
+os.environ.pop("RAG_CACHE_PATH", None)
+os.environ.setdefault("QIANFAN_API_KEY", "offline-benchmark")
+
+import numpy as np  # noqa: E402
+
+import ingest  # noqa: E402
+import itinerary  # noqa: E402
+import rag_qianfan  # noqa: E402
+import rag_retrieval  # noqa: E402
+import synthetic  # noqa: E402
+import trip_storage  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+REGRESSION_THRESHOLD = 0.10  # 对比时 min 变慢超过 10% 记为回归
+
+
+# ---------- 计时 ----------
+def measure(fn, repeat: int, number: int = 1) -> dict:
+    """fn 跑 repeat 轮、每轮 number 次，返回每次操作的秒数统计。"""
+    fn()  # 预热一次（首次调用的 import / 缓存不计入）
+    per_op = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        per_op.append((time.perf_counter() - t0) / number)
+    per_op = np.array(per_op)
+    return {
+        "min_s": float(per_op.min()),
+        "median_s": float(np.median(per_op)),
+        "p95_s": float(np.percentile(per_op, 95)),
+        "repeat": repeat,
+        "number": number,
+        "stat": "min_s",
+    }
+
+
+def once(fn) -> dict:
+    """只能跑一次的操作（建库等）。"""
+    t0 = time.perf_counter()
+    fn()
+    s = time.perf_counter() - t0
+    return {"min_s": s, "median_s": s, "p95_s": s, "repeat": 1, "number": 1, "stat": "min_s"}
+
+
+def per_item(samples: list[float]) -> dict:
+    """逐条计时（检索每条查询各不相同）的统计；各条本身耗时不同，对比用 median。"""
+    a = np.array(samples)
+    return {
+        "min_s": float(a.min()),
+        "median_s": float(np.median(a)),
+        "p95_s": float(np.percentile(a, 95)),
+        "repeat": len(a),
+        "number": 1,
+        "stat": "median_s",
+    }
+
+
+# ---------- 向量库 ----------
+def use_vector_dir(path: str):
+    """让 ingest 的写入和 rag_retrieval 的读取都指向 path。"""
+    os.makedirs(path, exist_ok=True)
+    ingest.VECTOR_DIR = path
+
+
+def reload_vector_store(path: str):
+    rag_retrieval._snapshot = None
+    rag_retrieval.clear_caches()
+    return rag_retrieval.load_vector_store(path)
+
+
+def build_store(path: str, n: int, embedder, words: int, seed: int = 0):
+    chunks, metadata, word_ids = synthetic.generate_chunks(n, words=words, seed=seed)
+    use_vector_dir(path)
+    # 与 ingest 一样写成 embeddings.npy memmap：100 万条时向量不必常驻内存
+    out = np.lib.format.open_memmap(
+        os.path.join(path, "embeddings.npy"), mode="w+", dtype=np.float32, shape=(n, embedder.dim)
+    )
+    embeddings = embedder.embed_ids(word_ids, out=out)
+    del word_ids
+    ingest.save_vector_store(embeddings, metadata, chunks, index_kind="flat", index_params={})
+    return chunks
+
+
+def sample_queries(chunks: list[str], n: int, seed: int) -> list[str]:
+    """从语料里截取 4~8 个词当查询，去重后每条都不同（不命中检索缓存）。"""
+    rng = np.random.default_rng(seed)
+    out = {}
+    while len(out) < n:
+        words = chunks[int(rng.integers(0, len(chunks)))].split()
+        start = int(rng.integers(0, max(1, len(words) - 8)))
+        out[" ".join(words[start : start + int(rng.integers(4, 9))])] = None
+    return list(out)
+
+
+# ---------- 用例 ----------
+def bench_ingest(args, embedder, record):
+    docs = synthetic.generate_docs(args.docs, words_per_doc=args.doc_words, seed=1)
+    texts = [d["text"] for d in docs]
+    state = {"i": 0}
+
+    def chunk_one():
+        ingest.chunk_text(texts[state["i"] % len(texts)])
+        state["i"] += 1
+
+    n_chunks = sum(len(ingest.chunk_text(t)) for t in texts)
+    record("chunk_text", measure(chunk_one, args.repeat, number=len(texts)), docs=len(texts), chunks=n_chunks)
+
+    csv_dir = os.path.join(_tmpdir, "csv")
+    csv_files = synthetic.write_csv_tree(csv_dir, args.docs, words_per_doc=args.doc_words, seed=2)
+    out = {}
+
+    def build():
+        out["chunks"], out["metadata"], _ = ingest.build_chunks(csv_files, ingest.make_dedup())
+
+    record("build_chunks", measure(build, args.repeat), docs=args.docs, files=len(csv_files), chunks=len(out["chunks"]))
+
+    chunks = out["chunks"]
+    record(
+        "vectorize_chunks",
+        measure(lambda: ingest.vectorize_chunks(chunks), args.repeat),
+        chunks=len(chunks),
+        dim=embedder.dim,
+    )
+
+    store_dir = os.path.join(_tmpdir, "store_ingest")
+    embeddings = ingest.vectorize_chunks(chunks)
+
+    def save():
+        use_vector_dir(store_dir)
+        ingest.save_vector_store(embeddings, [dict(m) for m in out["metadata"]], chunks, index_kind="flat", index_params={})
+
+    record("save_vector_store", measure(save, args.repeat), chunks=len(chunks))
+    record("load_vector_store", measure(lambda: reload_vector_store(store_dir), args.repeat), chunks=len(chunks))
+
+
+def bench_search(args, embedder, record):
+    for n in args.sizes:
+        path = os.path.join(_tmpdir, f"store_{n}")
+        t0 = time.perf_counter()
+        chunks = build_store(path, n, embedder, words=args.chunk_words)
+        build_s = time.perf_counter() - t0
+        load = once(lambda: reload_vector_store(path))
+        record(f"load_vector_store[n={n}]", load, chunks=n)
+
+        queries = sample_queries(chunks, args.queries, seed=n)
+        del chunks
+        for hybrid in (False, True):
+            rag_retrieval.clear_caches()
+            rag_retrieval.search("warm up", top_k=5, hybrid=hybrid)  # 预热（不在 queries 里，免得之后命中缓存）
+            samples = []
+            for q in queries:
+                t = time.perf_counter()
+                rag_retrieval.search(q, top_k=5, hybrid=hybrid)
+                samples.append(time.perf_counter() - t)
+            name = f"search[n={n},{'hybrid' if hybrid else 'dense'}]"
+            record(name, per_item(samples), chunks=n, queries=len(queries), build_s=round(build_s, 2))
+        rag_retrieval._snapshot = None
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def bench_prompt(args, embedder, record):
+    retrieved = [
+        {"score": 0.5, "chunk": " ".join(["word"] * 300), "metadata": {"title": f"Trip {i}", "url": f"https://example.com/{i}"}}
+        for i in range(5)
+    ]
+    record("build_context", measure(lambda: rag_qianfan.build_context(retrieved), args.repeat, number=1000), chunks=5)
+
+    answers = [synthetic.fake_answer(days=d, seed=d) for d in range(1, 8)]
+    record(
+        "parse_days",
+        measure(lambda: [itinerary.parse_days(a) for a in answers], args.repeat, number=200),
+        answers=len(answers),
+    )
+    day_texts = [b["text"] for a in answers for b in itinerary.parse_days(a)]
+    record(
+        "extract_places",
+        measure(lambda: [itinerary.extract_places(t) for t in day_texts], args.repeat, number=200),
+        texts=len(day_texts),
+    )
+
+
+def bench_trips(args, embedder, record):
+    trip_storage.init_db()
+    n = args.trip_ops
+    cities = list(synthetic.CITIES)
+    state = {"i": 0}
+
+    def create():
+        i = state["i"] = state["i"] + 1
+        return trip_storage.create_or_get_trip(cities[i % len(cities)], f"2026-01-{i % 28 + 1:02d}", f"2026-02-{i % 28 + 1:02d}")
+
+    record("trip_storage.create_or_get_trip", measure(create, args.repeat, number=n), ops=n)
+    trip_id = trip_storage.create_or_get_trip("paris", "2026-05-01", "2026-05-03")
+    record(
+        "trip_storage.add_item",
+        measure(lambda: trip_storage.add_item(trip_id, "Eiffel Tower", "Day 1", ""), args.repeat, number=n),
+        ops=n,
+    )
+    items = [("Louvre Museum", "Day 2", "")] * 20
+    record("trip_storage.add_items[20]", measure(lambda: trip_storage.add_items(trip_id, items), args.repeat, number=n // 10 or 1))
+    record(
+        "trip_storage.get_trips_with_items",
+        measure(lambda: trip_storage.get_trips_with_items(limit=10), args.repeat, number=n // 10 or 1),
+        trips=trip_storage.count_trips(),
+    )
+    item_id = trip_storage.get_items(trip_id)[0][0]
+    record(
+        "trip_storage.update_note",
+        measure(lambda: trip_storage.update_note(item_id, "早点去"), args.repeat, number=n),
+        ops=n,
+    )
+    ids = iter([row[0] for row in trip_storage.get_items(trip_id)])
+    record("trip_storage.delete_item", measure(lambda: trip_storage.delete_item(next(ids)), args.repeat, number=n // 10 or 1))
+
+
+GROUPS = {
+    "ingest": bench_ingest,
+    "search": bench_search,
+    "prompt": bench_prompt,
+    "trips": bench_trips,
+}
+
+
+# ---------- 结果 ----------
+def git(*cmd) -> str:
+    try:
+        return subprocess.run(["git", *cmd], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def environment(args) -> dict:
+    import faiss
+
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "subject": git("log", "-1", "--format=%s"),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "faiss": getattr(faiss, "__version__", ""),
+        "args": {k: v for k, v in vars(args).items() if k not in ("compare", "out")},
+    }
+
+
+def compare(base_path: str, new_path: str, threshold: float) -> int:
+    """逐项对比两份结果（按各项的 stat，默认 min_s），打印比值；有回归时返回 1。"""
+    with open(base_path, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"base: {base['env']['commit'][:10]} {base['env']['subject']}")
+    print(f"new:  {new['env']['commit'][:10]} {new['env']['subject']}")
+    print(f"{'case':<44} {'base_ms':>10} {'new_ms':>10} {'ratio':>7}")
+    regressions = 0
+    for name in sorted(set(base["results"]) | set(new["results"])):
+        b, n = base["results"].get(name), new["results"].get(name)
+        stat = (n or b).get("stat", "min_s")
+        if b is None or n is None:
+            print(f"{name:<44} {'-' if b is None else format(b[stat] * 1000, '.3f'):>10} "
+                  f"{'-' if n is None else format(n[stat] * 1000, '.3f'):>10}")
+            continue
+        ratio = n[stat] / b[stat] if b[stat] else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            flag, regressions = "  REGRESSION", regressions + 1
+        elif ratio < 1 - threshold:
+            flag = "  faster"
+        print(f"{name:<44} {b[stat] * 1000:>10.3f} {n[stat] * 1000:>10.3f} {ratio:>7.2f}{flag}")
+    print(f"\n{regressions} regression(s) over {threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ingest / 检索热路径的微基准回归套件")
+    parser.add_argument("--only", default="*", help="只跑名字匹配的组，逗号分隔的通配符：ingest,search,prompt,trips")
+    parser.add_argument("--quick", action="store_true", help="小规模冒烟：少量文档、一个语料规模、repeat=3")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--docs", type=int, default=400, help="ingest 用例的合成游记篇数")
+    parser.add_argument("--doc-words", type=int, default=600)
+    parser.add_argument("--sizes", default="10000,100000", help="search 用例的语料规模（chunk 数），最大到 1000000")
+    parser.add_argument("--chunk-words", type=int, default=40, help="search 用例每个 chunk 的词数")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--trip-ops", type=int, default=200)
+    parser.add_argument("--out", help="结果 JSON 路径，默认 benchmarks/results/<commit>.json")
+    parser.add_argument("--compare", nargs="+", metavar="JSON", help="对比 BASE [NEW]；NEW 省略时先跑一遍当前代码")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    if args.compare and len(args.compare) == 2:
+        sys.exit(compare(args.compare[0], args.compare[1], args.threshold))
+    if args.quick:
+        args.repeat, args.docs, args.sizes, args.queries, args.trip_ops = 3, 80, "5000", 50, 50
+    args.sizes = [int(s) for s in str(args.sizes).split(",") if s]
+
+    embedder = synthetic.install(ingest=ingest, rag_retrieval=rag_retrieval, rag_qianfan=rag_qianfan)
+    patterns = args.only.split(",")
+    results = {}
+
+    console = sys.stdout
+
+    def record(name, stats, **extra):
+        stats.update(extra)
+        results[name] = stats
+        print(
+            f"{name:<44} min {stats['min_s'] * 1000:>10.3f} ms  median {stats['median_s'] * 1000:>10.3f} ms",
+            file=console,
+            flush=True,
+        )
+
+    # ingest / 建库会打印进度条和提示，只保留基准自己的输出
+    try:
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull), redirect_stderr(devnull):
+            for group, fn in GROUPS.items():
+                if any(fnmatch.fnmatch(group, p) for p in patterns):
+                    fn(args, embedder, record)
+    finally:
+        shutil.rmtree(_tmpdir, ignore_errors=True)
+
+    env = environment(args)
+    out = args.out or os.path.join(RESULTS_DIR, f"{env['commit'][:10] or 'nogit'}{'-dirty' if env['dirty'] else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"env": env, "results": results}, f, ensure_ascii=False, indent=2)
+    print(f"\nresults written to {out}")
+
+    if args.compare:
+        sys.exit(compare(args.compare[0], out, args.threshold))
+
+
+if __name__ == "__main__":
+    main()
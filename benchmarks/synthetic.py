@@ -0,0 +1,269 @@
+"""
+离线基准用的合成语料与替身后端（benchmarks/suite.py 使用，也可以单独生成一份 CSV 语料）：
+
+- generate_docs / write_csv_tree：像游记的合成文档，按 data/medium、data/reddit 的布局写 CSV；
+- generate_chunks：直接生成 chunk 文本 + metadata + 词下标，100 万条也只要几十秒，
+  embed_ids 用词下标向量化地算出与 StubEmbedder.encode 一致的向量，不必逐条编码；
+- StubEmbedder：哈希词袋 + 固定随机投影，接口与 SentenceTransformer 相同（tokenizer 为 None，
+  分块按空格计数），同一个词总是映射到同一个方向，查询与文档共享词时检索得到它们；
+- StubLLM：与 openai.OpenAI 同形的客户端，返回固定结构的多天行程（可流式）；
+- install()：把上面的替身装进 ingest / rag_retrieval / rag_qianfan，不访问网络、不加载模型。
+
+替身后端只用来测流水线自身的开销，向量化与生成的耗时不代表真实模型。
+
+用法（在项目根目录运行）：
+    python benchmarks/synthetic.py --out /tmp/synthetic_data --docs 2000
+"""
+import argparse
+import csv
+import os
+import sys
+import types
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from embedders import DEFAULT_EMBEDDER, embedder_spec  # noqa: E402
+
+CITIES = {
+    "paris": ["Eiffel Tower", "Louvre Museum", "Notre Dame Cathedral", "Montmartre Hill", "Canal Saint Martin"],
+    "rome": ["Colosseum Park", "Trevi Fountain", "Vatican Museums", "Spanish Steps", "Trastevere Market"],
+    "london": ["British Museum", "Tower Bridge", "Borough Market", "Hyde Park", "Camden Lock"],
+    "tokyo": ["Senso Temple", "Shibuya Crossing", "Tsukiji Outer Market", "Meiji Shrine", "Ueno Park"],
+    "kyoto": ["Fushimi Inari Shrine", "Arashiyama Bamboo Grove", "Nishiki Market", "Gion District", "Kiyomizu Temple"],
+    "budapest": ["Buda Castle", "Szechenyi Baths", "Fisherman Bastion", "Central Market Hall", "Margaret Island"],
+    "lisbon": ["Belem Tower", "Alfama District", "Time Out Market", "Jeronimos Monastery", "Sintra Palace"],
+    "berlin": ["Brandenburg Gate", "Museum Island", "East Side Gallery", "Tiergarten Park", "Mauer Park"],
+}
+VIBES = ["浪漫", "美食", "艺术", "历史", "小众", "夜生活", "亲子", "自然", "购物", "慢节奏", "咖啡", "建筑"]
+COMMON_WORDS = (
+    "the a and to of in we it was is for on with our at day walk food train museum street "
+    "morning evening night hotel cafe view old city river market local tour ticket crowd "
+    "early late lunch dinner breakfast bus metro station bridge park garden church square "
+    "beautiful quiet busy cheap expensive recommend favourite amazing stunning worth visit"
+).split()
+VOCAB_SIZE = 20_000  # 常用词之外补齐的合成词，按 Zipf 分布抽样
+ZIPF_A = 1.2
+STUB_BUCKETS = 1 << 16  # StubEmbedder 的哈希桶数
+
+
+def make_vocab(size: int = VOCAB_SIZE) -> list[str]:
+    extra = [f"w{i}" for i in range(max(0, size - len(COMMON_WORDS)))]
+    return COMMON_WORDS + extra
+
+
+def _zipf_ids(rng, n: int, vocab_size: int) -> np.ndarray:
+    ids = rng.zipf(ZIPF_A, size=n) - 1
+    return np.where(ids < vocab_size, ids, rng.integers(0, vocab_size, size=n))
+
+
+# ---------- 文档 / CSV ----------
+def generate_docs(n_docs: int, words_per_doc: int = 400, seed: int = 0) -> list[dict]:
+    """返回 [{"city", "source_type", "title", "url", "text"}]；正文由若干句子组成，夹带该城市的景点名。"""
+    rng = np.random.default_rng(seed)
+    vocab = np.array(make_vocab(), dtype=object)
+    cities = list(CITIES)
+    docs = []
+    for d in range(n_docs):
+        city = cities[d % len(cities)]
+        places = CITIES[city]
+        words = vocab[_zipf_ids(rng, words_per_doc, len(vocab))]
+        sentences, pos = [], 0
+        while pos < len(words):
+            length = int(rng.integers(8, 24))
+            sent = " ".join(words[pos : pos + length])
+            if rng.random() < 0.3:
+                sent += " near " + places[int(rng.integers(len(places)))]
+            sentences.append(sent[0].upper() + sent[1:] + ".")
+            pos += length
+        paragraphs = [" ".join(sentences[i : i + 5]) for i in range(0, len(sentences), 5)]
+        docs.append(
+            {
+                "city": city,
+                "source_type": "medium" if d % 3 else "reddit",
+                "title": f"{city.title()} trip report {d}",
+                "url": f"https://example.com/{city}/{d}",
+                "text": "\n\n".join(paragraphs),
+            }
+        )
+    return docs
+
+
+def write_csv_tree(root: str, n_docs: int, words_per_doc: int = 400, seed: int = 0) -> list[str]:
+    """
+    按 data/ 的布局写 CSV，每个 (城市, 来源) 一个文件：
+    medium/<city>_medium_posts.csv（content 列）、reddit/<city>_reddit_posts.csv（selftext 列）。
+    """
+    files = {}
+    for doc in generate_docs(n_docs, words_per_doc=words_per_doc, seed=seed):
+        files.setdefault((doc["source_type"], doc["city"]), []).append(doc)
+
+    paths = []
+    for (source, city), rows in sorted(files.items()):
+        os.makedirs(os.path.join(root, source), exist_ok=True)
+        path = os.path.join(root, source, f"{city}_{source}_posts.csv")
+        text_col = "content" if source == "medium" else "selftext"
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["title", text_col, "url"])
+            for doc in rows:
+                writer.writerow([doc["title"], doc["text"], doc["url"]])
+        paths.append(path)
+    return paths
+
+
+# ---------- chunk（大规模） ----------
+def generate_chunks(n: int, words: int = 40, seed: int = 0, block: int = 100_000):
+    """
+    直接生成 n 条 chunk：返回 (chunks, metadata, word_ids)。
+    word_ids 是 (n, words) 的词下标，配合 embed_ids 得到向量；metadata 字段与 ingest 的相同。
+    """
+    rng = np.random.default_rng(seed)
+    vocab = make_vocab()
+    cities = list(CITIES)
+    word_ids = np.empty((n, words), dtype=np.int32)
+    chunks, metadata = [], []
+    for start in range(0, n, block):
+        m = min(block, n - start)
+        ids = _zipf_ids(rng, m * words, len(vocab)).reshape(m, words)
+        word_ids[start : start + m] = ids
+        for row in ids:
+            chunks.append(" ".join([vocab[i] for i in row]))
+        vibe_idx = rng.integers(0, len(VIBES), size=(m, 2))
+        for j in range(m):
+            i = start + j
+            city = cities[i % len(cities)]
+            metadata.append(
+                {
+                    "source": f"synthetic/{city}.csv",
+                    "row": i // len(cities),
+                    "row_hash": "",
+                    "title": f"{city.title()} trip report {i // 4}",
+                    "url": f"https://example.com/{city}/{i // 4}",
+                    "city": city,
+                    "source_type": "medium" if i % 3 else "reddit",
+                    "vibes": sorted({VIBES[k] for k in vibe_idx[j]}),
+                }
+            )
+    return chunks, metadata, word_ids
+
+
+# ---------- 替身 embedding ----------
+class StubEmbedder:
+    """哈希词袋 + 固定随机投影：每个词的桶号是 crc32(词) % STUB_BUCKETS，向量是各桶行之和再归一化。"""
+
+    max_seq_length = 256
+    tokenizer = None  # TokenChunker 按空格计数
+
+    def __init__(self, dim: int | None = None, seed: int = 0):
+        self.dim = dim or embedder_spec(DEFAULT_EMBEDDER)["dim"]
+        self.table = np.random.default_rng(seed).standard_normal((STUB_BUCKETS, self.dim)).astype(np.float32)
+        self._vocab_buckets = np.array([self._bucket(w) for w in make_vocab()], dtype=np.int64)
+
+    @staticmethod
+    def _bucket(word: str) -> int:
+        return zlib.crc32(word.lower().encode("utf-8")) % STUB_BUCKETS
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, texts, batch_size: int = 32, convert_to_numpy: bool = True, show_progress_bar: bool = False, **kwargs):
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            buckets = [self._bucket(w) for w in str(text).split()]
+            if buckets:
+                out[i] = self.table[buckets].sum(axis=0)
+        out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+        return out[0] if single else out
+
+    def embed_ids(self, word_ids: np.ndarray, block: int = 20_000, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        generate_chunks 的词下标 -> 与 encode(chunk 文本) 相同的向量，按块计算控制内存；
+        out 可以是 .npy memmap（与 ingest 的 embeddings.npy 相同），大语料时不占常驻内存。
+        """
+        if out is None:
+            out = np.empty((len(word_ids), self.dim), dtype=np.float32)
+        for start in range(0, len(word_ids), block):
+            v = self.table[self._vocab_buckets[word_ids[start : start + block]]].sum(axis=1)
+            v /= np.maximum(np.linalg.norm(v, axis=1, keepdims=True), 1e-12)
+            out[start : start + block] = v
+        return out
+
+
+def stub_vibes(items: list[tuple[str, str]]) -> list[list[str]]:
+    """替代 ingest.extract_vibes_batch（大模型打标签）：按文本哈希确定地挑两个标签。"""
+    out = []
+    for text, _city in items:
+        h = zlib.crc32(text.encode("utf-8"))
+        out.append(sorted({VIBES[h % len(VIBES)], VIBES[(h >> 8) % len(VIBES)]}))
+    return out
+
+
+# ---------- 替身大模型 ----------
+def fake_answer(days: int = 3, seed: int = 0) -> str:
+    """与 rag_qianfan 的输出格式相同的行程文本（Day 1 ｜ ... / 上午 / 下午 / 晚上 / 注意事项 / 参考来源）。"""
+    rng = np.random.default_rng(seed)
+    city = list(CITIES)[seed % len(CITIES)]
+    places = CITIES[city]
+    lines = [f"{city.title()} 的 {days} 天行程节奏适中，兼顾美食、艺术与慢节奏的街头漫步。", ""]
+    for d in range(1, days + 1):
+        picks = rng.choice(len(places), size=3, replace=False)
+        lines += [
+            f"Day {d} ｜ 漫步 {places[picks[0]]} 周边",
+            f"  - 上午：参观 {places[picks[0]]}，早点到避开人流。",
+            f"  - 下午：步行前往 {places[picks[1]]}，在附近的 Old Town Cafe 午餐。",
+            f"  - 晚上：在 {places[picks[2]]} 看夜景。",
+            "",
+        ]
+    lines += ["注意事项", "  - 提前预订门票。", "  - 穿舒适的鞋。", "  - 注意天气变化。", "", "参考来源"]
+    lines += [f"  [{i}] 标题：{city.title()} trip report {i} 链接：https://example.com/{city}/{i}" for i in range(1, 4)]
+    return "\n".join(lines)
+
+
+class StubLLM:
+    """openai.OpenAI 的替身：chat.completions.create(...) 返回 fake_answer，stream=True 时按行流式返回。"""
+
+    def __init__(self, days: int = 3):
+        self.answer = fake_answer(days)
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self._create))
+
+    def _create(self, model=None, messages=None, stream=False, **kwargs):
+        usage = types.SimpleNamespace(prompt_tokens=sum(len(m["content"]) for m in messages or []), completion_tokens=len(self.answer))
+        if not stream:
+            message = types.SimpleNamespace(content=self.answer)
+            return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=usage)
+        parts = [line + "\n" for line in self.answer.split("\n")]
+        chunks = [
+            types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=p))], usage=None)
+            for p in parts
+        ]
+        return iter(chunks + [types.SimpleNamespace(choices=[], usage=usage)])
+
+
+def install(ingest=None, rag_retrieval=None, rag_qianfan=None, embedder: StubEmbedder | None = None):
+    """把替身装进给出的模块；返回使用的 StubEmbedder。"""
+    embedder = embedder or StubEmbedder()
+    if ingest is not None:
+        ingest._embedder = embedder
+        ingest._chunkers.clear()  # 按替身的 tokenizer / max_seq_length 重新建
+        ingest.extract_vibes_batch = stub_vibes
+    if rag_retrieval is not None:
+        rag_retrieval._embedder = embedder
+    if rag_qianfan is not None:
+        rag_qianfan.client = StubLLM()
+    return embedder
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成合成游记 CSV（data/ 布局）")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=400, help="每篇的词数")
+    args = parser.parse_args()
+    paths = write_csv_tree(args.out, args.docs, words_per_doc=args.words)
+    print(f"wrote {args.docs} docs into {len(paths)} CSV files under {args.out}")
@@ -0,0 +1,161 @@
+# bm25.py
+"""
+BM25 稀疏检索，补充 MiniLM 稠密检索对精确地名（"Sagrada Familia"、"Charles Bridge"）的召回。
+
+ingest 与 docstore 一起写到 VECTOR_DIR/bm25/，文档编号就是 docstore 的行号：
+    meta.json                       文档数、平均长度、k1 / b
+    terms.bin + terms.off.npy       词表（按字典序排好，查询时二分查找，不用建 dict）
+    offsets.npy                     每个词的倒排区间（CSR）
+    docs.npy / weights.npy          倒排表：文档行号 int32 + 预先算好的 BM25 分数 float32
+
+查询时只需把命中词的倒排按文档累加，没有任何逐文档的 Python 循环。
+"""
+import bisect
+import json
+import os
+import re
+import shutil
+import unicodedata
+
+import numpy as np
+
+from doc_store import StringHeap, replace_dir, write_strings
+
+K1 = 1.2
+B = 0.75
+
+# 拉丁字母/数字按词切，中文按单字切；去掉重音（Schönbrunn -> schonbrunn）
+_TOKEN = re.compile(r"[\u4e00-\u9fff]|[^\W_\u4e00-\u9fff]+")
+_ACCENTS = re.compile(r"[\u0300-\u036f]")
+STOPWORDS = frozenset(
+    """a an and are as at be been but by for from had has have he her his i if in into is it its
+    me my not of on or our she so than that the their them then there they this to was we were
+    what when which who will with you your""".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    text = str(text).lower()
+    if not text.isascii():
+        text = _ACCENTS.sub("", unicodedata.normalize("NFKD", text))
+    return [t for t in _TOKEN.findall(text) if t not in STOPWORDS]
+
+
+# ======================
+# 构建
+# ======================
+def write_bm25(path: str, docs, k1: float = K1, b: float = B):
+    """docs 与 docstore 行一一对应（一般是 标题 + chunk 正文），先写临时目录再替换。"""
+    vocab = {}
+    term_parts, doc_parts, tf_parts = [], [], []
+    lengths = np.zeros(len(docs), dtype=np.int32)
+    for pos, text in enumerate(docs):
+        tokens = tokenize(text)
+        lengths[pos] = len(tokens)
+        if not tokens:
+            continue
+        codes = np.fromiter((vocab.setdefault(t, len(vocab)) for t in tokens), dtype=np.int32)
+        terms, counts = np.unique(codes, return_counts=True)
+        term_parts.append(terms)
+        doc_parts.append(np.full(len(terms), pos, dtype=np.int32))
+        tf_parts.append(counts)
+
+    n = len(docs)
+    words = sorted(vocab)
+    # 词 id 按字典序重排，查询时可以直接在 terms 上二分
+    remap = np.empty(len(vocab), dtype=np.int32)
+    remap[[vocab[w] for w in words]] = np.arange(len(words), dtype=np.int32)
+
+    if term_parts:
+        terms = remap[np.concatenate(term_parts)]
+        docs_arr = np.concatenate(doc_parts)
+        tf = np.concatenate(tf_parts).astype(np.float32)
+    else:
+        terms = np.empty(0, dtype=np.int32)
+        docs_arr = np.empty(0, dtype=np.int32)
+        tf = np.empty(0, dtype=np.float32)
+
+    order = np.lexsort((docs_arr, terms))
+    terms, docs_arr, tf = terms[order], docs_arr[order], tf[order]
+    df = np.bincount(terms, minlength=len(words))
+    offsets = np.zeros(len(words) + 1, dtype=np.int64)
+    np.cumsum(df, out=offsets[1:])
+
+    avgdl = float(lengths.mean()) if n else 0.0
+    idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+    norm = k1 * (1 - b + b * lengths[docs_arr] / max(avgdl, 1e-9))
+    weights = (idf[terms] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+
+    tmp = path + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    write_strings(os.path.join(tmp, "terms"), words)
+    np.save(os.path.join(tmp, "offsets.npy"), offsets)
+    np.save(os.path.join(tmp, "docs.npy"), docs_arr)
+    np.save(os.path.join(tmp, "weights.npy"), weights)
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(
+            {"n": n, "avgdl": avgdl, "k1": k1, "b": b, "terms": len(words), "postings": len(docs_arr)},
+            f,
+        )
+    replace_dir(tmp, path)
+
+
+# ======================
+# 查询
+# ======================
+class BM25Index:
+    def __init__(self, path: str):
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.path = path
+        self.terms = StringHeap(os.path.join(path, "terms"))
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self.docs = np.load(os.path.join(path, "docs.npy"), mmap_mode="r")
+        self.weights = np.load(os.path.join(path, "weights.npy"), mmap_mode="r")
+
+    def __len__(self):
+        return int(self.meta["n"])
+
+    def term_id(self, term: str) -> int:
+        i = bisect.bisect_left(self.terms, term)
+        return i if i < len(self.terms) and self.terms[i] == term else -1
+
+    def search(self, query: str, k: int = 50, allowed: np.ndarray | None = None):
+        """
+        返回 (positions, scores)，按分数从高到低，最多 k 个、只含分数 > 0 的文档。
+        allowed：允许的 docstore 行号数组（过滤条件），None 表示不过滤。
+        """
+        spans = []
+        for term in set(tokenize(query)):
+            t = self.term_id(term)
+            if t >= 0:
+                spans.append((int(self.offsets[t]), int(self.offsets[t + 1])))
+        if not spans or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        docs = np.concatenate([self.docs[s:e] for s, e in spans])
+        weights = np.concatenate([self.weights[s:e] for s, e in spans])
+        if allowed is not None:
+            mask = np.zeros(len(self), dtype=bool)
+            mask[allowed] = True
+            hit = mask[docs]
+            docs, weights = docs[hit], weights[hit]
+            if len(docs) == 0:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        # 命中文档不多时按命中集合累加，否则直接在全量数组上 bincount
+        if len(docs) * 8 < len(self):
+            cand, inverse = np.unique(docs, return_inverse=True)
+            scores = np.bincount(inverse, weights=weights).astype(np.float32)
+        else:
+            scores = np.bincount(docs, weights=weights, minlength=len(self)).astype(np.float32)
+            cand = np.flatnonzero(scores > 0)
+            scores = scores[cand]
+
+        if len(cand) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            cand, scores = cand[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return cand[order].astype(np.int64), scores[order]
+
@@ -0,0 +1,342 @@
+# cache.py
+"""
+通用缓存：进程内 LRU + TTL，可选 SQLite 持久化（跨 Streamlit rerun / 跨进程共享）。
+rag_retrieval 用它缓存查询向量和检索结果，rag_qianfan 用它缓存大模型回答。
+
+    cache = make_cache(maxsize=1024, ttl=3600, persist_path="./vector_store/query_cache.sqlite")
+    cache.set(key, value)
+    cache.get(key)          # 未命中/过期返回 None
+    cache.stats()           # {"hits": .., "misses": .., "evictions": .., "expirations": .., "size": ..}
+"""
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_key(*parts) -> str:
+    """把任意可 repr 的参数组合成稳定的 sha256 key。"""
+    raw = "\x1f".join(repr(p) for p in parts)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class _Stats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def as_dict(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class LRUCache:
+    """线程安全的进程内 LRU 缓存，每个条目带过期时间；ttl=None 表示不过期。"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._stats = _Stats()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self._stats.misses += 1
+                return default
+            expires_at, value = item
+            if expires_at is not None and expires_at < time.time():
+                del self._data[key]
+                self._stats.expirations += 1
+                self._stats.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self._stats.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float | None = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._stats.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats.as_dict(), "size": len(self._data)}
+
+
+class SQLiteCache:
+    """
+    SQLite 持久化缓存，值用 pickle 序列化；多个进程可以共用同一个文件。
+    超过 maxsize 时按最近访问时间淘汰（每 evict_every 次写入检查一次，摊薄开销）。
+    """
+
+    def __init__(
+        self,
+        path: str,
+        maxsize: int = 10000,
+        ttl: float | None = None,
+        evict_every: int = 64,
+    ):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.evict_every = evict_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._stats = _Stats()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache("
+            "key TEXT PRIMARY KEY, value BLOB, expires_at REAL, accessed_at REAL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS cache_accessed ON cache(accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key=?", (key,)
+            ).fetchone()
+            if row is None:
+                self._stats.misses += 1
+                return default
+            value, expires_at = row
+            if expires_at is not None and expires_at < now:
+                self._conn.execute("DELETE FROM cache WHERE key=?", (key,))
+                self._conn.commit()
+                self._stats.expirations += 1
+                self._stats.misses += 1
+                return default
+            self._conn.execute("UPDATE cache SET accessed_at=? WHERE key=?", (now, key))
+            self._conn.commit()
+            self._stats.hits += 1
+        return pickle.loads(value)
+
+    def set(self, key, value, ttl: float | None = None):
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, blob, expires_at, now),
+            )
+            self._writes += 1
+            if self._writes % self.evict_every == 0:
+                self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        cur = self._conn.execute(
+            "DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at < ?", (now,)
+        )
+        self._stats.expirations += cur.rowcount
+        (size,) = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+        overflow = size - self.maxsize
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN "
+                "(SELECT key FROM cache ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,),
+            )
+            self._stats.evictions += overflow
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def stats(self) -> dict:
+        return {**self._stats.as_dict(), "size": len(self)}
+
+
+class DiskCache:
+    """
+    一个条目一个文件的磁盘缓存（目录/前两位/key.pkl），适合值比较大的场景，
+    比如大模型的完整回答。超过 maxsize 时按文件修改时间（即最近访问）淘汰。
+    """
+
+    def __init__(self, path: str, maxsize: int = 10000, ttl: float | None = None, evict_every: int = 64):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.evict_every = evict_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._stats = _Stats()
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key) -> str:
+        name = make_key(key)  # key 可能含有路径分隔符等字符，统一哈希成文件名
+        return os.path.join(self.path, name[:2], name + ".pkl")
+
+    def get(self, key, default=None):
+        fp = self._file(key)
+        try:
+            with open(fp, "rb") as f:
+                expires_at, value = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            with self._lock:
+                self._stats.misses += 1
+            return default
+        if expires_at is not None and expires_at < time.time():
+            try:
+                os.remove(fp)
+            except FileNotFoundError:
+                pass
+            with self._lock:
+                self._stats.expirations += 1
+                self._stats.misses += 1
+            return default
+        os.utime(fp)  # 记录最近访问
+        with self._lock:
+            self._stats.hits += 1
+        return value
+
+    def set(self, key, value, ttl: float | None = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+        fp = self._file(key)
+        os.makedirs(os.path.dirname(fp), exist_ok=True)
+        tmp = f"{fp}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump((expires_at, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, fp)  # 原子替换，并发读不会读到半个文件
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % self.evict_every == 0
+        if evict:
+            self._evict()
+
+    def _files(self):
+        for sub in os.listdir(self.path):
+            subdir = os.path.join(self.path, sub)
+            if os.path.isdir(subdir):
+                for name in os.listdir(subdir):
+                    if name.endswith(".pkl"):
+                        yield os.path.join(subdir, name)
+
+    def _evict(self):
+        files = list(self._files())
+        overflow = len(files) - self.maxsize
+        if overflow <= 0:
+            return
+        files.sort(key=lambda p: os.path.getmtime(p) if os.path.exists(p) else 0)
+        for fp in files[:overflow]:
+            try:
+                os.remove(fp)
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._stats.evictions += overflow
+
+    def clear(self):
+        for fp in list(self._files()):
+            try:
+                os.remove(fp)
+            except FileNotFoundError:
+                pass
+
+    def __len__(self):
+        return sum(1 for _ in self._files())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats.as_dict(), "size": len(self)}
+
+
+class TieredCache:
+    """两级缓存：先查进程内 LRU，未命中再查持久层，命中后回填内存。"""
+
+    def __init__(self, memory: LRUCache, persistent):
+        self.memory = memory
+        self.persistent = persistent
+
+    def get(self, key, default=None):
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+        value = self.persistent.get(key)
+        if value is None:
+            return default
+        self.memory.set(key, value)
+        return value
+
+    def set(self, key, value, ttl: float | None = None):
+        self.memory.set(key, value, ttl=ttl)
+        self.persistent.set(key, value, ttl=ttl)
+
+    def clear(self):
+        self.memory.clear()
+        self.persistent.clear()
+
+    def __len__(self):
+        return len(self.persistent)
+
+    def stats(self) -> dict:
+        return {"memory": self.memory.stats(), "persistent": self.persistent.stats()}
+
+
+def make_cache(maxsize: int = 1024, ttl: float | None = None, persist_path: str | None = None):
+    """persist_path 为空时只用内存 LRU；否则内存 LRU + SQLite 两级缓存。"""
+    memory = LRUCache(maxsize=maxsize, ttl=ttl)
+    if not persist_path:
+        return memory
+    return TieredCache(memory, SQLiteCache(persist_path, maxsize=maxsize * 10, ttl=ttl))
+
+
+CACHE_BACKENDS = ("memory", "sqlite", "disk", "off")
+
+
+def make_backend(kind: str, path: str | None = None, maxsize: int = 1024, ttl: float | None = None):
+    """
+    按名字创建单个后端：memory（进程内 LRU）/ sqlite / disk / off（返回 None，不缓存）。
+    sqlite 的 path 是数据库文件，disk 的 path 是目录。
+    """
+    if kind == "off":
+        return None
+    if kind == "memory":
+        return LRUCache(maxsize=maxsize, ttl=ttl)
+    if not path:
+        raise ValueError(f"cache backend {kind!r} needs a path")
+    if kind == "sqlite":
+        return SQLiteCache(path, maxsize=maxsize, ttl=ttl)
+    if kind == "disk":
+        return DiskCache(path, maxsize=maxsize, ttl=ttl)
+    raise ValueError(f"Unknown cache backend: {kind}，可选 {CACHE_BACKENDS}")
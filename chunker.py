@@ -0,0 +1,196 @@
+# chunker.py
+"""
+按模型 token 数分块，替代按空格切 200 个词的固定窗口：
+
+1. strip_boilerplate：去掉 Medium 抓取残留（Sign up / Sign in / Listen / Share、
+   页脚 Help / Status / About ... 和作者简介）、抓取失败的 ERROR 行，
+   以及 Reddit 的 [deleted] / &#x200B; 等；
+2. 按句子切分，用 embedder 自带的 tokenizer 统计每句 token 数；
+3. 句子累加到不超过 max_tokens（MiniLM 是 256 减去 [CLS]/[SEP]），
+   相邻 chunk 之间重叠不超过 overlap 个 token 的完整句子；单句超长时按 token 硬切。
+
+    chunker = TokenChunker(embedder.tokenizer, max_tokens=254, overlap=32)
+    for doc_idx, chunk in chunker.iter_chunks(texts):   # 流式，按批调用 tokenizer
+        ...
+
+tokenizer 为 None 时按空格分词计数（没有模型时的兜底）。
+"""
+import html
+import re
+
+# -----------------------
+# 页面残留
+# -----------------------
+MEDIUM_HEADER_LINES = {"sign up", "sign in", "member-only story", "listen", "share", "follow", "--"}
+MEDIUM_FOOTER_LINES = {
+    "help", "status", "about", "careers", "press", "blog",
+    "privacy", "rules", "terms", "text to speech",
+}
+REDDIT_EMPTY = {"[deleted]", "[removed]"}
+_ZERO_WIDTH = re.compile(r"&(?:amp;)?#x200[bB];|\u200b")
+_HEADER_SCAN = 40  # 只在前这么多行里找 Medium 页头
+_KEY_MAX_LEN = 24  # 残留行都很短，长行（正文）不必做 lower() 比较
+
+
+def strip_boilerplate(text: str) -> str:
+    text = str(text)
+    if len(text) <= _KEY_MAX_LEN and text.strip().lower() in REDDIT_EMPTY:
+        return ""
+    # 抓取失败的页面：正文只有一行 "ERROR: ('Connection aborted.', ...)"
+    if text.startswith("ERROR: ") and "\n" not in text.strip():
+        return ""
+    if "#x200" in text or "\u200b" in text:
+        text = _ZERO_WIDTH.sub("", text)
+    text = html.unescape(text)
+
+    lines = text.split("\n")
+    keys = [line.strip().lower() if len(line) <= _KEY_MAX_LEN else "" for line in lines]
+
+    # Medium 页头：Sign up / Sign in / 刊物简介 / Member-only story / 点赞数 ... 到第一个 Share 为止
+    if keys and keys[0] in ("sign up", "sign in") and "share" in keys[:_HEADER_SCAN]:
+        start = keys.index("share") + 1
+        lines, keys = lines[start:], keys[start:]
+
+    # Medium 页脚：末尾连续的 Help / Status / About ... 行；有页脚时最后一个 "--" 之后是作者简介
+    end = len(keys)
+    while end and keys[end - 1] in MEDIUM_FOOTER_LINES:
+        end -= 1
+    if end < len(keys) and "--" in keys[:end]:
+        end = end - 1 - keys[:end][::-1].index("--")
+    lines, keys = lines[:end], keys[:end]
+
+    return "\n".join(line for line, key in zip(lines, keys) if key not in MEDIUM_HEADER_LINES).strip()
+
+
+# -----------------------
+# 句子切分
+# -----------------------
+# 英文句末标点后跟空格处切；中文句末标点后直接切；换行（段落）总是切。
+# 用 str.replace 把句末换成换行再统一 split，比正则后顾断言快 4 倍以上
+_EN_ENDS = (". ", "! ", "? ")
+_ZH_ENDS = ("。", "！", "？")
+
+
+def split_sentences(text: str) -> list[str]:
+    for p in _EN_ENDS:
+        text = text.replace(p, p[0] + "\n")
+    for p in _ZH_ENDS:
+        if p in text:
+            text = text.replace(p, p + "\n")
+    sentences = []
+    for s in text.split("\n"):
+        s = s.strip()
+        if s:
+            sentences.append(s)
+    return sentences
+
+
+# -----------------------
+# 分块
+# -----------------------
+class TokenChunker:
+    def __init__(self, tokenizer=None, max_tokens: int = 254, overlap: int = 32, batch_docs: int = 256):
+        if overlap >= max_tokens:
+            raise ValueError(f"overlap ({overlap}) 必须小于 max_tokens ({max_tokens})")
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+        self.batch_docs = batch_docs
+
+    def _lengths(self, sentences: list[str]) -> list[int]:
+        if not sentences:
+            return []
+        if self.tokenizer is None:
+            return [len(s.split()) for s in sentences]
+        enc = self.tokenizer(
+            sentences,
+            add_special_tokens=False,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+        )
+        return [len(ids) for ids in enc["input_ids"]]
+
+    def _split_long(self, sentence: str) -> list[str]:
+        """单句超过 max_tokens：按 token 窗口硬切（同样带 overlap）。"""
+        step = self.max_tokens - self.overlap
+        if self.tokenizer is not None and getattr(self.tokenizer, "is_fast", False):
+            offsets = self.tokenizer(
+                sentence, add_special_tokens=False, return_offsets_mapping=True
+            )["offset_mapping"]
+            pieces = []
+            for i in range(0, len(offsets), step):
+                window = offsets[i : i + self.max_tokens]
+                pieces.append(sentence[window[0][0] : window[-1][1]])
+                if i + self.max_tokens >= len(offsets):
+                    break
+            return pieces
+
+        words = sentence.split()
+        pieces = []
+        for i in range(0, len(words), step):
+            pieces.append(" ".join(words[i : i + self.max_tokens]))
+            if i + self.max_tokens >= len(words):
+                break
+        return pieces
+
+    def _assemble(self, sentences: list[str], lengths: list[int]) -> list[str]:
+        chunks = []
+        cur = []  # [(sentence, n_tokens), ...]
+        cur_len = 0
+        for s, n in zip(sentences, lengths):
+            if n > self.max_tokens:
+                if cur:
+                    chunks.append(" ".join(x for x, _ in cur))
+                    cur, cur_len = [], 0
+                chunks.extend(self._split_long(s))
+                continue
+
+            if cur and cur_len + n > self.max_tokens:
+                chunks.append(" ".join(x for x, _ in cur))
+                # 下一个 chunk 以上一个 chunk 末尾不超过 overlap 个 token 的完整句子开头
+                tail, tail_len = [], 0
+                for x, m in reversed(cur):
+                    if tail_len + m > self.overlap or tail_len + m + n > self.max_tokens:
+                        break
+                    tail.insert(0, (x, m))
+                    tail_len += m
+                cur, cur_len = tail, tail_len
+
+            cur.append((s, n))
+            cur_len += n
+
+        if cur:
+            chunks.append(" ".join(x for x, _ in cur))
+        return chunks
+
+    def _chunk_batch(self, texts: list[str]) -> list[list[str]]:
+        per_doc = [split_sentences(strip_boilerplate(t)) for t in texts]
+        # 整批句子一次送进 tokenizer（fast tokenizer 在 Rust 里并行），再按文档切回去
+        lengths = self._lengths([s for doc in per_doc for s in doc])
+        out = []
+        pos = 0
+        for sentences in per_doc:
+            out.append(self._assemble(sentences, lengths[pos : pos + len(sentences)]))
+            pos += len(sentences)
+        return out
+
+    def chunk(self, text: str) -> list[str]:
+        return self._chunk_batch([text])[0]
+
+    def iter_chunks(self, texts):
+        """流式分块：逐批读入 texts，产出 (文档下标, chunk)。"""
+        batch = []
+        base = 0
+        for text in texts:
+            batch.append(text)
+            if len(batch) >= self.batch_docs:
+                yield from self._emit(base, batch)
+                base += len(batch)
+                batch = []
+        if batch:
+            yield from self._emit(base, batch)
+
+    def _emit(self, base: int, batch: list[str]):
+        for i, chunks in enumerate(self._chunk_batch(batch)):
+            for c in chunks:
+                yield base + i, c
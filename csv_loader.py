@@ -0,0 +1,207 @@
+# csv_loader.py
+"""
+游记 CSV 加载：只读需要的列（标题/链接/正文），按块流式读取，多个文件用进程池并行，
+结果是按列存放的 numpy 数组（而不是每行一个 Series / dict）。
+
+单独成模块、只依赖 pandas / numpy（pyarrow 可选）和同样轻量的 chunker，进程池的子进程 import 它很轻。
+"""
+import csv
+import hashlib
+import importlib.util
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from chunker import strip_boilerplate
+
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+CHUNK_ROWS = 50000  # pandas 兜底读取时每块的行数
+BLOCK_BYTES = 16 << 20  # pyarrow 流式读取时每块的字节数
+
+# rows 的列：全部是等长的 numpy 数组
+ROW_COLUMNS = ("source", "row", "title", "url", "city", "source_type", "text", "hash")
+
+
+# -----------------------
+# 文件名 -> 城市 / 来源
+# -----------------------
+def infer_city_from_path(csv_path: str) -> str:
+    # 示例：data/medium/paris_medium_posts.csv -> paris
+    base = os.path.basename(csv_path).lower()
+    # 你可以按需要自己增减城市名
+    for token in ["paris", "budapest", "rome", "london", "tokyo", "kyoto"]:
+        if token in base:
+            return token
+    # 兜底：文件名约定为 <city>_<source>_posts.csv，取第一段
+    for source in ("_medium_", "_reddit_"):
+        if source in base:
+            return base.split(source)[0]
+    return ""
+
+
+def infer_source_type(csv_path: str) -> str:
+    """按所在目录区分 medium / reddit，用于检索时按来源过滤。"""
+    parent = os.path.basename(os.path.dirname(os.path.abspath(csv_path))).lower()
+    return parent if parent in ("medium", "reddit") else ""
+
+
+# -----------------------
+# 列名归一化
+# -----------------------
+def resolve_columns(columns) -> tuple[str | None, str | None, str | None]:
+    """按列名（不区分大小写）找出 (title, url, text) 列；正文找不到时取第 2 列兜底。"""
+    title_col = url_col = text_col = None
+    for c in columns:
+        lc = c.lower()
+        if lc == "title":
+            title_col = c
+        if lc == "url":
+            url_col = c
+        if lc in ("content", "selftext"):  # Medium / Reddit
+            text_col = c
+    if text_col is None and len(columns) >= 2:
+        text_col = columns[1]
+    return title_col, url_col, text_col
+
+
+def row_hash(title: str, url: str, text: str) -> str:
+    """行内容指纹：标题/链接/正文任一变化都会得到新的哈希。"""
+    raw = "\0".join([title, url, text])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def read_header(csv_path: str) -> list[str]:
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        return next(csv.reader(f), [])
+
+
+def _iter_blocks(csv_path: str, usecols: list[str]):
+    """按块产出 (行数, {列名: object 数组})，只含 usecols，缺失值为空串。"""
+    if HAS_PYARROW:
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+
+        # 游记正文里有换行，必须打开 newlines_in_values（pandas 的 pyarrow 引擎不支持这个选项）
+        reader = pacsv.open_csv(
+            csv_path,
+            read_options=pacsv.ReadOptions(block_size=BLOCK_BYTES),
+            parse_options=pacsv.ParseOptions(newlines_in_values=True),
+            convert_options=pacsv.ConvertOptions(
+                include_columns=usecols,
+                column_types={c: pa.string() for c in usecols},
+            ),
+        )
+        for batch in reader:
+            yield batch.num_rows, {
+                c: batch.column(c).fill_null("").to_numpy(zero_copy_only=False)
+                for c in usecols
+            }
+    else:
+        for df in pd.read_csv(
+            csv_path,
+            usecols=usecols,
+            dtype=str,
+            keep_default_na=False,
+            chunksize=CHUNK_ROWS,
+        ):
+            yield len(df), {c: df[c].to_numpy(dtype=object) for c in usecols}
+
+
+def load_csv(csv_path: str) -> dict:
+    """读取单个 CSV，返回按列的 rows（见 ROW_COLUMNS），跳过正文为空的行。"""
+    title_col, url_col, text_col = resolve_columns(read_header(csv_path))
+    usecols = [c for c in dict.fromkeys([title_col, url_col, text_col]) if c]
+
+    def column(block, col, n):
+        return block[col] if col else np.full(n, "", dtype=object)
+
+    parts = []
+    offset = 0
+    for n, block in _iter_blocks(csv_path, usecols):
+        text = column(block, text_col, n)
+        # 去掉页面残留后为空的行（例如只有 Sign up / Share 的 Medium 页面）不产生任何 chunk，直接跳过
+        keep = np.flatnonzero([bool(strip_boilerplate(t)) for t in text])
+        parts.append(
+            {
+                "row": np.arange(offset, offset + n, dtype=np.int64)[keep],
+                "title": column(block, title_col, n)[keep],
+                "url": column(block, url_col, n)[keep],
+                "text": text[keep],
+            }
+        )
+        offset += n
+
+    rows = {
+        col: np.concatenate([p[col] for p in parts]) if parts else np.empty(0, dtype=object)
+        for col in ("row", "title", "url", "text")
+    }
+    n = len(rows["text"])
+    rows["row"] = rows["row"].astype(np.int64)
+    rows["source"] = np.full(n, csv_path, dtype=object)
+    rows["city"] = np.full(n, infer_city_from_path(csv_path), dtype=object)
+    rows["source_type"] = np.full(n, infer_source_type(csv_path), dtype=object)
+    rows["hash"] = np.array(
+        [row_hash(t, u, x) for t, u, x in zip(rows["title"], rows["url"], rows["text"])],
+        dtype=object,
+    )
+    return rows
+
+
+def _load_one(csv_path: str):
+    try:
+        return csv_path, load_csv(csv_path), None
+    except Exception as e:
+        return csv_path, None, e
+
+
+# -----------------------
+# 按列的 rows 工具函数
+# -----------------------
+def empty_rows() -> dict:
+    rows = {col: np.empty(0, dtype=object) for col in ROW_COLUMNS}
+    rows["row"] = np.empty(0, dtype=np.int64)
+    return rows
+
+
+def concat_rows(parts: list[dict]) -> dict:
+    if not parts:
+        return empty_rows()
+    return {col: np.concatenate([p[col] for p in parts]) for col in ROW_COLUMNS}
+
+
+def take_rows(rows: dict, idx) -> dict:
+    idx = np.asarray(idx, dtype=np.int64)
+    return {col: rows[col][idx] for col in ROW_COLUMNS}
+
+
+def load_csvs(csv_files, workers: int | None = None):
+    """
+    并行读取所有 CSV，返回 (rows, failed)：rows 为合并后的列数组，
+    failed 是读取失败的文件集合。workers<=1 时在当前进程串行读取。
+    """
+    csv_files = list(csv_files)
+    workers = workers if workers is not None else min(len(csv_files), os.cpu_count() or 1)
+
+    if workers > 1 and len(csv_files) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            results = list(ex.map(_load_one, csv_files))
+    else:
+        results = [_load_one(p) for p in csv_files]
+
+    parts = []
+    failed = set()
+    for csv_path, rows, err in results:
+        if err is not None:
+            print(f"[ERROR] Cannot read {csv_path}: {err}")
+            failed.add(csv_path)
+            continue
+        print(
+            f"Processing {csv_path} (city={rows['city'][0] if len(rows['city']) else '未知'}) "
+            f"rows={len(rows['text'])}"
+        )
+        parts.append(rows)
+
+    return concat_rows(parts), failed
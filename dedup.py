@@ -0,0 +1,171 @@
+# dedup.py
+"""
+近似重复 chunk 检测：64 位 SimHash（小写词 3-gram）+ 分段索引。
+
+两个 chunk 的 SimHash 海明距离 <= max_distance 视为近似重复（Reddit 转帖、
+Medium 多处转载的同一篇文章等）。把 64 位切成 max_distance+1 段，距离不超过
+max_distance 的两个签名至少有一段完全相同（抽屉原理），所以只需在同段取值的候选里比较。
+
+    sigs = simhash(chunks)
+    index = NearDupIndex(max_distance=3)
+    keep = index.filter(sigs)      # 第一次出现的保留，之后的近似重复为 False
+
+ingest 用 NearDupFilter 按城市分别去重，并统计每个来源文件去掉了多少 chunk。
+"""
+import hashlib
+import re
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+SHINGLE = 3
+BATCH = 512  # 每批计算签名的 chunk 数，控制 (shingle 数 x 64) 位矩阵的大小
+
+_WORD = re.compile(r"\w+")
+_C1 = np.uint64(0x9E3779B97F4A7C15)
+_C2 = np.uint64(0xC2B2AE3D27D4EB4F)
+_MIX = np.uint64(0xFF51AFD7ED558CCD)
+
+
+def _mix(x: np.ndarray) -> np.ndarray:
+    x = x ^ (x >> np.uint64(33))
+    x = x * _MIX
+    return x ^ (x >> np.uint64(33))
+
+
+class _WordHasher:
+    """词 -> 稳定的 64 位哈希（跨进程/跨运行一致，不能用内置 hash）。"""
+
+    def __init__(self):
+        self._cache = {}
+
+    def __call__(self, words: list[str]) -> np.ndarray:
+        # 先用 pandas 在 C 里去重，只对没见过的词算 blake2b
+        codes, uniques = pd.factorize(np.asarray(words, dtype=object))
+        cache = self._cache
+        table = np.fromiter(
+            (
+                cache[w] if w in cache else cache.setdefault(
+                    w,
+                    int.from_bytes(hashlib.blake2b(w.encode("utf-8"), digest_size=8).digest(), "little"),
+                )
+                for w in uniques
+            ),
+            dtype=np.uint64,
+            count=len(uniques),
+        )
+        return table[codes]
+
+
+def _shingles(word_hashes: np.ndarray, size: int = SHINGLE) -> np.ndarray:
+    if len(word_hashes) < size:
+        return _mix(word_hashes)
+    h = word_hashes[: len(word_hashes) - size + 1].copy()
+    for k in range(1, size):
+        h = h * _C1 + word_hashes[k : len(word_hashes) - size + 1 + k] * _C2
+    return _mix(h)
+
+
+def simhash(texts, shingle: int = SHINGLE) -> np.ndarray:
+    """批量计算 64 位 SimHash，返回 uint64 数组；没有词的文本签名为 0。"""
+    hasher = _WordHasher()
+    texts = list(texts)
+    out = np.zeros(len(texts), dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for start in range(0, len(texts), BATCH):
+            words = [_WORD.findall(str(t).lower()) for t in texts[start : start + BATCH]]
+            counts = np.array([len(w) for w in words])
+            if not counts.sum():
+                continue
+            # 整批的词一次哈希，再按 chunk 切开生成 shingle
+            flat = hasher([w for ws in words for w in ws])
+            bounds = np.concatenate([[0], np.cumsum(counts)])
+            parts = [_shingles(flat[bounds[i] : bounds[i + 1]], shingle) for i in range(len(words))]
+            lengths = np.array([len(p) for p in parts])
+            nonempty = np.flatnonzero(lengths)
+            allh = np.concatenate([parts[i] for i in nonempty])
+            # 每个 shingle 的 64 个比特按 +1/-1 投票，按 chunk 分段求和
+            bits = np.unpackbits(allh.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+            starts = np.concatenate([[0], np.cumsum(lengths[nonempty])[:-1]])
+            votes = np.add.reduceat(bits, starts, axis=0, dtype=np.int32) * 2 - lengths[nonempty, None]
+            packed = np.packbits(votes > 0, axis=1, bitorder="little")
+            out[start + nonempty] = packed.view(np.uint64).ravel()
+    return out
+
+
+class NearDupIndex:
+    """已保留签名的分段索引；签名 0（空文本）不参与去重。"""
+
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max_distance
+        blocks = max_distance + 1
+        edges = [64 * i // blocks for i in range(blocks + 1)]
+        self._masks = [(s, (1 << (e - s)) - 1) for s, e in zip(edges[:-1], edges[1:])]
+        self._tables = [{} for _ in self._masks]
+        self._sigs = []
+
+    def __len__(self):
+        return len(self._sigs)
+
+    def find(self, sig: int) -> int:
+        """返回第一个近似重复的已保留签名下标，没有则 -1。"""
+        for (shift, mask), table in zip(self._masks, self._tables):
+            for j in table.get((sig >> shift) & mask, ()):
+                if (self._sigs[j] ^ sig).bit_count() <= self.max_distance:
+                    return j
+        return -1
+
+    def add(self, sig: int) -> int:
+        j = len(self._sigs)
+        self._sigs.append(sig)
+        for (shift, mask), table in zip(self._masks, self._tables):
+            table.setdefault((sig >> shift) & mask, []).append(j)
+        return j
+
+    def filter(self, sigs) -> np.ndarray:
+        """按顺序处理签名：与已保留的近似重复则为 False，否则保留并加入索引。"""
+        keep = np.ones(len(sigs), dtype=bool)
+        for i, sig in enumerate(int(s) for s in sigs):
+            if sig and self.find(sig) >= 0:
+                keep[i] = False
+            else:
+                self.add(sig)
+        return keep
+
+
+class NearDupFilter:
+    """
+    按 scope（城市）分别去重：同一篇文章被归到两个城市下时各留一份，
+    按城市过滤检索时仍然找得到。removed 记录每个 label（来源文件）被去掉的 chunk 数。
+    """
+
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max_distance
+        self.removed = Counter()
+        self._indexes = {}
+
+    def _index(self, scope) -> NearDupIndex:
+        index = self._indexes.get(scope)
+        if index is None:
+            index = self._indexes[scope] = NearDupIndex(self.max_distance)
+        return index
+
+    def seed(self, texts, scopes):
+        """装入已经在库里的 chunk（增量更新时），它们本身不会被去掉。"""
+        for sig, scope in zip(simhash(texts), scopes):
+            if sig:
+                self._index(scope).add(int(sig))
+
+    def filter(self, texts, scopes, labels=None) -> np.ndarray:
+        sigs = simhash(texts)
+        keep = np.ones(len(sigs), dtype=bool)
+        for i, (sig, scope) in enumerate(zip(sigs.tolist(), scopes)):
+            index = self._index(scope)
+            if sig and index.find(sig) >= 0:
+                keep[i] = False
+                if labels is not None:
+                    self.removed[labels[i]] += 1
+            else:
+                index.add(sig)
+        return keep
@@ -0,0 +1,237 @@
+# doc_store.py
+"""
+列式、内存映射的 chunk 存储，替代 metadata.json + chunks.pkl。
+
+目录结构（VECTOR_DIR/docstore/）：
+    meta.json                  行数、列清单
+    id.npy / row.npy           定长整数列
+    text.bin + text.off.npy    chunk 正文：UTF-8 拼接 + 偏移量（每个 chunk 只存一份）
+    <col>.codes.npy            字典编码列的编码（source/title/url/city/source_type/row_hash）
+    <col>.dict.bin/.dict.off.npy   字典取值，同样是拼接 + 偏移量
+    vibes.off.npy + vibes.codes.npy  多值列：每行的 vibes 编码区间
+    vibes.dict.bin/.dict.off.npy
+
+打开时所有文件都用 mmap，只有被 get/metadata 访问到的行才会真正解码。
+
+旧版向量库可以直接转换：
+    python doc_store.py ./vector_store
+"""
+import json
+import os
+import pickle
+import shutil
+import sys
+
+import numpy as np
+
+STORE_VERSION = 1
+DICT_COLUMNS = ("source", "title", "url", "city", "source_type", "row_hash")
+
+
+# ======================
+# 拼接字符串 + 偏移量
+# ======================
+def write_strings(path_prefix: str, values):
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    with open(path_prefix + ".bin", "wb") as f:
+        pos = 0
+        for i, v in enumerate(values):
+            b = str(v).encode("utf-8")
+            f.write(b)
+            pos += len(b)
+            offsets[i + 1] = pos
+    np.save(path_prefix + ".off.npy", offsets)
+
+
+class StringHeap:
+    """按下标懒加载的字符串数组。"""
+
+    def __init__(self, path_prefix: str):
+        self.offsets = np.load(path_prefix + ".off.npy", mmap_mode="r")
+        size = os.path.getsize(path_prefix + ".bin")
+        self.blob = np.memmap(path_prefix + ".bin", dtype=np.uint8, mode="r") if size else b""
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return bytes(self.blob[start:end]).decode("utf-8")
+
+    def to_list(self) -> list[str]:
+        return [self[i] for i in range(len(self))]
+
+
+def _encode(values):
+    """字典编码：返回 (codes, 去重后的取值列表)。"""
+    lookup = {}
+    codes = np.empty(len(values), dtype=np.int32)
+    for i, v in enumerate(values):
+        codes[i] = lookup.setdefault(v, len(lookup))
+    return codes, list(lookup)
+
+
+# ======================
+# 写入
+# ======================
+def write_doc_store(path: str, chunks, metadata):
+    """把 chunks + metadata（与 chunks 一一对应）写成列式存储，先写临时目录再替换。"""
+    if len(chunks) != len(metadata):
+        raise ValueError(f"chunks ({len(chunks)}) 与 metadata ({len(metadata)}) 行数不一致")
+
+    tmp = path + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    n = len(chunks)
+    ids = np.array([md.get("id", i) for i, md in enumerate(metadata)], dtype=np.int64)
+    np.save(os.path.join(tmp, "id.npy"), ids)
+    np.save(
+        os.path.join(tmp, "row.npy"),
+        np.array([md.get("row", -1) for md in metadata], dtype=np.int64),
+    )
+    write_strings(os.path.join(tmp, "text"), chunks)
+
+    for col in DICT_COLUMNS:
+        codes, values = _encode([str(md.get(col, "") or "") for md in metadata])
+        np.save(os.path.join(tmp, f"{col}.codes.npy"), codes)
+        write_strings(os.path.join(tmp, f"{col}.dict"), values)
+
+    lookup = {}
+    vibe_offsets = np.zeros(n + 1, dtype=np.int64)
+    vibe_codes = []
+    for i, md in enumerate(metadata):
+        for v in md.get("vibes", []) or []:
+            vibe_codes.append(lookup.setdefault(str(v), len(lookup)))
+        vibe_offsets[i + 1] = len(vibe_codes)
+    np.save(os.path.join(tmp, "vibes.off.npy"), vibe_offsets)
+    np.save(os.path.join(tmp, "vibes.codes.npy"), np.array(vibe_codes, dtype=np.int32))
+    write_strings(os.path.join(tmp, "vibes.dict"), list(lookup))
+
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(
+            {"version": STORE_VERSION, "n": n, "dict_columns": list(DICT_COLUMNS)},
+            f,
+            ensure_ascii=False,
+        )
+
+    replace_dir(tmp, path)
+
+
+def replace_dir(tmp: str, path: str):
+    """用写好的临时目录替换 path（先改名再删除旧目录，读方不会看到写了一半的文件）。"""
+    old = path + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, old)
+    os.rename(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+# ======================
+# 读取
+# ======================
+class DocStore:
+    def __init__(self, path: str):
+        meta_path = os.path.join(path, "meta.json")
+        if not os.path.exists(meta_path):
+            raise FileNotFoundError(f"docstore not found: {path}")
+        with open(meta_path, "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        self.path = path
+        self.ids = np.load(os.path.join(path, "id.npy"), mmap_mode="r")
+        self.rows = np.load(os.path.join(path, "row.npy"), mmap_mode="r")
+        self.text = StringHeap(os.path.join(path, "text"))
+        self.codes = {
+            col: np.load(os.path.join(path, f"{col}.codes.npy"), mmap_mode="r")
+            for col in self.meta["dict_columns"]
+        }
+        self.dicts = {
+            col: StringHeap(os.path.join(path, f"{col}.dict"))
+            for col in self.meta["dict_columns"]
+        }
+        self.vibe_offsets = np.load(os.path.join(path, "vibes.off.npy"), mmap_mode="r")
+        self.vibe_codes = np.load(os.path.join(path, "vibes.codes.npy"), mmap_mode="r")
+        self.vibe_dict = StringHeap(os.path.join(path, "vibes.dict"))
+
+        # ingest 写入的 id 总是递增的，此时可直接二分查找；否则退化为排序索引
+        self._sorted = bool(np.all(np.diff(self.ids) > 0)) if len(self.ids) > 1 else True
+        self._order = None if self._sorted else np.argsort(self.ids, kind="stable")
+
+    def __len__(self):
+        return int(self.meta["n"])
+
+    def positions(self, ids) -> np.ndarray:
+        """chunk id -> 行号，不存在的 id 返回 -1。"""
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(self.ids) == 0:
+            return np.full(ids.shape, -1, dtype=np.int64)
+        sorted_ids = self.ids if self._sorted else self.ids[self._order]
+        pos = np.searchsorted(sorted_ids, ids)
+        pos = np.clip(pos, 0, len(sorted_ids) - 1)
+        found = sorted_ids[pos] == ids
+        if not self._sorted:
+            pos = self._order[pos]
+        return np.where(found, pos, -1)
+
+    def chunk(self, pos: int) -> str:
+        return self.text[pos]
+
+    def value(self, col: str, pos: int) -> str:
+        return self.dicts[col][int(self.codes[col][pos])]
+
+    def vibes(self, pos: int) -> list[str]:
+        start, end = int(self.vibe_offsets[pos]), int(self.vibe_offsets[pos + 1])
+        return [self.vibe_dict[int(c)] for c in self.vibe_codes[start:end]]
+
+    def metadata(self, pos: int) -> dict:
+        """还原单行 metadata（正文不再重复存一份，用 chunk(pos) 取）。"""
+        md = {"id": int(self.ids[pos]), "row": int(self.rows[pos])}
+        for col in self.codes:
+            md[col] = self.value(col, pos)
+        md["vibes"] = self.vibes(pos)
+        return md
+
+    def ids_by_value(self, col: str) -> dict[str, np.ndarray]:
+        """字典编码列的倒排：取值 -> 有序 chunk id 数组，全程向量化。"""
+        if col == "vibes":
+            codes = np.asarray(self.vibe_codes)
+            rows = np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.vibe_offsets))
+            values = self.vibe_dict
+        else:
+            codes = np.asarray(self.codes[col])
+            rows = np.arange(len(self), dtype=np.int64)
+            values = self.dicts[col]
+
+        order = np.argsort(codes, kind="stable")
+        codes_sorted = codes[order]
+        bounds = np.flatnonzero(np.diff(codes_sorted)) + 1
+        out = {}
+        for group in np.split(order, bounds):
+            if len(group) == 0:
+                continue
+            out[values[int(codes[group[0]])]] = np.unique(self.ids[rows[group]])
+        return out
+
+    def to_records(self):
+        """全量还原为 (chunks, metadata) 列表，供 ingest 增量更新时改写。"""
+        chunks = self.text.to_list()
+        metadata = [self.metadata(i) for i in range(len(self))]
+        return chunks, metadata
+
+
+def convert_legacy(vector_dir: str):
+    """把旧版 metadata.json + chunks.pkl 转成 docstore/。"""
+    with open(os.path.join(vector_dir, "metadata.json"), "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+    with open(os.path.join(vector_dir, "chunks.pkl"), "rb") as f:
+        chunks = pickle.load(f)
+    for pos, md in enumerate(metadata):
+        md.setdefault("id", pos)
+    write_doc_store(os.path.join(vector_dir, "docstore"), chunks, metadata)
+    print(f"✅ docstore written: {len(chunks)} chunks")
+
+
+if __name__ == "__main__":
+    convert_legacy(sys.argv[1] if len(sys.argv) > 1 else "./vector_store")
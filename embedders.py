@@ -0,0 +1,77 @@
+# embedders.py
+"""
+Embedding 模型注册表：ingest 与 rag_retrieval 都通过 load_embedder(name) 取模型。
+
+    minilm            all-MiniLM-L6-v2，PyTorch（默认，与旧向量库一致）
+    minilm-onnx-int8  同一模型导出到 ONNX Runtime 并做 int8 动态量化，CPU 上更快；
+                      与 minilm 是同一个向量空间，可以直接查询 minilm 建的库
+    multilingual      paraphrase-multilingual-MiniLM-L12-v2，中文问题检索英文游记，需要用它重新建库
+
+建库时 embedder_info() 写进 manifest.json；查询/增量更新前用 check_compatible() 比对，
+模型或维度不一致直接报错（不同模型的向量空间不通用，混用只会静默地返回无关结果）。
+ONNX 后端需要额外安装：pip install "sentence-transformers[onnx]"。
+"""
+import os
+
+EMBEDDERS = {
+    "minilm": {
+        "model": "sentence-transformers/all-MiniLM-L6-v2",
+        "dim": 384,
+        "backend": "torch",
+    },
+    "minilm-onnx-int8": {
+        "model": "sentence-transformers/all-MiniLM-L6-v2",
+        "dim": 384,
+        "backend": "onnx",
+        # Hub 上已导出好的 int8 动态量化文件；avx2 版本在绝大多数 x86 CPU 上可用
+        "file_name": os.getenv("RAG_ONNX_FILE", "onnx/model_quint8_avx2.onnx"),
+    },
+    "multilingual": {
+        "model": "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+        "dim": 384,
+        "backend": "torch",
+    },
+}
+DEFAULT_EMBEDDER = os.getenv("RAG_EMBEDDER", "minilm")
+
+# 没有记录 embedder 的旧向量库都是用 all-MiniLM-L6-v2 建的
+LEGACY_EMBEDDER = "minilm"
+
+
+def embedder_spec(name: str) -> dict:
+    if name not in EMBEDDERS:
+        raise ValueError(f"Unknown embedder: {name}，可选 {tuple(EMBEDDERS)}")
+    return EMBEDDERS[name]
+
+
+def load_embedder(name: str = DEFAULT_EMBEDDER):
+    """按名字加载 SentenceTransformer（torch 或 onnx 后端，encode / tokenizer 接口相同）。"""
+    from sentence_transformers import SentenceTransformer
+
+    spec = embedder_spec(name)
+    if spec["backend"] == "onnx":
+        return SentenceTransformer(
+            spec["model"], backend="onnx", model_kwargs={"file_name": spec["file_name"]}
+        )
+    return SentenceTransformer(spec["model"])
+
+
+def embedder_info(name: str) -> dict:
+    """写进 manifest.json 的记录。"""
+    spec = embedder_spec(name)
+    return {"name": name, "model": spec["model"], "dim": spec["dim"], "backend": spec["backend"]}
+
+
+def check_compatible(stored: dict | None, name: str, dim: int | None = None):
+    """
+    stored 为 manifest 里的 embedder 记录（None 表示旧版向量库），name 为当前配置的 embedder，
+    dim 为索引的实际维度。模型或维度对不上时抛 RuntimeError；后端不同（torch / onnx）允许。
+    """
+    stored = stored or embedder_info(LEGACY_EMBEDDER)
+    current = embedder_info(name)
+    if stored["model"] != current["model"] or (dim is not None and dim != current["dim"]):
+        raise RuntimeError(
+            f"向量库是用 {stored.get('name')}（{stored['model']}，{dim or stored['dim']} 维）建的，"
+            f"当前 embedder 为 {name}（{current['model']}，{current['dim']} 维）："
+            f"请设置 RAG_EMBEDDER={stored.get('name')}，或用 --embedder {name} 重新全量运行 ingest。"
+        )
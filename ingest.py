@@ -1,37 +1,77 @@
 import os
 import json
-import pickle
+import time
+import argparse
 import numpy as np
-import pandas as pd
 from tqdm import tqdm
 import faiss
-from sentence_transformers import SentenceTransformer
-from openai import OpenAI
+from openai import (
+    OpenAI,
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    RateLimitError,
+)
 from dotenv import load_dotenv
 from collections import Counter
 
+from vibe_tagger import VibeCache, tag_all
+from vector_index import INDEX_KINDS, METRICS, SQ_TYPES, add_vectors, build_index, supports_remove
+from doc_store import DocStore, write_doc_store
+from bm25 import write_bm25
+from store_generations import current_dir, new_generation
+from csv_loader import load_csvs, take_rows
+from chunker import TokenChunker
+from dedup import NearDupFilter
+from embedders import DEFAULT_EMBEDDER, EMBEDDERS, check_compatible, embedder_info, load_embedder
+
 load_dotenv()
 QIANFAN_API_KEY = os.getenv("QIANFAN_API_KEY")
-qianfan_client = OpenAI(
-    api_key=QIANFAN_API_KEY,
-    base_url="https://qianfan.baidubce.com/v2",
-)
+QIANFAN_BASE_URL = os.getenv("QIANFAN_BASE_URL", "https://qianfan.baidubce.com/v2")
 
 TAG_MODEL = "ernie-speed-8k"  # 你可根据账号情况换成更稳的模型，如 ernie-4.0-8k
+TAG_WORKERS = 8  # 并发请求数
+TAG_RATE_PER_SEC = 5.0  # 令牌桶：每秒最多发出的请求数
+TAG_RETRIES = 4
+TAG_TIMEOUT = float(os.getenv("TAG_TIMEOUT", "30"))  # 单次打标签请求的超时（秒）
+# 只对这些"暂时性"错误重试；鉴权失败等直接放弃
+TAG_RETRY_ON = (APIConnectionError, APITimeoutError, InternalServerError, RateLimitError)
 
 DATA_DIR = "./data"
 VECTOR_DIR = "./vector_store"
 os.makedirs(VECTOR_DIR, exist_ok=True)
+VIBE_CACHE_PATH = os.path.join(VECTOR_DIR, "vibe_cache.sqlite")
+# index / docstore / bm25 / embeddings / manifest 每次构建写进新的版本目录，见 store_generations.py
+
+# 向量索引类型：flat（精确，默认）/ ivf_flat / ivf_pq / hnsw，参数见 vector_index.build_index
+# 例如 {"metric": "cosine", "sq": "int8"}：归一化内积 + int8 标量量化（内存约为 float32 的 1/4）
+INDEX_KIND = "flat"
+INDEX_PARAMS = {}
+
+# 懒加载千帆客户端，只做向量化/基准测试时不需要 API Key
+_qianfan_client = None
+
+
+def get_qianfan_client():
+    global _qianfan_client
+    if _qianfan_client is None:
+        # 重试交给 vibe_tagger.call_with_retry（带退避和限流），SDK 自己不再重试
+        _qianfan_client = OpenAI(
+            api_key=QIANFAN_API_KEY, base_url=QIANFAN_BASE_URL, timeout=TAG_TIMEOUT, max_retries=0
+        )
+    return _qianfan_client
 
 # -----------------------
 # 抽取城市氛围关键词（vibes）
 # -----------------------
 
 
-def extract_city_vibes(text: str, city: str) -> list[str]:
+def request_city_vibes(text: str, city: str) -> list[str]:
     """
     用千帆模型从一条游记（标题+正文）中抽取城市氛围/特点关键词。
     返回一个字符串列表，例如 ["浪漫", "适合步行", "夜景好看"]。
+    接口错误会直接抛出（交给调用方重试）；模型输出无法解析时抛出 ValueError，
+    tag_all 不会把它当作空结果缓存下来。
     """
     # 截断一下，避免太长
     short_text = text[:800]
@@ -49,49 +89,108 @@ def extract_city_vibes(text: str, city: str) -> list[str]:
    ["浪漫", "适合步行", "美食丰富", "夜景好看", "物价略贵"]
 """
 
-    try:
-        resp = qianfan_client.chat.completions.create(
-            model=TAG_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "你是一个擅长提炼城市旅行氛围关键词的助手。",
-                },
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.2,
-            max_tokens=200,
-        )
+    resp = get_qianfan_client().chat.completions.create(
+        model=TAG_MODEL,
+        messages=[
+            {
+                "role": "system",
+                "content": "你是一个擅长提炼城市旅行氛围关键词的助手。",
+            },
+            {"role": "user", "content": prompt},
+        ],
+        temperature=0.2,
+        max_tokens=200,
+    )
 
-        content = resp.choices[0].message["content"]
-        # 尝试按 JSON 解析
-        vibes = json.loads(content)
-        if isinstance(vibes, list):
-            cleaned = [v.strip() for v in vibes if isinstance(v, str) and v.strip()]
-            return cleaned[:10]
-        return []
+    content = resp.choices[0].message.content or ""
+    # 按 JSON 解析（JSONDecodeError 是 ValueError 的子类）
+    vibes = json.loads(content)
+    if not isinstance(vibes, list):
+        raise ValueError(f"模型输出不是 JSON 数组：{content[:100]!r}")
+    cleaned = [v.strip() for v in vibes if isinstance(v, str) and v.strip()]
+    return cleaned[:10]
+
+
+def extract_city_vibes(text: str, city: str) -> list[str]:
+    """单条抽取，任何错误都返回 []（保持原来的容错行为）。"""
+    try:
+        return request_city_vibes(text, city)
     except Exception as e:
         print("extract_city_vibes error:", e)
         return []
 
 
+def extract_vibes_batch(items: list[tuple[str, str]]) -> list[list[str]]:
+    """
+    批量抽取 [(text, city), ...] 的 vibes：线程池并发 + 令牌桶限流 + 退避重试，
+    结果按内容哈希缓存在 VIBE_CACHE_PATH，未变化的游记不会再次调用模型。
+    """
+    cache = VibeCache(VIBE_CACHE_PATH, namespace=TAG_MODEL)
+    try:
+        return tag_all(
+            items,
+            request_city_vibes,
+            cache=cache,
+            max_workers=TAG_WORKERS,
+            rate_per_sec=TAG_RATE_PER_SEC,
+            retries=TAG_RETRIES,
+            retry_on=TAG_RETRY_ON,
+        )
+    finally:
+        cache.close()
+
+
 # -----------------------
 # Step 1: Load local embedding model
 # -----------------------
-print("Loading SentenceTransformer model...")
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
-print("Model loaded.")
+EMBEDDER = DEFAULT_EMBEDDER  # 见 embedders.py：minilm / minilm-onnx-int8 / multilingual
+EMBED_BATCH_SIZE = 64  # 每次前向传播的 chunk 数
+EMBED_WORKERS = 0  # >1 时使用 SentenceTransformer 多进程池
+
+# 懒加载：多进程池以 spawn 方式启动子进程时会重新 import 本模块，
+# 放在模块顶层会让每个子进程都重复加载一次模型
+_embedder = None
+
+
+def get_embedder():
+    global _embedder
+    if _embedder is None:
+        print(f"Loading embedder {EMBEDDER}...")
+        _embedder = load_embedder(EMBEDDER)
+        print("Model loaded.")
+    return _embedder
 
 
 # -----------------------
 # Step 2: Chunk function
 # -----------------------
-def chunk_text(text, max_tokens=200):
-    words = str(text).split()
-    chunks = []
-    for i in range(0, len(words), max_tokens):
-        chunks.append(" ".join(words[i : i + max_tokens]))
-    return chunks
+# 按模型 token 数分块（见 chunker.py）；None 表示用模型的 max_seq_length 减去 [CLS]/[SEP]
+CHUNK_MAX_TOKENS = None
+CHUNK_OVERLAP_TOKENS = 32  # 相邻 chunk 之间重叠的 token 数（按完整句子）
+
+_chunkers = {}  # max_tokens -> TokenChunker（共用同一个 tokenizer）
+
+
+def get_chunker(max_tokens: int | None = None):
+    """max_tokens 为 None 时用 CHUNK_MAX_TOKENS（再为 None 则按模型上限）。"""
+    embedder = get_embedder()
+    max_tokens = max_tokens or CHUNK_MAX_TOKENS or embedder.max_seq_length - 2
+    chunker = _chunkers.get(max_tokens)
+    if chunker is None:
+        # 窗口比默认重叠还小时，重叠缩到窗口的一半
+        overlap = min(CHUNK_OVERLAP_TOKENS, max_tokens // 2)
+        chunker = _chunkers[max_tokens] = TokenChunker(
+            embedder.tokenizer, max_tokens=max_tokens, overlap=overlap
+        )
+    return chunker
+
+
+def chunk_text(text, max_tokens=None):
+    """
+    把一篇游记切成不超过 max_tokens 个模型 token 的 chunk（None 同 get_chunker）。
+    超过 embedding 模型上限的部分在编码时会被截断，一般不要调得比默认值大。
+    """
+    return get_chunker(max_tokens).chunk(text)
 
 
 # -----------------------
@@ -121,114 +220,384 @@ def load_all_csv():
 # -----------------------
 # Step 4: Chunk the CSV content
 # -----------------------
-def infer_city_from_path(csv_path: str) -> str:
-    # 示例：data/medium/paris_medium_posts.csv -> paris
-    base = os.path.basename(csv_path).lower()
-    # 你可以按需要自己增减城市名
-    for token in ["paris", "budapest", "rome", "london", "tokyo", "kyoto"]:
-        if token in base:
-            return token
-    return ""
+CSV_WORKERS = None  # 读取 CSV 的进程数，None 表示 min(文件数, CPU 数)
 
 
-def build_chunks(csv_files):
+def read_rows(csv_files, workers=CSV_WORKERS):
+    """
+    读取所有 CSV（只读标题/链接/正文三列，多文件进程池并行），返回 (rows, failed)：
+    rows 是按列的 numpy 数组 dict，字段 source/row/title/url/city/source_type/text/hash；
+    failed 是读取失败的文件集合（增量模式下这些文件的旧数据不会被当作已删除）。
+    """
+    return load_csvs(csv_files, workers=workers)
+
+
+# 近似重复 chunk 的 SimHash 海明距离阈值（64 位，无关文本的距离在 32 左右），None 表示不去重
+DEDUP_MAX_DISTANCE = 6  # 约 200 词的 chunk 改动一个词，距离一般在 2~6
+
+
+def make_dedup():
+    return NearDupFilter(DEDUP_MAX_DISTANCE) if DEDUP_MAX_DISTANCE is not None else None
+
+
+def tag_and_chunk(rows, dedup=None):
+    """
+    先分块，按城市去掉近似重复的 chunk，再只给还有 chunk 的行并发打标签。
+    返回 (chunks, metadata, dup_rows)：dup_rows 是全部 chunk 都被去重掉的行
+    [(source, row, hash), ...]，增量更新时据此认出它们，不会每次都当作新行。
+    """
     chunks = []
     metadata = []
 
-    for csv_path in csv_files:
-        try:
-            df = pd.read_csv(csv_path)
-        except Exception as e:
-            print(f"[ERROR] Cannot read {csv_path}: {e}")
-            continue
+    # 对正文做分块（流式），得到 [(行下标, chunk), ...]
+    pairs = list(get_chunker().iter_chunks(rows["text"]))
+    chunked_rows = {i for i, _ in pairs}
+    if dedup is not None and pairs:
+        keep = dedup.filter(
+            [c for _, c in pairs],
+            [rows["city"][i] for i, _ in pairs],
+            labels=[rows["source"][i] for i, _ in pairs],
+        )
+        pairs = [p for p, k in zip(pairs, keep) if k]
+
+    kept_rows = sorted({i for i, _ in pairs})
+    dup_rows = [
+        (rows["source"][i], int(rows["row"][i]), rows["hash"][i])
+        for i in sorted(chunked_rows.difference(kept_rows))
+    ]
+
+    # ⚠️ 用“标题 + 正文开头”作为标签输入
+    tag_inputs = [
+        ((rows["title"][i] + "\n" + rows["text"][i]).strip(), rows["city"][i] or "这座城市")
+        for i in kept_rows
+    ]
+    all_vibes = dict(zip(kept_rows, extract_vibes_batch(tag_inputs))) if kept_rows else {}
+
+    # 每个 chunk 共用所在行的 metadata（包括 vibes）
+    for i, c in pairs:
+        chunks.append(c)
+        metadata.append(
+            {
+                "source": rows["source"][i],
+                "row": int(rows["row"][i]),
+                "row_hash": rows["hash"][i],
+                "title": rows["title"][i],
+                "url": rows["url"][i],
+                "city": rows["city"][i],
+                "source_type": rows["source_type"][i],
+                "vibes": all_vibes[i],  # 👈 把氛围标签写进 metadata
+            }
+        )
+
+    return chunks, metadata, dup_rows
 
-        # 猜字段名
-        title_col = None
-        url_col = None
-        text_col = None
-
-        for c in df.columns:
-            lc = c.lower()
-            if lc == "title":
-                title_col = c
-            if lc == "url":
-                url_col = c
-            if lc == "content":  # Medium
-                text_col = c
-            if lc == "selftext":  # Reddit
-                text_col = c
-
-        # 再兜底：取第 2 列当正文
-        if text_col is None and len(df.columns) >= 2:
-            text_col = df.columns[1]
-
-        city = infer_city_from_path(csv_path)
-
-        print(f"Processing {csv_path} (city={city or '未知'}) rows={len(df)}")
-
-        for i, row in df.iterrows():
-            raw_text = str(row.get(text_col, ""))
-            if not raw_text.strip():
-                continue
-
-            title = str(row.get(title_col, "")) if title_col else ""
-            url = str(row.get(url_col, "")) if url_col else ""
-
-            # ⚠️ 用“标题 + 正文开头”作为标签输入
-            tag_input = (title + "\n" + raw_text).strip()
-            vibes = extract_city_vibes(tag_input, city or "这座城市")
-
-            # 对正文做分块，每个 chunk 共用同一份 metadata（包括 vibes）
-            for c in chunk_text(raw_text):
-                chunks.append(c)
-                metadata.append(
-                    {
-                        "source": csv_path,
-                        "row": int(i),
-                        "content": c,
-                        "title": title,
-                        "url": url,
-                        "city": city,
-                        "vibes": vibes,  # 👈 把氛围标签写进 metadata
-                    }
-                )
 
-    return chunks, metadata
+def build_chunks(csv_files, dedup=None):
+    rows, _ = read_rows(csv_files)
+    return tag_and_chunk(rows, dedup)
+
+
+def report_dedup(dedup):
+    if dedup is None or not dedup.removed:
+        return
+    print(f"Dedup: removed {sum(dedup.removed.values())} near-duplicate chunks")
+    for source, n in dedup.removed.most_common():
+        print(f"  {source}: -{n}")
 
 
 # -----------------------
 # Step 5: Vectorize using local model
 # -----------------------
-def vectorize_chunks(chunks):
-    embeddings = []
+def vectorize_chunks(
+    chunks,
+    batch_size: int = EMBED_BATCH_SIZE,
+    num_workers: int = EMBED_WORKERS,
+    out_path: str | None = None,
+):
+    """
+    批量向量化所有 chunk，结果直接写进预分配好的 float32 矩阵。
+    - batch_size：每批送进模型的 chunk 数
+    - num_workers：>1 时用 SentenceTransformer 的多进程池并行编码
+    - out_path：给出时写入 .npy memmap，峰值内存不随语料增长；save_vector_store 会把它
+      移进新的版本目录
+    """
+    embedder = get_embedder()
+    n = len(chunks)
+    dim = embedder.get_sentence_embedding_dimension()
 
-    for c in tqdm(chunks, desc="Embedding chunks"):
-        vec = embedder.encode(c)
-        embeddings.append(vec)
+    if out_path:
+        out = np.lib.format.open_memmap(
+            out_path, mode="w+", dtype=np.float32, shape=(n, dim)
+        )
+    else:
+        out = np.empty((n, dim), dtype=np.float32)
 
-    return np.array(embeddings).astype("float32")
+    if n == 0:
+        return out
+
+    if num_workers and num_workers > 1:
+        # 按块提交给进程池，避免一次性把全部结果堆在内存里
+        block = batch_size * num_workers * 16
+        pool = embedder.start_multi_process_pool(target_devices=["cpu"] * num_workers)
+        try:
+            for start in tqdm(range(0, n, block), desc="Embedding chunks"):
+                end = min(start + block, n)
+                out[start:end] = embedder.encode_multi_process(
+                    chunks[start:end], pool, batch_size=batch_size
+                )
+        finally:
+            embedder.stop_multi_process_pool(pool)
+    else:
+        for start in tqdm(range(0, n, batch_size), desc="Embedding chunks"):
+            end = min(start + batch_size, n)
+            out[start:end] = embedder.encode(
+                chunks[start:end],
+                batch_size=batch_size,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            )
+
+    if isinstance(out, np.memmap):
+        out.flush()
+    return out
 
 
 # -----------------------
 # Step 6: Save vector store
 # -----------------------
-def save_vector_store(embeddings, metadata, chunks):
+def load_manifest(store_dir):
+    path = os.path.join(store_dir, "manifest.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(out_dir, manifest):
+    manifest["updated_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+
+def bm25_docs(metadata, chunks):
+    """BM25 按 docstore 行号对齐，标题里的地名也一并索引。"""
+    return [f"{md.get('title', '')}\n{c}" for md, c in zip(metadata, chunks)]
+
+
+def save_embeddings(out_dir, embeddings):
+    """与 docstore 行对齐的向量写成 out_dir/embeddings.npy：已经写在别处的 memmap 直接改名过去。"""
+    emb_path = os.path.join(out_dir, "embeddings.npy")
+    src = getattr(embeddings, "filename", None)
+    if src is None:
+        np.save(emb_path, embeddings)
+    else:
+        embeddings.flush()
+        os.replace(src, emb_path)
+
+
+def write_store_files(out_dir, index, metadata, chunks):
+    faiss.write_index(index, os.path.join(out_dir, "index.faiss"))
+
+    # chunk 正文和 metadata 写成列式 docstore（正文只存一份，见 doc_store.py）
+    write_doc_store(os.path.join(out_dir, "docstore"), chunks, metadata)
+
+    write_bm25(os.path.join(out_dir, "bm25"), bm25_docs(metadata, chunks))
+
+
+def save_vector_store(
+    embeddings, metadata, chunks, index_kind=None, index_params=None, dedup=None, dup_rows=()
+):
     if embeddings.shape[0] == 0:
         print("❌ ERROR: No embeddings generated. Cannot save vector store.")
         return
 
-    index = faiss.IndexFlatL2(embeddings.shape[1])
-    index.add(embeddings)
-
-    faiss.write_index(index, f"{VECTOR_DIR}/index.faiss")
+    index_kind = index_kind or INDEX_KIND
+    index_params = INDEX_PARAMS if index_params is None else index_params
+
+    # 用 IDMap 包一层：每个 chunk 有稳定的 id，增量更新时可以按 id 增删
+    ids = np.arange(embeddings.shape[0], dtype=np.int64)
+    index = build_index(embeddings, ids, kind=index_kind, **index_params)
+
+    for md, vid in zip(metadata, ids):
+        md["id"] = int(vid)
+
+    # 全部写进新的版本目录，写完才发布；中途出错时检索端仍读上一版
+    with new_generation(VECTOR_DIR) as out_dir:
+        write_store_files(out_dir, index, metadata, chunks)
+        save_embeddings(out_dir, embeddings)
+        save_manifest(
+            out_dir,
+            {
+                "next_id": int(embeddings.shape[0]),
+                "index_kind": index_kind,
+                "index_params": index_params,
+                # 查询端据此检查 embedding 模型是否一致
+                "embedder": embedder_info(EMBEDDER),
+                # 去重统计（每个来源文件去掉的 chunk 数）和整行被去重的行，增量更新时用
+                "dedup_removed": dict(dedup.removed) if dedup is not None else {},
+                "dup_rows": [list(r) for r in dup_rows],
+            },
+        )
 
-    with open(f"{VECTOR_DIR}/metadata.json", "w", encoding="utf-8") as f:
-        json.dump(metadata, f, ensure_ascii=False, indent=2)
+    print(f"✅ Vector store saved! (index={index_kind})")
 
-    with open(f"{VECTOR_DIR}/chunks.pkl", "wb") as f:
-        pickle.dump(chunks, f)
 
-    print("✅ Vector store saved!")
+def update_vector_store(csv_files):
+    """
+    增量更新：按 (source, row, 内容哈希) 对比已有向量库，
+    只对新增/变化的行打标签和向量化（与库里已有 chunk 近似重复的会被去掉），追加到现有 index；
+    已删除或已变化的旧行按 id 从 index 中移除（HNSW 不支持删除，
+    改为用 embeddings.npy 直接重建索引，依然不需要重新向量化）。
+    结果写进新的版本目录再发布，当前版本不被改写。
+    返回更新后的 metadata；没有可用的旧向量库时返回 None。
+    """
+    store_dir = current_dir(VECTOR_DIR)
+    idx_path = os.path.join(store_dir, "index.faiss")
+    emb_path = os.path.join(store_dir, "embeddings.npy")
+    docstore_dir = os.path.join(store_dir, "docstore")
+    bm25_dir = os.path.join(store_dir, "bm25")
+    manifest = load_manifest(store_dir)
+    if not (
+        os.path.exists(idx_path)
+        and os.path.exists(os.path.join(docstore_dir, "meta.json"))
+        and "next_id" in manifest
+    ):
+        print("⚠️ 没有找到可增量更新的向量库，改为全量构建。")
+        return None
+
+    index = faiss.read_index(idx_path)
+    # 换了 embedding 模型时新旧向量不在同一空间，不能增量追加
+    check_compatible(manifest.get("embedder"), EMBEDDER, dim=index.d)
+    chunks, metadata = DocStore(docstore_dir).to_records()
+
+    # embeddings.npy 与 metadata 按行对齐：新向量要追加进去，HNSW 重建、精确重排和混合检索补分
+    # 都靠它；缺失或行数对不上时增量结果会没有向量文件，直接改为全量构建
+    old_emb = np.load(emb_path, mmap_mode="r") if os.path.exists(emb_path) else None
+    if old_emb is None or old_emb.shape[0] != len(metadata):
+        print("⚠️ embeddings.npy 缺失或与 metadata 行数不一致，改为全量构建。")
+        return None
+
+    old_rows = {(md["source"], md["row"]): md.get("row_hash") for md in metadata}
+    # 上次整行被去重的行没有 chunk，也要参与比对，否则每次都会被当作新行
+    old_dup_rows = [tuple(r) for r in manifest.get("dup_rows", [])]
+    for source, row, h in old_dup_rows:
+        old_rows[(source, row)] = h
+
+    rows, failed = read_rows(csv_files)
+
+    # 先按 (source, row, hash) 精确匹配
+    matched = {}  # 旧 (source, row) -> 新行号
+    unmatched = []
+    for i, (source, row, h) in enumerate(
+        zip(rows["source"], rows["row"].tolist(), rows["hash"])
+    ):
+        if old_rows.get((source, row)) == h:
+            matched[(source, row)] = row
+        else:
+            unmatched.append(i)
+
+    # 上方有行被删除/插入时行号会整体偏移，内容没变的按 (source, hash) 认领旧行
+    pool = {}
+    for key, h in old_rows.items():
+        if key not in matched:
+            pool.setdefault((key[0], h), []).append(key)
+    delta = []
+    for i in unmatched:
+        candidates = pool.get((rows["source"][i], rows["hash"][i]))
+        if candidates:
+            matched[candidates.pop()] = int(rows["row"][i])
+        else:
+            delta.append(i)
+
+    # 需要移除的旧行：没被认领的（内容变化或已删除），读取失败的文件除外
+    stale = {k for k in old_rows if k not in matched and k[0] not in failed}
+
+    print(f"Incremental: {len(delta)} new/changed rows, {len(stale)} stale rows")
+    if not delta and not stale:
+        if not os.path.exists(os.path.join(bm25_dir, "meta.json")):
+            # 旧版向量库没有 BM25 倒排表，补建一份（不需要重新向量化）
+            write_bm25(bm25_dir, bm25_docs(metadata, chunks))
+        print("✅ Vector store is up to date.")
+        return metadata
+
+    keep = []
+    removed_ids = []
+    shrunk_cities = set()
+    for i, md in enumerate(metadata):
+        if (md["source"], md["row"]) in stale:
+            removed_ids.append(md["id"])
+            shrunk_cities.add(md["city"])
+        else:
+            keep.append(i)
+
+    # 上次整行被去重的行，重复的那份 chunk 可能正好被删掉或改掉了：
+    # 去重按城市进行，这些城市里的这类行重新分块、去重，仍然重复的会再次记进 dup_rows
+    row_index = {key: i for i, key in enumerate(zip(rows["source"], rows["row"].tolist()))}
+    redo = set()
+    for source, row, _ in old_dup_rows:
+        i = row_index.get((source, matched.get((source, row))))
+        if i is not None and rows["city"][i] in shrunk_cities:
+            redo.add(i)
+    if redo:
+        print(f"Incremental: re-chunking {len(redo)} previously deduplicated rows")
+    delta_rows = take_rows(rows, sorted(redo.union(delta)))
+
+    rebuild = bool(removed_ids) and not supports_remove(index)
+
+    dedup = make_dedup()
+    if dedup is not None:
+        dedup.seed([chunks[i] for i in keep], [metadata[i]["city"] for i in keep])
+    new_chunks, new_meta, new_dup_rows = tag_and_chunk(delta_rows, dedup)
+    report_dedup(dedup)
+    new_vecs = vectorize_chunks(new_chunks)
+    next_id = int(manifest["next_id"])
+    new_ids = np.arange(next_id, next_id + len(new_chunks), dtype=np.int64)
+    for md, vid in zip(new_meta, new_ids):
+        md["id"] = int(vid)
+
+    for i in keep:
+        md = metadata[i]
+        md["row"] = matched.get((md["source"], md["row"]), md["row"])
+    metadata = [metadata[i] for i in keep] + new_meta
+    chunks = [chunks[i] for i in keep] + new_chunks
+
+    merged = np.concatenate([old_emb[keep], new_vecs]).astype(np.float32)
+    del old_emb
+
+    if rebuild:
+        all_ids = np.array([md["id"] for md in metadata], dtype=np.int64)
+        index = build_index(
+            merged,
+            all_ids,
+            kind=manifest.get("index_kind", INDEX_KIND),
+            **manifest.get("index_params", INDEX_PARAMS),
+        )
+    else:
+        if removed_ids:
+            index.remove_ids(np.array(removed_ids, dtype=np.int64))
+        if len(new_chunks):
+            add_vectors(index, new_vecs, new_ids)
+
+    manifest["next_id"] = next_id + len(new_chunks)
+    # 重新分块的行以这次 tag_and_chunk 的结果为准（在 new_dup_rows 里）
+    redone = {(rows["source"][i], int(rows["row"][i])) for i in redo}
+    manifest["dup_rows"] = [
+        [source, matched.get((source, row), row), h]
+        for source, row, h in old_dup_rows
+        if (source, row) not in stale and (source, matched.get((source, row), row)) not in redone
+    ] + [list(r) for r in new_dup_rows]
+    if dedup is not None:
+        removed = Counter(manifest.get("dedup_removed", {}))
+        removed.update(dedup.removed)
+        manifest["dedup_removed"] = dict(removed)
+
+    with new_generation(VECTOR_DIR) as out_dir:
+        write_store_files(out_dir, index, metadata, chunks)
+        save_embeddings(out_dir, merged)
+        save_manifest(out_dir, manifest)
+
+    print(f"✅ Vector store updated: +{len(new_chunks)} chunks, -{len(removed_ids)} chunks")
+    return metadata
 
 
 # -----------------------
@@ -289,13 +658,60 @@ def build_city_vibes(metadata):
 # Main
 # -----------------------
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="构建/更新游记向量库")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="只处理新增/变化/删除的 CSV 行，追加到已有向量库",
+    )
+    parser.add_argument(
+        "--index",
+        choices=INDEX_KINDS,
+        default=INDEX_KIND,
+        help="全量构建时使用的索引类型",
+    )
+    parser.add_argument("--nlist", type=int, help="IVF 聚类中心数（默认 4*sqrt(n)）")
+    parser.add_argument("--pq-m", type=int, help="IVF-PQ 子量化器个数，需整除向量维度")
+    parser.add_argument("--hnsw-m", type=int, help="HNSW 每个节点的邻居数")
+    parser.add_argument("--metric", choices=METRICS, help="l2（默认）或 cosine（归一化后内积）")
+    parser.add_argument("--sq", choices=tuple(SQ_TYPES), help="标量量化存储：fp16 / int8")
+    parser.add_argument(
+        "--embedder",
+        choices=tuple(EMBEDDERS),
+        default=EMBEDDER,
+        help="embedding 模型（默认取 RAG_EMBEDDER），换模型需要全量构建",
+    )
+    args = parser.parse_args()
+    EMBEDDER = args.embedder
+
+    index_params = dict(INDEX_PARAMS)
+    for key in ("nlist", "pq_m", "hnsw_m", "metric", "sq"):
+        if getattr(args, key) is not None:
+            index_params[key] = getattr(args, key)
+
     csv_files = load_all_csv()
-    chunks, metadata = build_chunks(csv_files)
 
-    # 先构建城市关键词总表
-    build_city_vibes(metadata)
+    metadata = update_vector_store(csv_files) if args.incremental else None
 
-    # 再向量化并保存向量库
-    embeddings = vectorize_chunks(chunks)
-    print("Embeddings shape:", embeddings.shape)
-    save_vector_store(embeddings, metadata, chunks)
\ No newline at end of file
+    if metadata is None:
+        dedup = make_dedup()
+        chunks, metadata, dup_rows = build_chunks(csv_files, dedup)
+        report_dedup(dedup)
+
+        # 再向量化并保存向量库；向量先写到 embeddings.new.npy，save_vector_store 把它移进新版本目录
+        embeddings = vectorize_chunks(
+            chunks, out_path=os.path.join(VECTOR_DIR, "embeddings.new.npy")
+        )
+        print("Embeddings shape:", embeddings.shape)
+        save_vector_store(
+            embeddings,
+            metadata,
+            chunks,
+            index_kind=args.index,
+            index_params=index_params,
+            dedup=dedup,
+            dup_rows=dup_rows,
+        )
+
+    # 城市关键词总表总是按最新的 metadata 重新聚合
+    build_city_vibes(metadata)
@@ -0,0 +1,48 @@
+# itinerary.py
+"""
+解析大模型输出的行程文本（app.py 展示 / 收藏用）。
+不依赖 streamlit，可以单独 import（benchmarks/suite.py 会测这里的函数）。
+"""
+import re
+
+# 匹配类似 "Eiffel Tower", "Louvre Museum", "Notre Dame Cathedral"
+PLACE_PATTERN = re.compile(r"\b([A-Z][a-z]+(?:\s+(?:of|the|and|de|la|du|des|[A-Z][a-z]+)){1,3})\b")
+PLACE_STOPWORDS = {"Day", "Morning", "Afternoon", "Evening", "注意事项"}
+
+DAY_PATTERN = re.compile(r"(Day\s*\d+[^\n]*)([\s\S]*?)(?=Day\s*\d+|$)", flags=re.IGNORECASE)
+
+
+def extract_places(text: str):
+    """
+    提取可能是景点/地点的英文短语：
+    - 至少两个单词
+    - 大写开头
+    - 排除 Day / Morning / Afternoon / Evening 等无关词
+    """
+    matches = PLACE_PATTERN.findall(text)
+
+    cleaned = []
+    for m in matches:
+        head = m.split()[0]
+        if head in PLACE_STOPWORDS:
+            continue
+        cleaned.append(m.strip())
+
+    return sorted(set(cleaned))
+
+
+def parse_days(answer: str):
+    """
+    解析模型输出中的 Day 1 / Day 2 / ... 段落。
+    返回: [{'day': 'Day 1 ｜ ...', 'text': '该天对应的全部文本'}, ...]
+    """
+    matches = DAY_PATTERN.findall(answer)
+    blocks = []
+    if matches:
+        for title, body in matches:
+            full = (title + "\n" + body).strip()
+            blocks.append({"day": title.strip(), "text": full})
+    else:
+        # 兜底：如果没匹配到，就把全文当成一个 Day 1
+        blocks.append({"day": "Day 1", "text": answer})
+    return blocks
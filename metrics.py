@@ -0,0 +1,396 @@
+# metrics.py
+"""
+轻量级 tracing / metrics：只依赖标准库，关掉时开销只剩两次 perf_counter。
+
+    with span("embed"):                 # 阶段耗时 -> rag_stage_seconds{stage="embed"} 直方图
+        ...
+    with Trace("generate_answer"):      # 一次请求：收集期间的所有 span，结束时可写 JSON 日志
+        ...
+    inc("rag_llm_tokens_total", 123, kind="prompt")
+    register_source("retrieval", rag_retrieval.cache_stats)   # 导出时读取缓存命中率
+
+导出：prometheus_text()（Prometheus 文本格式）/ snapshot()（JSON），
+RAG_METRICS_PORT 设置后 start_http_server() 提供 /metrics 与 /metrics.json。
+RAG_TRACE_LOG 设置后每个请求结束时追加一行 JSON 到该文件。
+
+剖析：RAG_PROFILE=cprofile（或 pyinstrument）时对进程里的第一个请求做一次剖析，
+也可以随时调用 profile_next() 剖析下一个请求；结果写到 RAG_PROFILE_DIR。
+"""
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENABLED = os.getenv("RAG_METRICS", "1") != "0"
+TRACE_LOG = os.getenv("RAG_TRACE_LOG")
+PROFILE_DIR = os.getenv("RAG_PROFILE_DIR", "./profiles")
+METRICS_PORT = os.getenv("RAG_METRICS_PORT")
+
+# 秒；覆盖从 1ms 的缓存命中到 60s 的大模型长回答
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RECENT_TRACES = 50
+
+_lock = threading.Lock()
+_histograms = {}  # name -> {labels: [bucket counts..., sum, count]}
+_counters = {}  # name -> {labels: value}
+_sources = {}  # name -> fn() -> 缓存统计 dict
+_recent = deque(maxlen=RECENT_TRACES)
+_current = contextvars.ContextVar("rag_trace", default=None)
+_profile_next = os.getenv("RAG_PROFILE") or None
+
+
+def _labels_key(labels: dict) -> tuple:
+    if len(labels) == 1:  # 最常见的情况（stage=...），省掉排序
+        return tuple(labels.items())
+    return tuple(sorted(labels.items()))
+
+
+# ======================
+# 直方图 / 计数器
+# ======================
+def observe(name: str, seconds: float, **labels):
+    if not ENABLED:
+        return
+    key = _labels_key(labels)
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        row = series.get(key)
+        if row is None:
+            row = series[key] = [0] * len(BUCKETS) + [0.0, 0]
+        i = bisect_left(BUCKETS, seconds)
+        if i < len(BUCKETS):
+            row[i] += 1
+        row[-2] += seconds
+        row[-1] += 1
+
+
+def inc(name: str, value: float = 1, **labels):
+    if not ENABLED:
+        return
+    key = _labels_key(labels)
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[key] = series.get(key, 0) + value
+
+
+def register_source(name: str, fn):
+    """fn() 返回一个缓存的 stats()（含 hits / misses），或 {子名字: stats()}。"""
+    _sources[name] = fn
+
+
+def _flatten_stats(prefix: str, stats, out: dict):
+    """含 hits 的 dict 是一个缓存的统计；其余 dict 按层级展开，名字用 . 连接（如 retrieval.results.memory）。"""
+    if not isinstance(stats, dict):
+        return
+    if "hits" in stats:
+        out[prefix] = stats
+        return
+    for sub, s in stats.items():
+        _flatten_stats(f"{prefix}.{sub}", s, out)
+
+
+def _cache_stats() -> dict:
+    out = {}
+    for name, fn in list(_sources.items()):
+        try:
+            stats = fn()
+        except Exception:
+            continue
+        _flatten_stats(name, stats, out)
+    return out
+
+
+# ======================
+# span / trace
+# ======================
+class span:
+    """
+    计时一个阶段：总是记录 seconds / ms（调用方可以直接读），
+    ENABLED 时再写进直方图和当前 Trace。trace 不给时用当前上下文里的 Trace。
+    """
+
+    __slots__ = ("name", "attrs", "trace", "t0", "seconds")
+
+    def __init__(self, name: str, trace=None, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.trace = trace
+        self.seconds = 0.0
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self.t0
+        if ENABLED:
+            observe("rag_stage_seconds", self.seconds, stage=self.name)
+            trace = self.trace or _current.get()
+            if trace is not None:
+                trace.add(self, error=exc_type.__name__ if exc_type else None)
+        return False
+
+    @property
+    def ms(self) -> float:
+        return self.seconds * 1000
+
+
+def timed(prefix: str):
+    """装饰器：每次调用记一个 "{prefix}.{函数名}" 的 span。"""
+
+    def decorate(fn):
+        name = f"{prefix}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+class Trace:
+    """
+    一次请求的所有 span。with Trace(...) 期间它是当前 trace；
+    auto_finish=False 时退出 with 不结束（流式回答在生成器读完后再调用 finish()，
+    其间可以再次 with 同一个 trace）。
+    """
+
+    def __init__(self, name: str, auto_finish: bool = True, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.auto_finish = auto_finish
+        self.spans = []
+        self.t0 = time.perf_counter()
+        self.started_at = time.time()
+        self.finished = False
+        self._tokens = []
+        self._profiler = _start_profile() if ENABLED and _profile_next else None
+
+    def __enter__(self):
+        self._tokens.append(_current.set(self))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._tokens.pop())
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        if self.auto_finish or exc_type is not None:
+            self.finish()
+        return False
+
+    def add(self, sp: span, error: str | None = None):
+        entry = {
+            "name": sp.name,
+            "start_ms": round((sp.t0 - self.t0) * 1000, 3),
+            "ms": round(sp.ms, 3),
+        }
+        if sp.attrs:
+            entry.update(sp.attrs)
+        if error:
+            entry["error"] = error
+        self.spans.append(entry)
+
+    def finish(self):
+        if self.finished:
+            return
+        self.finished = True
+        seconds = time.perf_counter() - self.t0
+        if self._profiler is not None:
+            self.attrs["profile"] = _stop_profile(self._profiler, self.name)
+        if not ENABLED:
+            return
+        observe("rag_request_seconds", seconds, trace=self.name)
+        record = {
+            "trace": self.name,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+            "ms": round(seconds * 1000, 3),
+            **self.attrs,
+            "spans": self.spans,
+        }
+        _recent.append(record)
+        if TRACE_LOG:
+            with _lock, open(TRACE_LOG, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+
+def current_trace():
+    return _current.get()
+
+
+# ======================
+# 剖析（cProfile / pyinstrument）
+# ======================
+def profile_next(kind: str = "cprofile"):
+    """剖析下一个开始的 Trace（只剖析它所在的线程）。kind：cprofile / pyinstrument。"""
+    global _profile_next
+    _profile_next = kind
+
+
+def _start_profile():
+    global _profile_next
+    with _lock:
+        kind, _profile_next = _profile_next, None
+    if kind is None:
+        return None
+    if kind == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+
+            profiler = Profiler()
+            profiler.start()
+            return kind, profiler
+        except ImportError:
+            print("⚠️ 没有安装 pyinstrument，改用 cProfile")
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return "cprofile", profiler
+
+
+def _stop_profile(handle, name: str) -> str:
+    kind, profiler = handle
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stem = os.path.join(PROFILE_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}")
+    if kind == "pyinstrument":
+        profiler.stop()
+        path = stem + ".html"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(profiler.output_html())
+    else:
+        import pstats
+
+        profiler.disable()
+        path = stem + ".prof"
+        profiler.dump_stats(path)
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+    print(f"📈 profile of {name} written to {path}")
+    return path
+
+
+# ======================
+# 导出
+# ======================
+def _fmt_labels(key: tuple, extra: tuple = ()) -> str:
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in items) + "}"
+
+
+def _quantile(row: list, q: float) -> float | None:
+    """按桶估计分位数（取桶上界），没有样本时为 None。"""
+    count = row[-1]
+    if not count:
+        return None
+    target = q * count
+    seen = 0
+    for bound, n in zip(BUCKETS, row):
+        seen += n
+        if seen >= target:
+            return bound
+    return float("inf")
+
+
+def prometheus_text() -> str:
+    lines = []
+    with _lock:
+        histograms = {name: {k: list(v) for k, v in series.items()} for name, series in _histograms.items()}
+        counters = {name: dict(series) for name, series in _counters.items()}
+    for name, series in sorted(histograms.items()):
+        lines.append(f"# TYPE {name} histogram")
+        for key, row in sorted(series.items()):
+            cumulative = 0
+            for bound, n in zip(BUCKETS, row):
+                cumulative += n
+                lines.append(f"{name}_bucket{_fmt_labels(key, (('le', repr(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{_fmt_labels(key, (('le', '+Inf'),))} {row[-1]}")
+            lines.append(f"{name}_sum{_fmt_labels(key)} {row[-2]}")
+            lines.append(f"{name}_count{_fmt_labels(key)} {row[-1]}")
+    for name, series in sorted(counters.items()):
+        lines.append(f"# TYPE {name} counter")
+        for key, value in sorted(series.items()):
+            lines.append(f"{name}{_fmt_labels(key)} {value}")
+    caches = _cache_stats()
+    for metric, field, kind in (
+        ("rag_cache_hits_total", "hits", "counter"),
+        ("rag_cache_misses_total", "misses", "counter"),
+        ("rag_cache_hit_ratio", "hit_rate", "gauge"),
+    ):
+        if caches:
+            lines.append(f"# TYPE {metric} {kind}")
+        for cache, stats in sorted(caches.items()):
+            lines.append(f"{metric}{_fmt_labels((('cache', cache),))} {stats.get(field, 0)}")
+    return "\n".join(lines) + "\n"
+
+
+def snapshot(traces: int = 10) -> dict:
+    """JSON 友好的汇总：各阶段次数/总耗时/估计 p50、p99，计数器，缓存命中率，最近的 trace。"""
+    with _lock:
+        histograms = {name: {k: list(v) for k, v in series.items()} for name, series in _histograms.items()}
+        counters = {name: dict(series) for name, series in _counters.items()}
+        recent = list(_recent)[-traces:] if traces else []
+    out = {"histograms": {}, "counters": {}, "caches": _cache_stats(), "recent_traces": recent}
+    for name, series in histograms.items():
+        out["histograms"][name] = {
+            ",".join(f"{k}={v}" for k, v in key) or "-": {
+                "count": row[-1],
+                "sum_s": row[-2],
+                "p50_s": _quantile(row, 0.5),
+                "p99_s": _quantile(row, 0.99),
+            }
+            for key, row in series.items()
+        }
+    for name, series in counters.items():
+        out["counters"][name] = {",".join(f"{k}={v}" for k, v in key) or "-": v for key, v in series.items()}
+    return out
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _recent.clear()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, ctype = prometheus_text().encode("utf-8"), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body = json.dumps(snapshot(), ensure_ascii=False, default=str).encode("utf-8")
+            ctype = "application/json; charset=utf-8"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+
+
+def start_http_server(port: int | None = None, host: str = "127.0.0.1"):
+    """在后台线程提供 /metrics 与 /metrics.json；port 不给时用 RAG_METRICS_PORT，都没有则不启动。"""
+    global _server
+    port = port or (int(METRICS_PORT) if METRICS_PORT else None)
+    if port is None or _server is not None:
+        return _server
+    _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    return _server
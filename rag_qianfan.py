@@ -1,4 +1,6 @@
 import os
+import threading
+import time
 from typing import List, Dict
 import json
 from collections import Counter
@@ -6,7 +8,11 @@ from collections import Counter
 from dotenv import load_dotenv
 from openai import OpenAI
 
-from rag_retrieval import search
+from cache import make_backend, make_key
+from metrics import Trace, inc, observe, register_source, span
+from rag_retrieval import search, warm_up as warm_up_retrieval
+from retrieval_client import RetrievalClient
+from reranker import rerank as rerank_candidates, warm_up as warm_up_reranker
 
 
 # ======================
@@ -18,12 +24,157 @@ API_KEY = os.getenv("QIANFAN_API_KEY")
 if not API_KEY:
     raise RuntimeError("QIANFAN_API_KEY 未设置，请在 .env 中配置。")
 
+# 大模型单次请求的超时（秒），避免接口卡住时页面一直转圈
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+
+# 千帆 OpenAI 兼容接口地址（可指向代理或本地替身服务）
+QIANFAN_BASE_URL = os.getenv("QIANFAN_BASE_URL", "https://qianfan.baidubce.com/v2")
+
 client = OpenAI(
     api_key=API_KEY,
-    base_url="https://qianfan.baidubce.com/v2",
+    base_url=QIANFAN_BASE_URL,
+    timeout=LLM_TIMEOUT,
 )
 
 DEFAULT_MODEL = "ernie-speed-8k"
+SYSTEM_PROMPT = "你是一名严谨、专业的中文旅行规划顾问。"
+MAX_TOKENS = 1500
+
+
+# ======================
+# 大模型回答缓存（key = 模型 + 温度 + 完整 prompt）
+# ======================
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory")  # memory / sqlite / disk / off
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./vector_store/llm_cache")
+LLM_CACHE_SIZE = 256
+LLM_CACHE_TTL = 24 * 3600
+# temperature > 0 时同一 prompt 的回答本来就会变化；设为 0 则只缓存 temperature == 0 的请求
+LLM_CACHE_SAMPLED = os.getenv("LLM_CACHE_SAMPLED", "1") != "0"
+
+_llm_cache = make_backend(
+    LLM_CACHE_BACKEND,
+    path=LLM_CACHE_PATH + ".sqlite" if LLM_CACHE_BACKEND == "sqlite" else LLM_CACHE_PATH,
+    maxsize=LLM_CACHE_SIZE,
+    ttl=LLM_CACHE_TTL,
+)
+
+
+def llm_cache_stats() -> dict:
+    return _llm_cache.stats() if _llm_cache is not None else {}
+
+
+register_source("llm", llm_cache_stats)
+
+
+# ======================
+# 交叉编码器重排 & 分阶段耗时
+# ======================
+# 检索多取 RERANK_CANDIDATES 条，用交叉编码器重排后只留 top_k（见 reranker.py）
+RERANK = os.getenv("RAG_RERANK", "1") != "0"
+RERANK_CANDIDATES = 50
+
+# 每个线程最近一次 prepare_prompt / generate_answer 的分阶段耗时（毫秒）；
+# 同样的阶段也以 span 记进 metrics（直方图 / trace 日志，见 metrics.py）
+_timings = threading.local()
+
+
+def last_timings() -> dict:
+    """
+    当前线程最近一次请求的分阶段耗时，例如：
+    {"retrieve_ms": .., "rerank_ms": .., "rerank": {...reranker.rerank 的 info}, "prompt_ms": ..,
+     "llm_first_token_ms": ..（流式）, "llm_ms": ..}
+    """
+    return dict(getattr(_timings, "last", {}))
+
+
+def _elapsed_ms(t0: float) -> float:
+    return (time.perf_counter() - t0) * 1000
+
+
+# ======================
+# 检索：进程内，或交给独立的检索服务
+# ======================
+# 设置 RAG_RETRIEVAL_URL（如 http://127.0.0.1:8765，见 retrieval_server.py）后，
+# 检索请求发给检索服务，与其他会话的查询合批处理，本进程不再加载 embedding 模型和索引
+RETRIEVAL_URL = os.getenv("RAG_RETRIEVAL_URL")
+RETRIEVAL_READY_TIMEOUT = 120.0  # 预热时最多等检索服务就绪的秒数
+
+_retrieval_client = RetrievalClient(RETRIEVAL_URL) if RETRIEVAL_URL else None
+
+
+def retrieve(query: str, top_k: int = 5, filters: dict | None = None) -> List[Dict]:
+    if _retrieval_client is not None:
+        return _retrieval_client.search(query, top_k=top_k, filters=filters)
+    return search(query, top_k=top_k, filters=filters)
+
+
+def _wait_retrieval_server() -> dict:
+    """轮询检索服务的 /health，就绪后返回它的预热耗时；超时或预热失败时抛 RuntimeError。"""
+    deadline = time.monotonic() + RETRIEVAL_READY_TIMEOUT
+    while True:
+        health = _retrieval_client.health()
+        if health["ready"]:
+            return {f"server_{k}": v for k, v in health["timings"].items()}
+        if health["state"] == "error" or time.monotonic() > deadline:
+            raise RuntimeError(f"retrieval server at {RETRIEVAL_URL} not ready: {health}")
+        time.sleep(0.5)
+
+
+# ======================
+# 启动预热 & 就绪探针
+# ======================
+# 本模块 import 时不加载 torch / faiss；app 启动后调用 start_warmup() 在后台加载，
+# 模型和向量库是进程级的，所有会话共用（每个进程只预热一次）；
+# 使用检索服务时改为等它的 /health 就绪（重排模型仍在本进程加载）
+_warmup = {"state": "cold", "error": None, "timings": {}}
+_warmup_lock = threading.Lock()
+_warmup_done = threading.Event()
+
+
+def start_warmup() -> bool:
+    """后台线程加载检索模型、向量库和重排模型；已经启动过时什么都不做，返回 False。"""
+    with _warmup_lock:
+        if _warmup["state"] != "cold":
+            return False
+        _warmup["state"] = "loading"
+    threading.Thread(target=_run_warmup, name="rag-warmup", daemon=True).start()
+    return True
+
+
+def _run_warmup():
+    t0 = time.perf_counter()
+    try:
+        timings = _wait_retrieval_server() if _retrieval_client is not None else warm_up_retrieval()
+        if RERANK:
+            t = time.perf_counter()
+            timings["reranker_ms"] = _elapsed_ms(t) if warm_up_reranker() else None
+        timings["total_ms"] = _elapsed_ms(t0)
+        _warmup.update(state="ready", timings=timings)
+        print(f"✅ RAG warm-up done in {timings['total_ms'] / 1000:.1f}s")
+    except Exception as e:
+        # 预热失败不影响服务：请求到来时仍会按需加载，并把真正的错误抛给调用方
+        _warmup.update(state="error", error=repr(e), timings={"total_ms": _elapsed_ms(t0)})
+        print("⚠️ RAG warm-up failed:", e)
+    finally:
+        _warmup_done.set()
+
+
+def readiness() -> dict:
+    """就绪探针：{"ready": bool, "state": cold / loading / ready / error, "error": .., "timings": {..}}。"""
+    return {
+        "ready": _warmup["state"] == "ready",
+        "state": _warmup["state"],
+        "error": _warmup["error"],
+        "timings": dict(_warmup["timings"]),
+    }
+
+
+def wait_ready(timeout: float | None = None) -> bool:
+    """等预热结束（成功或失败），返回是否就绪；没有调用过 start_warmup 时立即返回 False。"""
+    if _warmup["state"] == "cold":
+        return False
+    _warmup_done.wait(timeout)
+    return _warmup["state"] == "ready"
 
 
 # ======================
@@ -84,64 +235,74 @@ def collect_vibes(retrieved: List[Dict], top_k: int = 8) -> list[str]:
 
 
 # ======================
-# 生成最终回答（主函数）
+# 检索 + 构造 Prompt
 # ======================
-def generate_answer(
+def prepare_prompt(
     user_question: str,
     days: int,
     top_k: int = 5,
-    model: str = DEFAULT_MODEL,
-    temperature: float = 0.3,
     city: str | None = None,
+    rerank: bool | None = None,
 ):
-    """根据用户问题 + 天数 + 检索结果，生成结构化行程"""
+    """
+    检索 + 构造 prompt（STEP 1–5），返回 (prompt, retrieved)，普通/流式生成共用。
+    rerank：是否多取候选再用交叉编码器重排（None 用 RERANK）；各阶段耗时见 last_timings()。
+    """
+    timings = {}
+    _timings.last = timings
 
     days = max(1, min(days, 7))  # 限制天数范围
+    rerank = RERANK if rerank is None else rerank
+    fetch_k = max(top_k, RERANK_CANDIDATES) if rerank else top_k
 
     # --------------------
-    # STEP 1 检索
+    # STEP 1 检索（按城市过滤在索引内完成）
     # --------------------
-    retrieved = search(user_question, top_k=top_k)
+    with span("retrieve", top_k=fetch_k) as sp:
+        retrieved = []
+        if city:
+            retrieved = retrieve(user_question, top_k=fetch_k, filters={"city": city})
+
+        # --------------------
+        # STEP 2 语料里没有该城市时，fallback 使用非过滤检索
+        # --------------------
+        if not retrieved:
+            retrieved = retrieve(user_question, top_k=fetch_k)
+    timings["retrieve_ms"] = sp.ms
 
     # --------------------
-    # STEP 2 按城市过滤
+    # STEP 2.1 交叉编码器重排，超出延迟预算时退回检索顺序
     # --------------------
-    if city:
-        city_l = city.strip().lower()
-        filtered = []
-        for r in retrieved:
-            md = r.get("metadata", {}) or {}
-            md_city = str(md.get("city", "")).lower()
-            if md_city and md_city == city_l:
-                filtered.append(r)
-
-        # 若过滤后没有结果，则 fallback 使用非过滤检索
-        if filtered:
-            retrieved = filtered
+    if rerank:
+        with span("rerank", candidates=len(retrieved)) as sp:
+            retrieved, timings["rerank"] = rerank_candidates(user_question, retrieved, top_k=top_k)
+        timings["rerank_ms"] = sp.ms
+    retrieved = retrieved[:top_k]
 
     # --------------------
     # STEP 3：上下文
     # --------------------
-    context = build_context(retrieved)
-
-    # --------------------
-    # STEP 4：提炼 vibes
-    # --------------------
-    vibes_from_data = collect_vibes(retrieved)
-
-    # STEP 4.1 同时加载全城市 vibes.json（更稳）
-    city_vibes = []
-    if city:
-        key = city.strip().lower()
-        if key in CITY_VIBES:
-            city_vibes = CITY_VIBES[key].get("vibes", [])
-
-    # STEP 4.2 合并两种 vibes（检索 + 全局）
-    merged = list(dict.fromkeys(vibes_from_data + city_vibes))  # 去重保持顺序
-    if len(merged) == 0:
-        vibe_str = "（暂无关键词）"
-    else:
-        vibe_str = "、".join(merged[:12])  # 最多取 12 个，更自然
+    with span("prompt") as sp:
+        context = build_context(retrieved)
+
+        # --------------------
+        # STEP 4：提炼 vibes
+        # --------------------
+        vibes_from_data = collect_vibes(retrieved)
+
+        # STEP 4.1 同时加载全城市 vibes.json（更稳）
+        city_vibes = []
+        if city:
+            key = city.strip().lower()
+            if key in CITY_VIBES:
+                city_vibes = CITY_VIBES[key].get("vibes", [])
+
+        # STEP 4.2 合并两种 vibes（检索 + 全局）
+        merged = list(dict.fromkeys(vibes_from_data + city_vibes))  # 去重保持顺序
+        if len(merged) == 0:
+            vibe_str = "（暂无关键词）"
+        else:
+            vibe_str = "、".join(merged[:12])  # 最多取 12 个，更自然
 
     # --------------------
     # STEP 5：构造 Prompt
@@ -185,33 +346,165 @@ def generate_answer(
 
 请严格按上述结构输出，不要加入额外解释。
 """
+    timings["prompt_ms"] = sp.ms
 
-    # --------------------
-    # STEP 6：调用模型
-    # --------------------
-    resp = client.chat.completions.create(
-        model=model,
-        messages=[
-            {
-                "role": "system",
-                "content": "你是一名严谨、专业的中文旅行规划顾问。",
-            },
-            {"role": "user", "content": prompt},
-        ],
-        temperature=temperature,
-        max_tokens=1500,
-    )
+    return prompt, retrieved
 
-    # --------------------
-    # STEP 7：兼容解析输出
-    # --------------------
-    content = ""
-    try:
-        content = resp.choices[0].message["content"]
-    except:
+
+def _messages(prompt: str) -> list[dict]:
+    return [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT,
+        },
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _cache_key(prompt: str, model: str, temperature: float, use_cache: bool | None):
+    """返回本次请求的缓存 key；不走缓存时返回 None。"""
+    if use_cache is None:
+        use_cache = temperature == 0 or LLM_CACHE_SAMPLED
+    if not use_cache or _llm_cache is None:
+        return None
+    return make_key(model, temperature, MAX_TOKENS, SYSTEM_PROMPT, prompt)
+
+
+# ======================
+# 生成最终回答（主函数）
+# ======================
+def generate_answer(
+    user_question: str,
+    days: int,
+    top_k: int = 5,
+    model: str = DEFAULT_MODEL,
+    temperature: float = 0.3,
+    city: str | None = None,
+    use_cache: bool | None = None,
+    rerank: bool | None = None,
+):
+    """
+    根据用户问题 + 天数 + 检索结果，生成结构化行程。
+    use_cache：None 时按 LLM_CACHE_SAMPLED 决定 temperature > 0 是否走缓存；
+    True / False 强制使用 / 跳过缓存。
+    rerank：见 prepare_prompt；各阶段耗时见 last_timings()。
+    """
+    with Trace("generate_answer", model=model, city=city, days=days) as trace:
+        prompt, retrieved = prepare_prompt(user_question, days, top_k=top_k, city=city, rerank=rerank)
+        timings = _timings.last
+
+        # --------------------
+        # STEP 6：调用模型
+        # --------------------
+        cache_key = _cache_key(prompt, model, temperature, use_cache)
+        if cache_key:
+            cached = _llm_cache.get(cache_key)
+            if cached is not None:
+                timings["llm_ms"] = 0.0
+                trace.attrs["llm_cached"] = True
+                return cached, retrieved
+
+        with span("llm", model=model) as sp:
+            resp = client.chat.completions.create(
+                model=model,
+                messages=_messages(prompt),
+                temperature=temperature,
+                max_tokens=MAX_TOKENS,
+            )
+        timings["llm_ms"] = sp.ms
+        _record_usage(getattr(resp, "usage", None), model, trace)
+
+        # --------------------
+        # STEP 7：兼容解析输出
+        # --------------------
+        content = ""
         try:
-            content = resp.choices[0].message.content
+            content = resp.choices[0].message["content"]
         except:
-            content = str(resp)
+            try:
+                content = resp.choices[0].message.content
+            except:
+                content = str(resp)
+                cache_key = None  # 解析失败的结果不缓存
+
+        if cache_key and content:
+            _llm_cache.set(cache_key, content)
+
+        return content, retrieved
 
-    return content, retrieved
\ No newline at end of file
+
+def generate_answer_stream(
+    user_question: str,
+    days: int,
+    top_k: int = 5,
+    model: str = DEFAULT_MODEL,
+    temperature: float = 0.3,
+    city: str | None = None,
+    use_cache: bool | None = None,
+    rerank: bool | None = None,
+):
+    """
+    generate_answer 的流式版本：先同步完成检索，返回 (tokens, retrieved)。
+    tokens 是生成器，随模型输出逐段 yield 文本；完整读完后结果会写入缓存。
+    命中缓存时一次性 yield 整段回答。
+    last_timings() 里的 llm_first_token_ms / llm_ms 在 tokens 读完后才齐全。
+    """
+    # 检索在这里同步完成，LLM 阶段在 tokens 被读取时才发生：trace 等生成器结束（或被丢弃）时再收尾
+    trace = Trace("generate_answer_stream", auto_finish=False, model=model, city=city, days=days)
+    with trace:
+        prompt, retrieved = prepare_prompt(user_question, days, top_k=top_k, city=city, rerank=rerank)
+    cache_key = _cache_key(prompt, model, temperature, use_cache)
+    timings = _timings.last
+
+    def tokens():
+        try:
+            if cache_key:
+                cached = _llm_cache.get(cache_key)
+                if cached is not None:
+                    timings["llm_ms"] = 0.0
+                    trace.attrs["llm_cached"] = True
+                    yield cached
+                    return
+
+            with span("llm", trace=trace, model=model, stream=True) as sp:
+                stream = client.chat.completions.create(
+                    model=model,
+                    messages=_messages(prompt),
+                    temperature=temperature,
+                    max_tokens=MAX_TOKENS,
+                    stream=True,
+                )
+                parts = []
+                usage = None
+                for chunk in stream:
+                    usage = getattr(chunk, "usage", None) or usage  # 部分服务在最后一个 chunk 附带用量
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        if not parts:
+                            timings["llm_first_token_ms"] = _elapsed_ms(sp.t0)
+                            observe("rag_llm_first_token_seconds", timings["llm_first_token_ms"] / 1000, model=model)
+                        parts.append(delta)
+                        yield delta
+            timings["llm_ms"] = sp.ms
+            _record_usage(usage, model, trace)
+
+            content = "".join(parts)
+            if cache_key and content:
+                _llm_cache.set(cache_key, content)
+        finally:
+            trace.finish()
+
+    return tokens(), retrieved
+
+
+def _record_usage(usage, model: str, trace: Trace):
+    """把接口返回的 token 用量记进 rag_llm_tokens_total 与 trace；没有用量信息时什么都不做。"""
+    if usage is None:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        n = getattr(usage, kind, None)
+        if n:
+            inc("rag_llm_tokens_total", n, kind=kind.split("_")[0], model=model)
+            trace.attrs[kind] = n
@@ -1,70 +1,531 @@
 # rag_retrieval.py
+"""
+向量检索：FAISS 稠密检索 + BM25，docstore 按需读取 chunk。
+
+faiss / sentence_transformers（torch）在第一次用到时才 import，import 本模块本身很快，
+UI 可以先渲染；warm_up() 在后台把模型和向量库加载好（见 rag_qianfan.start_warmup）。
+模型和向量库是进程级全局对象，加载时加锁，所有 Streamlit 会话共用一份。
+"""
 import os
+import copy
 import json
-import pickle
+import threading
+import time
+import unicodedata
+from typing import NamedTuple
 import numpy as np
-from sentence_transformers import SentenceTransformer
-import faiss
+
+from bm25 import BM25Index
+from cache import make_cache, make_key
+from doc_store import DocStore
+from store_generations import current_dir
+from embedders import DEFAULT_EMBEDDER, check_compatible, load_embedder
+from metrics import register_source, span
 
 VECTOR_DIR = "./vector_store"   # 如果你的路径不同，改这里
+EMBEDDER = DEFAULT_EMBEDDER  # 必须与建库时的模型一致（RAG_EMBEDDER，见 embedders.py）
+
+# 查询向量 / 检索结果缓存：设置 RAG_CACHE_PATH 后持久化到 SQLite，跨进程共享
+QUERY_CACHE_SIZE = 2048
+QUERY_CACHE_TTL = 24 * 3600
+RESULT_CACHE_SIZE = 512
+RESULT_CACHE_TTL = 3600
+CACHE_PATH = os.getenv("RAG_CACHE_PATH")
+
+# 混合检索：稠密（FAISS）+ BM25，用倒数排名融合（RRF）合并；向量库里没有 bm25/ 时只用稠密检索
+HYBRID = os.getenv("RAG_HYBRID", "1") != "0"
+HYBRID_DEPTH = 50  # 每一路取的候选数
+RRF_K = 60
+
+# 量化索引（sq=fp16/int8、ivf_pq）的精确重排：多取 EXACT_RERANK_FACTOR 倍候选，
+# 用 embeddings.npy（mmap，不占常驻内存）里的原始 float32 向量重算分数
+EXACT_RERANK = os.getenv("RAG_EXACT_RERANK", "0") != "0"
+EXACT_RERANK_FACTOR = 4
+
+_query_cache = make_cache(
+    QUERY_CACHE_SIZE, QUERY_CACHE_TTL, CACHE_PATH and CACHE_PATH + ".embeddings"
+)
+_result_cache = make_cache(
+    RESULT_CACHE_SIZE, RESULT_CACHE_TTL, CACHE_PATH and CACHE_PATH + ".results"
+)
+
+# 模型和向量库各只加载一次：后台预热与第一个请求同时到达时，后来者等锁而不是重复加载
+_embedder_lock = threading.Lock()
+_store_lock = threading.Lock()
 
 # 加载本地 embedding 模型（与 ingest 时一致）
 _embedder = None
 def get_embedder():
     global _embedder
     if _embedder is None:
-        _embedder = SentenceTransformer("all-MiniLM-L6-v2")
+        with _embedder_lock:
+            if _embedder is None:
+                _embedder = load_embedder(EMBEDDER)
     return _embedder
 
-# 加载 FAISS index + metadata + chunks
-_index = None
-_metadata = None
-_chunks = None
-def load_vector_store(vector_dir=VECTOR_DIR):
-    global _index, _metadata, _chunks
-    if _index is not None:
-        return _index, _metadata, _chunks
+# 加载 FAISS index + docstore（列式存储，按需读取行）
+class VectorStore(NamedTuple):
+    """一次加载得到的整套向量库。重新加载时整体换成新的快照，一次检索从头到尾只用同一个。"""
+
+    index: object
+    store: DocStore
+    bm25: BM25Index | None
+    embeddings: np.ndarray | None  # embeddings.npy 的 mmap，只在精确重排 / 混合检索补分时读取
+    filter_ids: dict  # {"city": {"paris": ids}, "source_type": {...}, "vibes": {...}}
+    version: tuple  # 向量库文件的版本，进检索结果缓存的 key，重建后旧结果自动失效
+    path: str  # VECTOR_DIR（不是版本目录），重新加载时按 CURRENT 再找一次
+
+
+_snapshot: VectorStore | None = None
+# ingest 重写向量库后，每隔这么多秒比对一次文件版本，变了就重新加载
+# （旧快照的 mmap 在没有请求引用后释放）
+STORE_CHECK_INTERVAL = 2.0
+_store_checked = 0.0
+
 
-    idx_path = os.path.join(vector_dir, "index.faiss")
-    meta_path = os.path.join(vector_dir, "metadata.json")
-    chunks_path = os.path.join(vector_dir, "chunks.pkl")
+def _store_version(vector_dir):
+    """
+    当前版本目录（ingest 每次构建发布一个新目录，见 store_generations.py）加上各文件的
+    (修改时间, inode)：旧版布局的向量库和原地补建的 bm25/ 也能发现变化。第一项是版本目录本身。
+    """
+    store_dir = current_dir(vector_dir)
+    version = [store_dir]
+    for name in ("index.faiss", "docstore/meta.json", "bm25/meta.json", "embeddings.npy"):
+        try:
+            st = os.stat(os.path.join(store_dir, name))
+            version.append((st.st_mtime_ns, st.st_ino))
+        except FileNotFoundError:
+            version.append(None)
+    return tuple(version)
+
+
+def load_vector_store(vector_dir=VECTOR_DIR) -> VectorStore:
+    """
+    返回当前的向量库快照，第一次调用时加载。之后每隔 STORE_CHECK_INTERVAL 秒检查一次文件版本，
+    变了就由发现的那个请求重新加载（其他请求不等它，继续用旧快照）；
+    重新加载失败（比如 ingest 还没写完）时保留旧快照，下次检查再试。
+    """
+    global _snapshot, _store_checked
+    snapshot = _snapshot
+    if snapshot is None:
+        with _store_lock:
+            if _snapshot is None:
+                _snapshot = _load_vector_store(vector_dir)
+                _store_checked = time.monotonic()
+            return _snapshot
+
+    if time.monotonic() - _store_checked < STORE_CHECK_INTERVAL:
+        return snapshot
+    if not _store_lock.acquire(blocking=False):
+        return snapshot
+    try:
+        if time.monotonic() - _store_checked < STORE_CHECK_INTERVAL:
+            return _snapshot
+        _store_checked = time.monotonic()
+        if _store_version(_snapshot.path) != _snapshot.version:
+            try:
+                _snapshot = _load_vector_store(_snapshot.path)
+                print("向量库文件已更新，已重新加载。")
+            except Exception as e:
+                print(f"⚠️ 向量库重新加载失败，继续使用已加载的版本：{e}")
+        return _snapshot
+    finally:
+        _store_lock.release()
+
+
+def _load_vector_store(vector_dir) -> VectorStore:
+    import faiss
+
+    # 先定下版本目录再读文件：读的过程中 ingest 发布了新版本时，下次检查会再加载一遍
+    version = _store_version(vector_dir)
+    store_dir = version[0]
+    idx_path = os.path.join(store_dir, "index.faiss")
+    store_path = os.path.join(store_dir, "docstore")
 
     if not os.path.exists(idx_path):
         raise FileNotFoundError(f"FAISS index not found: {idx_path}")
-    if not os.path.exists(meta_path):
-        raise FileNotFoundError(f"metadata.json not found: {meta_path}")
-    if not os.path.exists(chunks_path):
-        raise FileNotFoundError(f"chunks.pkl not found: {chunks_path}")
+    if not os.path.exists(os.path.join(store_path, "meta.json")):
+        raise FileNotFoundError(
+            f"docstore not found: {store_path}"
+            "（旧版 metadata.json + chunks.pkl 可用 python doc_store.py 转换）"
+        )
 
-    _index = faiss.read_index(idx_path)
-    with open(meta_path, "r", encoding="utf-8") as f:
-        _metadata = json.load(f)
-    with open(chunks_path, "rb") as f:
-        _chunks = pickle.load(f)
+    # 先比对建库时的 embedding 模型，不一致时不必再读索引
+    manifest_path = os.path.join(store_dir, "manifest.json")
+    stored = None
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            stored = json.load(f).get("embedder")
+    check_compatible(stored, EMBEDDER)
 
-    return _index, _metadata, _chunks
+    index = faiss.read_index(idx_path)
+    check_compatible(stored, EMBEDDER, dim=index.d)
+    store = DocStore(store_path)
+    bm25_path = os.path.join(store_dir, "bm25")
+    bm25 = BM25Index(bm25_path) if os.path.exists(os.path.join(bm25_path, "meta.json")) else None
+    if bm25 is not None and len(bm25) != len(store):
+        print("⚠️ bm25/ 与 docstore 行数不一致，只使用稠密检索（重新运行 ingest 即可修复）")
+        bm25 = None
+    emb_path = os.path.join(store_dir, "embeddings.npy")
+    embeddings = np.load(emb_path, mmap_mode="r") if os.path.exists(emb_path) else None
+    if embeddings is not None and embeddings.shape[0] != len(store):
+        print("⚠️ embeddings.npy 与 docstore 行数不一致，不做精确重排")
+        embeddings = None
+    return VectorStore(
+        index=index,
+        store=store,
+        bm25=bm25,
+        embeddings=embeddings,
+        filter_ids={col: store.ids_by_value(col) for col in ("city", "source_type", "vibes")},
+        version=version,
+        path=vector_dir,
+    )
 
-def embed_query(query: str):
-    embedder = get_embedder()
-    vec = embedder.encode(query)
-    return np.array(vec).astype("float32")
 
-def search(query: str, top_k: int = 5):
+def warm_up() -> dict:
     """
-    返回 list of dicts: [{ 'score': float, 'chunk': str, 'metadata': {...} }, ...]
+    加载 embedding 模型与向量库（两者互不依赖，并行加载），再各跑一次编码/检索，
+    把 torch 的首次前向和 mmap 缺页都提前付掉；不写查询缓存。返回各步耗时（毫秒）。
     """
-    index, metadata, chunks = load_vector_store()
-    qvec = embed_query(query)
-    if qvec.ndim == 1:
-        qvec = qvec.reshape(1, -1)
-    D, I = index.search(qvec, top_k)
+    timings = {}
+
+    def timed(name, fn):
+        t0 = time.perf_counter()
+        out = fn()
+        timings[name] = (time.perf_counter() - t0) * 1000
+        return out
+
+    loader = threading.Thread(target=timed, args=("embedder_ms", get_embedder), daemon=True)
+    loader.start()
+    vs = timed("index_ms", load_vector_store)
+    loader.join()
+
+    def first_query():
+        # 模型线程出错时这里会重新加载一次并把异常抛给调用方
+        qvec = np.asarray(get_embedder().encode(["warm up"]), dtype=np.float32)
+        _search_matrix(vs.index, qvec, 1, None, None, None)
+        if vs.bm25 is not None:
+            vs.bm25.search("warm up", 1)
+
+    timed("first_query_ms", first_query)
+    return timings
+
+
+def filter_ids(filters: dict | None, vs: VectorStore | None = None):
+    """
+    把过滤条件转成允许的 chunk id 数组；没有有效条件时返回 None（不过滤）。
+    filters 示例：{"city": "paris", "source_type": "reddit", "vibes": ["浪漫", "适合步行"]}
+    - city / source_type 可以是字符串或列表（列表内取并集）；
+    - vibes 命中任意一个即可；
+    - 不同字段之间取交集。
+    vs：在哪个向量库快照上取 id（None 用当前快照），检索时与后续步骤用同一个。
+    """
+    if not filters:
+        return None
+    by_value = (vs or load_vector_store()).filter_ids
+    allowed = None
+    for col in ("city", "source_type", "vibes"):
+        want = filters.get(col)
+        if not want:
+            continue
+        if isinstance(want, str):
+            want = [want]
+        keys = [str(w).strip() if col == "vibes" else str(w).strip().lower() for w in want]
+        arrays = [by_value[col][k] for k in keys if k in by_value[col]]
+        ids = np.unique(np.concatenate(arrays)) if arrays else np.empty(0, dtype=np.int64)
+        allowed = ids if allowed is None else np.intersect1d(allowed, ids, assume_unique=True)
+    return allowed
+
+def normalize_query(query: str) -> str:
+    """缓存用的归一化：NFKC + 合并空白，避免全角/多余换行造成缓存未命中。"""
+    return " ".join(unicodedata.normalize("NFKC", query).split())
+
+
+def _embedding_key(text: str) -> str:
+    """查询向量缓存的 key 带上 embedder 名字，换模型后不会取到旧模型的向量。"""
+    return make_key(EMBEDDER, text)
+
+
+def embed_query(query: str):
+    text = normalize_query(query)
+    key = _embedding_key(text)
+    vec = _query_cache.get(key)
+    if vec is None:
+        embedder = get_embedder()
+        vec = np.array(embedder.encode(text)).astype("float32")
+        _query_cache.set(key, vec)
+    return vec
+
+def embed_queries(queries: list[str], batch_size: int = 64):
+    """一次前向传播批量编码多条查询（已缓存的跳过），返回 (n, dim) float32 矩阵。"""
+    texts = [normalize_query(q) for q in queries]
+    cached = [_query_cache.get(_embedding_key(t)) for t in texts]
+    missing = list(dict.fromkeys(t for t, v in zip(texts, cached) if v is None))
+    if missing:
+        embedder = get_embedder()
+        vecs = embedder.encode(missing, batch_size=batch_size, convert_to_numpy=True)
+        fresh = dict(zip(missing, np.asarray(vecs, dtype=np.float32)))
+        for t, v in fresh.items():
+            _query_cache.set(_embedding_key(t), v)
+        cached = [v if v is not None else fresh[t] for t, v in zip(texts, cached)]
+    return np.ascontiguousarray(np.stack(cached), dtype=np.float32)
+
+
+def cache_stats() -> dict:
+    """查询向量缓存与检索结果缓存的命中/未命中统计。"""
+    return {"query_embeddings": _query_cache.stats(), "results": _result_cache.stats()}
+
+
+register_source("retrieval", cache_stats)
+
+
+def clear_caches():
+    _query_cache.clear()
+    _result_cache.clear()
+
+
+def _filter_key(filters: dict | None):
+    """把 filters 变成可哈希的 key，用于把相同过滤条件的查询分到一组。"""
+    if not filters:
+        return None
+    key = []
+    for col in sorted(filters):
+        want = filters[col]
+        if isinstance(want, str):
+            want = [want]
+        key.append((col, tuple(sorted(str(w) for w in (want or [])))))
+    return tuple(key)
+
+
+def _search_matrix(index, qmat, top_k, allowed, nprobe, ef_search):
+    """对一组共用过滤条件的查询向量做一次 index.search，凑不满的行再穷举补查。"""
+    import faiss
+    from vector_index import exhaustive_params, make_search_params, prepare_vectors
+
+    qmat = prepare_vectors(index, qmat)
+    sel = faiss.IDSelectorBatch(allowed) if allowed is not None else None
+    params = make_search_params(index, nprobe=nprobe, ef_search=ef_search, sel=sel)
+    D, I = index.search(qmat, top_k, params=params)
+
+    # 近似索引 + 过滤条件很严时可能凑不满，用穷举参数补查一次
+    if sel is not None:
+        short = np.flatnonzero((I >= 0).sum(axis=1) < min(top_k, len(allowed)))
+        retry = exhaustive_params(index, sel=sel) if len(short) else None
+        if retry is not None:
+            D[short], I[short] = index.search(qmat[short], top_k, params=retry)
+    return D, I
+
+
+def _exact_rerank(vs, qmat, D, I, top_k):
+    """用原始向量重算 (D, I) 里各候选的分数（度量与索引相同），重新排序后只留前 top_k。"""
+    from vector_index import exact_scores, is_cosine, prepare_vectors
+
+    index, store = vs.index, vs.store
+    qmat = prepare_vectors(index, qmat)
+    cosine = is_cosine(index)
+    outD = np.full((len(I), top_k), -np.inf if cosine else np.inf, dtype=np.float32)
+    outI = np.full((len(I), top_k), -1, dtype=np.int64)
+    for row in range(len(I)):
+        positions = store.positions(I[row])
+        valid = positions >= 0
+        if not valid.any():
+            continue
+        scores = exact_scores(index, qmat[row], vs.embeddings[positions[valid]])
+        order = np.argsort(-scores if cosine else scores, kind="stable")[:top_k]
+        outD[row, : len(order)] = scores[order]
+        outI[row, : len(order)] = I[row][valid][order]
+    return outD, outI
+
+
+def _dense_search(vs, qmat, top_k, allowed, nprobe, ef_search, exact):
+    if not exact:
+        return _search_matrix(vs.index, qmat, top_k, allowed, nprobe, ef_search)
+    D, I = _search_matrix(vs.index, qmat, top_k * EXACT_RERANK_FACTOR, allowed, nprobe, ef_search)
+    with span("retrieval.exact_rerank"):
+        return _exact_rerank(vs, qmat, D, I, top_k)
+
+
+def _to_results(store, dists, ids):
     results = []
-    for dist, idx in zip(D[0], I[0]):
-        # faiss IndexFlatL2 返回欧式距离（越小越相似）
+    positions = store.positions(ids)
+    for dist, pos in zip(dists, positions):
+        if pos < 0:  # -1（结果不足 top_k）或已删除的 id
+            continue
+        # L2 索引是平方欧式距离（越小越相似），cosine 索引是余弦相似度（越大越相似）
         entry = {
             "score": float(dist),
-            "chunk": chunks[idx] if idx < len(chunks) else metadata[idx].get("content", ""),
-            "metadata": metadata[idx] if idx < len(metadata) else {}
+            "chunk": store.chunk(pos),
+            "metadata": store.metadata(pos),
         }
         results.append(entry)
-    return results
\ No newline at end of file
+    return results
+
+
+def _fuse(vs, query, qvec, dists, ids, allowed, top_k):
+    """
+    稠密结果与 BM25 结果做 RRF：rrf_score = Σ 1 / (RRF_K + 名次)，按它排序。
+    score 仍是稠密分数（与 _to_results 相同）；只被 BM25 召回的 chunk 用 embeddings.npy
+    的原始向量补算，没有 embeddings.npy 时为 None。bm25_score 为 None 表示只被稠密检索召回。
+    """
+    index, store = vs.index, vs.store
+    positions, bm25_scores = vs.bm25.search(
+        query, HYBRID_DEPTH, allowed=store.positions(allowed) if allowed is not None else None
+    )
+    dense = {int(i): float(d) for d, i in zip(dists, ids) if i >= 0}
+    sparse = dict(zip(np.asarray(store.ids)[positions].tolist(), bm25_scores.tolist()))
+
+    fused = {}
+    for ranking in (list(dense), list(sparse)):
+        for rank, vid in enumerate(ranking, start=1):
+            fused[vid] = fused.get(vid, 0.0) + 1.0 / (RRF_K + rank)
+    top = sorted(fused, key=fused.get, reverse=True)[:top_k]
+    top_positions = store.positions(top)
+
+    missing = [j for j, vid in enumerate(top) if vid not in dense and top_positions[j] >= 0]
+    if missing and vs.embeddings is not None:
+        from vector_index import exact_scores, prepare_vectors
+
+        scores = exact_scores(
+            index, prepare_vectors(index, qvec.reshape(1, -1))[0], vs.embeddings[top_positions[missing]]
+        )
+        for j, sc in zip(missing, scores.tolist()):
+            dense[top[j]] = sc
+
+    results = []
+    for vid, pos in zip(top, top_positions):
+        if pos < 0:
+            continue
+        results.append(
+            {
+                "score": dense.get(vid),
+                "rrf_score": fused[vid],
+                "bm25_score": sparse.get(vid),
+                "chunk": store.chunk(pos),
+                "metadata": store.metadata(pos),
+            }
+        )
+    return results
+
+
+def _use_hybrid(vs, hybrid: bool | None) -> bool:
+    return (HYBRID if hybrid is None else hybrid) and vs.bm25 is not None
+
+
+def _use_exact_rerank(vs, exact_rerank: bool | None) -> bool:
+    return (EXACT_RERANK if exact_rerank is None else exact_rerank) and vs.embeddings is not None
+
+
+def search_batch(
+    queries: list[str],
+    top_k: int = 5,
+    filters: dict | list[dict | None] | None = None,
+    nprobe: int | None = None,
+    ef_search: int | None = None,
+    hybrid: bool | None = None,
+    exact_rerank: bool | None = None,
+):
+    """
+    批量检索：过滤条件相同的查询合并成一次编码和一次 index.search，命中结果缓存的查询不再编码。
+    filters 可以是一个 dict（所有查询共用），也可以是与 queries 等长的列表。
+    返回与 queries 等长的列表，每项与 search 的返回格式相同。
+    """
+    vs = load_vector_store()
+    hybrid = _use_hybrid(vs, hybrid)
+    exact = _use_exact_rerank(vs, exact_rerank)
+    depth = max(top_k, HYBRID_DEPTH) if hybrid else top_k
+    queries = list(queries)
+    if not queries:
+        return []
+    if filters is None or isinstance(filters, dict):
+        filters = [filters] * len(queries)
+    if len(filters) != len(queries):
+        raise ValueError("filters 列表长度必须与 queries 相同")
+
+    groups = {}
+    for qi, f in enumerate(filters):
+        groups.setdefault(_filter_key(f), (f, []))[1].append(qi)
+
+    out = [[] for _ in queries]
+    for fkey, (f, qis) in groups.items():
+        allowed = filter_ids(f, vs)
+        if allowed is not None and len(allowed) == 0:
+            continue
+        keys = {
+            qi: _result_key(vs, queries[qi], top_k, fkey, nprobe, ef_search, hybrid, exact)
+            for qi in qis
+        }
+        todo = []
+        for qi in qis:
+            hit = _result_cache.get(keys[qi])
+            if hit is None:
+                todo.append(qi)
+            else:
+                out[qi] = copy.deepcopy(hit)
+        if not todo:
+            continue
+        # 只编码没命中结果缓存的查询，qmat 的行与 todo 一一对应
+        with span("retrieval.embed", queries=len(todo)):
+            qmat = embed_queries([queries[qi] for qi in todo])
+        with span("retrieval.dense", queries=len(todo)):
+            D, I = _dense_search(vs, qmat, depth, allowed, nprobe, ef_search, exact)
+        with span("retrieval.fuse" if hybrid else "retrieval.results", queries=len(todo)):
+            for row, qi in enumerate(todo):
+                if hybrid:
+                    out[qi] = _fuse(vs, queries[qi], qmat[row], D[row], I[row], allowed, top_k)
+                else:
+                    out[qi] = _to_results(vs.store, D[row], I[row])
+                _result_cache.set(keys[qi], copy.deepcopy(out[qi]))
+    return out
+
+
+def _result_key(vs, query, top_k, fkey, nprobe, ef_search, hybrid, exact):
+    return make_key(
+        normalize_query(query), top_k, fkey, nprobe, ef_search, hybrid, exact, EMBEDDER,
+        vs.version,
+    )
+
+
+def search(
+    query: str,
+    top_k: int = 5,
+    filters: dict | None = None,
+    nprobe: int | None = None,
+    ef_search: int | None = None,
+    hybrid: bool | None = None,
+    exact_rerank: bool | None = None,
+):
+    """
+    返回 list of dicts: [{ 'score': float, 'chunk': str, 'metadata': {...} }, ...]
+    filters：按 city / source_type / vibes 过滤（见 filter_ids），在 FAISS 内部用
+    IDSelector 生效，只要满足条件的 chunk 足够就一定返回 top_k 条。
+    nprobe（IVF 索引）/ ef_search（HNSW 索引）控制近似检索的召回与速度，None 用索引默认值。
+    score：L2 索引为平方欧式距离（越小越相似），cosine 索引为余弦相似度（越大越相似）。
+    hybrid：是否与 BM25 做 RRF 融合（None 用 HYBRID）；融合时按 rrf_score（越大越相关）排序，
+    score 含义不变，另附 bm25_score（见 _fuse）。
+    exact_rerank：量化索引是否用 embeddings.npy 的原始向量重排（None 用 EXACT_RERANK）。
+    """
+    vs = load_vector_store()
+    hybrid = _use_hybrid(vs, hybrid)
+    exact = _use_exact_rerank(vs, exact_rerank)
+    key = _result_key(vs, query, top_k, _filter_key(filters), nprobe, ef_search, hybrid, exact)
+    hit = _result_cache.get(key)
+    if hit is not None:
+        return copy.deepcopy(hit)
+
+    allowed = filter_ids(filters, vs)
+    if allowed is not None and len(allowed) == 0:
+        return []
+
+    with span("retrieval.embed", queries=1):
+        qvec = embed_query(query).reshape(1, -1)
+    depth = max(top_k, HYBRID_DEPTH) if hybrid else top_k
+    with span("retrieval.dense", queries=1):
+        D, I = _dense_search(vs, qvec, depth, allowed, nprobe, ef_search, exact)
+    if hybrid:
+        with span("retrieval.fuse", queries=1):
+            results = _fuse(vs, query, qvec[0], D[0], I[0], allowed, top_k)
+    else:
+        with span("retrieval.results", queries=1):
+            results = _to_results(vs.store, D[0], I[0])
+    _result_cache.set(key, copy.deepcopy(results))
+    return results
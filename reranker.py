@@ -0,0 +1,147 @@
+# reranker.py
+"""
+交叉编码器重排：检索先多取候选（rag_qianfan 默认 50 条），在 CPU 上用小模型对
+(查询, chunk) 逐对打分，只保留最相关的 top_k 条放进 prompt。
+
+    reranked, info = rerank(query, candidates, top_k=5)
+
+- 分批打分（RERANK_BATCH_SIZE 对一批），分数按 (模型, 查询, chunk) 缓存；
+- 延迟预算 RERANK_BUDGET_MS：按候选原顺序逐批打分，预计下一批会超时就停，
+  没来得及打分的候选保持检索原顺序（模型加载不计入预算，单批无法中断，预算最多超出一批）；
+- 模型加载失败（离线等）时直接返回检索原顺序，不影响回答生成。
+"""
+import os
+import threading
+import time
+
+from cache import make_cache, make_key
+from metrics import inc, register_source
+
+RERANK_MODEL = os.getenv("RAG_RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_BATCH_SIZE = 16
+RERANK_MAX_LENGTH = 256  # 查询 + chunk 的 token 上限，控制单批耗时
+RERANK_BUDGET_MS = float(os.getenv("RAG_RERANK_BUDGET_MS", "400"))
+
+# 分数缓存：设置 RAG_CACHE_PATH 后与检索缓存一样持久化到 SQLite
+SCORE_CACHE_SIZE = 8192
+SCORE_CACHE_TTL = 24 * 3600
+CACHE_PATH = os.getenv("RAG_CACHE_PATH")
+
+_score_cache = make_cache(
+    SCORE_CACHE_SIZE, SCORE_CACHE_TTL, CACHE_PATH and CACHE_PATH + ".rerank"
+)
+
+_model = None
+_model_error = None
+_model_lock = threading.Lock()
+
+
+def get_cross_encoder():
+    """懒加载交叉编码器；加载失败时只提示一次，之后返回 None。"""
+    global _model, _model_error
+    with _model_lock:
+        if _model is None and _model_error is None:
+            try:
+                from sentence_transformers import CrossEncoder  # torch 很重，用到时再 import
+
+                _model = CrossEncoder(RERANK_MODEL, max_length=RERANK_MAX_LENGTH, device="cpu")
+            except Exception as e:
+                _model_error = e
+                print(f"⚠️ 重排模型 {RERANK_MODEL} 加载失败，使用检索原顺序：{e}")
+    return _model
+
+
+def warm_up() -> bool:
+    """预热时调用：加载模型并跑一次前向（不写缓存）；模型不可用时返回 False。"""
+    model = get_cross_encoder()
+    if model is None:
+        return False
+    model.predict([("warm up", "warm up")], show_progress_bar=False)
+    return True
+
+
+def score_cache_stats() -> dict:
+    return _score_cache.stats()
+
+
+register_source("rerank", score_cache_stats)
+
+
+def _score_key(query: str, chunk: str) -> str:
+    return make_key(RERANK_MODEL, query, chunk)
+
+
+def rerank(
+    query: str,
+    candidates: list[dict],
+    top_k: int = 5,
+    budget_ms: float | None = None,
+    batch_size: int = RERANK_BATCH_SIZE,
+):
+    """
+    candidates 为 search 的返回（按检索顺序）。返回 (前 top_k 条, info)：
+    - 每条结果是原 dict 的浅拷贝，多一个 rerank_score（没打分为 None）；
+    - 从第一条起连续打过分的前缀按 rerank_score 排序，其余保持检索顺序接在后面；
+    - info：candidates / cached / scored / batches / fallback（预算用完或模型不可用）
+      以及 load_ms / score_ms / total_ms。
+    """
+    t0 = time.perf_counter()
+    budget_ms = RERANK_BUDGET_MS if budget_ms is None else budget_ms
+    query = " ".join(str(query).split())
+    info = {
+        "candidates": len(candidates),
+        "cached": 0,
+        "scored": 0,
+        "batches": 0,
+        "fallback": False,
+        "load_ms": 0.0,
+        "score_ms": 0.0,
+    }
+
+    keys = [_score_key(query, c.get("chunk", "")) for c in candidates]
+    scores = [_score_cache.get(k) for k in keys]
+    info["cached"] = sum(s is not None for s in scores)
+    todo = [i for i, s in enumerate(scores) if s is None]
+
+    if todo:
+        t = time.perf_counter()
+        model = get_cross_encoder()
+        info["load_ms"] = (time.perf_counter() - t) * 1000
+        if model is None:
+            info["fallback"] = True
+        else:
+            spent = (time.perf_counter() - t0) * 1000 - info["load_ms"]  # 查缓存的耗时
+            t = time.perf_counter()
+            per_batch = 0.0
+            for start in range(0, len(todo), batch_size):
+                elapsed = spent + (time.perf_counter() - t) * 1000
+                if elapsed + per_batch >= budget_ms:
+                    info["fallback"] = True
+                    break
+                batch = todo[start : start + batch_size]
+                out = model.predict(
+                    [(query, candidates[i].get("chunk", "")) for i in batch],
+                    batch_size=batch_size,
+                    show_progress_bar=False,
+                )
+                for i, s in zip(batch, out):
+                    scores[i] = float(s)
+                    _score_cache.set(keys[i], scores[i])
+                info["batches"] += 1
+                info["scored"] += len(batch)
+                per_batch = (time.perf_counter() - t) * 1000 / info["batches"]
+            info["score_ms"] = (time.perf_counter() - t) * 1000
+
+    # 只重排"从第一条起连续打过分"的前缀；没打分的无法比较，按检索顺序接在后面
+    prefix = next((i for i, s in enumerate(scores) if s is None), len(scores))
+    order = sorted(range(prefix), key=lambda i: -scores[i]) + list(range(prefix, len(scores)))
+
+    results = []
+    for i in order[:top_k]:
+        entry = dict(candidates[i])
+        entry["rerank_score"] = scores[i]
+        results.append(entry)
+    info["total_ms"] = (time.perf_counter() - t0) * 1000
+    if info["fallback"]:
+        inc("rag_rerank_fallback_total")
+    return results, info
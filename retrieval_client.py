@@ -0,0 +1,92 @@
+# retrieval_client.py
+"""
+retrieval_server 的客户端，接口与 rag_retrieval.search 相同：
+
+    client = RetrievalClient("http://127.0.0.1:8765")
+    client.search("巴黎 浪漫 步行", top_k=5, filters={"city": "paris"})
+
+每个线程复用一条 keep-alive 连接；服务端断开后自动重连一次。
+只依赖标准库，不加载模型和索引。
+"""
+import http.client
+import json
+import threading
+from urllib.parse import urlsplit
+
+TIMEOUT = 30.0
+
+
+class RetrievalError(RuntimeError):
+    pass
+
+
+class RetrievalClient:
+    def __init__(self, url: str, timeout: float = TIMEOUT):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _conn(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(
+                self.host, self.port, timeout=self.timeout
+            )
+        return conn
+
+    def _request(self, method: str, path: str, payload=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        for attempt in range(2):
+            conn = self._conn()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                data = json.loads(resp.read() or b"{}")
+                return resp.status, data
+            except (ConnectionError, http.client.HTTPException):
+                # keep-alive 连接被服务端关掉了：丢掉旧连接重试一次
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        filters: dict | None = None,
+        nprobe: int | None = None,
+        ef_search: int | None = None,
+        hybrid: bool | None = None,
+        exact_rerank: bool | None = None,
+    ) -> list[dict]:
+        status, data = self._request(
+            "POST",
+            "/search",
+            {
+                "query": query,
+                "top_k": top_k,
+                "filters": filters,
+                "nprobe": nprobe,
+                "ef_search": ef_search,
+                "hybrid": hybrid,
+                "exact_rerank": exact_rerank,
+            },
+        )
+        if status != 200:
+            raise RetrievalError(f"retrieval server returned {status}: {data.get('error')}")
+        return data["results"]
+
+    def health(self) -> dict:
+        """服务端就绪探针；连不上时返回 {"ready": False, "state": "unreachable", ...}。"""
+        try:
+            _, data = self._request("GET", "/health")
+            return data
+        except OSError as e:
+            return {"ready": False, "state": "unreachable", "error": repr(e), "timings": {}}
+
+    def stats(self) -> dict:
+        return self._request("GET", "/stats")[1]
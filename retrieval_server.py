@@ -0,0 +1,217 @@
+# retrieval_server.py
+"""
+独立的本地检索服务：一个进程只持有一份 embedding 模型和向量库，所有 Streamlit 会话
+通过 HTTP（retrieval_client.RetrievalClient）来查询，不再各自在进程内编码和检索。
+
+并发到达的查询在 MAX_WAIT_MS 的窗口内攒成一个 micro-batch（最多 MAX_BATCH 条），
+由单个工作线程调用一次 rag_retrieval.search_batch：一次批量编码 + 按过滤条件分组的 index.search。
+
+    python retrieval_server.py --port 8765 --max-batch 32 --max-wait-ms 5
+
+接口：
+    POST /search   {"query": "...", "top_k": 5, "filters": {...}, "hybrid": null, ...}
+                   -> {"results": [...]}（与 rag_retrieval.search 的返回相同）
+    GET  /health   就绪探针：预热完成前返回 503
+    GET  /stats    micro-batch 统计与缓存命中率
+    GET  /metrics  Prometheus 文本格式的各阶段耗时直方图与缓存命中率（/metrics.json 为 JSON）
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import metrics
+import rag_retrieval
+
+HOST = "127.0.0.1"
+PORT = 8765
+MAX_BATCH = 32
+MAX_WAIT_MS = 5.0
+
+# 除 top_k 外透传给 search_batch 的可选参数；参数不同的查询不能放进同一次 search_batch
+SEARCH_OPTIONS = ("nprobe", "ef_search", "hybrid", "exact_rerank")
+
+
+class MicroBatcher:
+    """
+    把多个线程提交的请求合并成批处理：第一条请求到达后最多再等 max_wait_ms 或凑满 max_batch，
+    然后按 key 分组，每组调用一次 fn(key, items) -> 与 items 等长的结果列表。
+    fn 只在一个工作线程里执行，模型和索引不会被并发调用。
+    """
+
+    def __init__(self, fn, max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS):
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._max_seen = 0
+        threading.Thread(target=self._loop, name="micro-batcher", daemon=True).start()
+
+    def submit(self, key, item, timeout: float | None = None):
+        future = Future()
+        self._queue.put((key, item, future))
+        return future.result(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "batches": self._batches,
+                "requests": self._items,
+                "avg_batch": self._items / self._batches if self._batches else 0.0,
+                "max_batch": self._max_seen,
+            }
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            with self._lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._max_seen = max(self._max_seen, len(batch))
+
+            groups = {}
+            for key, item, future in batch:
+                groups.setdefault(key, []).append((item, future))
+            with metrics.Trace("micro_batch", requests=len(batch), groups=len(groups)):
+                for key, entries in groups.items():
+                    try:
+                        results = self.fn(key, [item for item, _ in entries])
+                    except Exception as e:
+                        for _, future in entries:
+                            future.set_exception(e)
+                        continue
+                    for (_, future), result in zip(entries, results):
+                        future.set_result(result)
+
+
+def _run_search(options, requests):
+    """一组参数相同的请求：queries 一次编码，filters 按查询各自传入。"""
+    return rag_retrieval.search_batch(
+        [r["query"] for r in requests],
+        filters=[r.get("filters") for r in requests],
+        **dict(options),
+    )
+
+
+class RetrievalService:
+    def __init__(self, max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS):
+        self.batcher = MicroBatcher(_run_search, max_batch=max_batch, max_wait_ms=max_wait_ms)
+        self.state = "loading"
+        self.error = None
+        self.timings = {}
+
+    def warm_up(self):
+        try:
+            self.timings = rag_retrieval.warm_up()
+            self.state = "ready"
+        except Exception as e:
+            self.state, self.error = "error", repr(e)
+            print("⚠️ retrieval warm-up failed:", e)
+
+    def search(self, request: dict) -> list[dict]:
+        if not str(request.get("query", "")).strip():
+            raise ValueError("query 不能为空")
+        options = {"top_k": int(request.get("top_k") or 5)}
+        for name in SEARCH_OPTIONS:
+            if request.get(name) is not None:
+                options[name] = request[name]
+        return self.batcher.submit(tuple(sorted(options.items())), request)
+
+    def health(self) -> dict:
+        return {"ready": self.state == "ready", "state": self.state, "error": self.error, "timings": self.timings}
+
+    def stats(self) -> dict:
+        return {"batching": self.batcher.stats(), "caches": rag_retrieval.cache_stats()}
+
+
+def make_handler(service: RetrievalService):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive，客户端复用连接
+        # 响应头和正文分两次写，开着 Nagle 会与客户端的延迟 ACK 叠加出约 40ms 的等待
+        disable_nagle_algorithm = True
+
+        def _send(self, status: int, payload, content_type: str = "application/json; charset=utf-8"):
+            if isinstance(payload, str):
+                body = payload.encode("utf-8")
+            else:
+                body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                health = service.health()
+                self._send(200 if health["ready"] else 503, health)
+            elif self.path == "/stats":
+                self._send(200, service.stats())
+            elif self.path == "/metrics":
+                self._send(200, metrics.prometheus_text(), "text/plain; version=0.0.4")
+            elif self.path == "/metrics.json":
+                self._send(200, metrics.snapshot())
+            else:
+                self._send(404, {"error": f"unknown path {self.path}"})
+
+        def do_POST(self):
+            if self.path != "/search":
+                self._send(404, {"error": f"unknown path {self.path}"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                self._send(200, {"results": service.search(request)})
+            except (ValueError, TypeError) as e:
+                self._send(400, {"error": str(e)})
+            except Exception as e:
+                self._send(500, {"error": repr(e)})
+
+        def log_message(self, format, *args):
+            pass  # 每个请求都打印一行太吵
+
+    return Handler
+
+
+def serve(host: str = HOST, port: int = PORT, max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS):
+    service = RetrievalService(max_batch=max_batch, max_wait_ms=max_wait_ms)
+    # 先开始监听（/health 返回 503），预热在后台完成
+    threading.Thread(target=service.warm_up, name="retrieval-warmup", daemon=True).start()
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    print(f"Retrieval server listening on http://{host}:{port} (max_batch={max_batch}, max_wait={max_wait_ms}ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地检索服务（micro-batching）")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    args = parser.parse_args()
+    serve(args.host, args.port, args.max_batch, args.max_wait_ms)
@@ -0,0 +1,78 @@
+# store_generations.py
+"""
+向量库的版本目录：每次构建（全量或增量）都写进一个新的 VECTOR_DIR/gen-<纳秒时间戳>/，
+index.faiss、docstore/、bm25/、embeddings.npy、manifest.json 全部写完后，
+再原子替换指针文件 VECTOR_DIR/CURRENT 发布。检索端按指针找目录，
+不会读到新旧混搭或写了一半的向量库。
+
+    with new_generation(VECTOR_DIR) as out_dir:
+        ...  # 往 out_dir 里写文件；抛异常时整个目录删掉，CURRENT 不变
+
+city_vibes.json、vibe_cache.sqlite、llm_cache 等与构建无关的文件仍直接放在 VECTOR_DIR 下。
+没有 CURRENT 的旧版向量库（文件直接在 VECTOR_DIR 下）照常读取，第一次发布新版本后删除。
+"""
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+POINTER = "CURRENT"
+PREFIX = "gen-"
+# 保留的版本数（含当前）：刚被换下的版本可能还有检索端正在加载
+KEEP = 2
+# 旧版布局直接放在 VECTOR_DIR 下的构建产物
+LEGACY_FILES = ("index.faiss", "embeddings.npy", "manifest.json", "docstore", "bm25")
+
+
+def current_dir(vector_dir: str) -> str:
+    """当前发布的版本目录；还没发布过（旧版布局）时就是 vector_dir 本身。"""
+    try:
+        with open(os.path.join(vector_dir, POINTER), "r", encoding="utf-8") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return vector_dir
+    return os.path.join(vector_dir, name)
+
+
+@contextmanager
+def new_generation(vector_dir: str):
+    """建一个空的版本目录交给调用方写入，正常退出时发布，出错时删除。"""
+    path = os.path.join(vector_dir, f"{PREFIX}{time.time_ns()}")
+    os.makedirs(path)
+    try:
+        yield path
+    except BaseException:
+        shutil.rmtree(path, ignore_errors=True)
+        raise
+    publish(vector_dir, path)
+
+
+def publish(vector_dir: str, gen_dir: str):
+    """把 CURRENT 指向 gen_dir（写临时文件再 os.replace），然后清理旧版本。"""
+    tmp = os.path.join(vector_dir, POINTER + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(os.path.basename(gen_dir))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(vector_dir, POINTER))
+    prune(vector_dir)
+
+
+def prune(vector_dir: str, keep: int = KEEP):
+    """
+    删除比当前版本旧的目录（只留 keep - 1 个）和旧版布局的文件。
+    比当前版本新的目录可能是另一个进程正在写的构建，不动。
+    已加载的快照全部是 mmap / 读进内存的，目录删掉后照常可用。
+    """
+    current = os.path.basename(current_dir(vector_dir))
+    older = sorted(
+        name for name in os.listdir(vector_dir) if name.startswith(PREFIX) and name < current
+    )
+    for name in older[: max(len(older) - (keep - 1), 0)]:
+        shutil.rmtree(os.path.join(vector_dir, name), ignore_errors=True)
+    for name in LEGACY_FILES:
+        path = os.path.join(vector_dir, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
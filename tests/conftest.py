@@ -0,0 +1,213 @@
+"""
+测试共用：把项目根目录加进 sys.path，并提供
+- stub_server：本地 HTTP 替身服务，模拟千帆（OpenAI 兼容接口）和 open-meteo，测试不访问外网；
+- vector_store：在临时目录里用按词哈希的替身 embedder 建小型向量库，不加载模型、不请求千帆。
+"""
+import csv
+import json
+import os
+import pathlib
+import sys
+import tempfile
+import threading
+import time
+import types
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QIANFAN_API_KEY", "test-key")
+# trip_storage 导入时就会建表，别碰项目目录里的 trips.db
+os.environ.setdefault("TRIPS_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="trips-test-"), "trips.db"))
+
+
+def chat_completion(content: str) -> dict:
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "stub",
+        "choices": [
+            {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+        ],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+    }
+
+
+def chat_chunk(content: str) -> dict:
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion.chunk",
+        "created": 0,
+        "model": "stub",
+        "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}],
+    }
+
+
+class StubServer:
+    """
+    respond(request) 决定每个请求的回复，request 是 {"method", "path", "query", "json", "port"}；
+    返回 (status, payload)，payload 为 dict（JSON）或 list[str]（按 SSE 逐条推送，每条之间停 sse_delay 秒）。
+    delay 秒后才回复（测超时）。所有请求按到达顺序记录在 requests 里。
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.respond = lambda request: (200, {})
+        self.delay = 0.0
+        self.sse_delay = 0.0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _handle(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                parts = urlsplit(self.path)
+                request = {
+                    "method": method,
+                    "path": parts.path,
+                    "query": {k: v[0] for k, v in parse_qs(parts.query).items()},
+                    "json": json.loads(body) if body else None,
+                    "port": self.client_address[1],
+                }
+                with stub._lock:
+                    stub.requests.append(request)
+                if stub.delay:
+                    time.sleep(stub.delay)
+                status, payload = stub.respond(request)
+                try:
+                    if isinstance(payload, list):
+                        self._send_sse(status, payload)
+                    else:
+                        self._send_json(status, payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # 客户端已超时断开
+
+            def _send_json(self, status, payload):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_sse(self, status, contents):
+                self.send_response(status)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                events = [f"data: {json.dumps(chat_chunk(c), ensure_ascii=False)}\n\n" for c in contents]
+                for i, event in enumerate(events + ["data: [DONE]\n\n"]):
+                    if i and stub.sse_delay:
+                        time.sleep(stub.sse_delay)
+                    data = event.encode("utf-8")
+                    self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.server.block_on_close = False
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def ports(self) -> set:
+        """客户端用过的本地端口：连接复用时只有一个。"""
+        return {r["port"] for r in self.requests}
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub_server():
+    stub = StubServer()
+    yield stub
+    stub.close()
+
+
+# ---------- 小型向量库 ----------
+class HashEmbedder:
+    """每个词哈希到一维计数，词重叠越多越相似；接口与 SentenceTransformer 用到的部分相同。"""
+
+    tokenizer = None  # TokenChunker 按空格计数
+    max_seq_length = 256
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, texts, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else texts
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, t in enumerate(texts):
+            for w in t.lower().split():
+                out[i, zlib.crc32(w.strip(".,!?").encode()) % self.dim] += 1
+        return out[0] if single else out
+
+
+def write_posts(path, posts):
+    """posts 为 [(title, text), ...]，按 medium CSV 的列写出。"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["title", "content", "url"])
+        for title, text in posts:
+            writer.writerow([title, text, f"https://example.com/{title}"])
+
+
+@pytest.fixture
+def vector_store(monkeypatch, tmp_path):
+    """
+    把 ingest 的输出目录换到临时目录并装上替身 embedder / 空标签。
+    返回的对象：dir（向量库目录）、csv（paris 的 medium CSV）、build(posts)（全量构建）、
+    current()（当前发布的版本目录）。
+    """
+    import ingest
+    from embedders import embedder_spec
+    from store_generations import current_dir
+
+    vector_dir = tmp_path / "vector_store"
+    vector_dir.mkdir()
+    embedder = HashEmbedder(embedder_spec(ingest.EMBEDDER)["dim"])
+    monkeypatch.setattr(ingest, "VECTOR_DIR", str(vector_dir))
+    monkeypatch.setattr(ingest, "_embedder", embedder)
+    monkeypatch.setattr(ingest, "_chunkers", {})
+    monkeypatch.setattr(ingest, "extract_vibes_batch", lambda items: [[] for _ in items])
+    store = types.SimpleNamespace(
+        dir=vector_dir, csv=tmp_path / "data" / "medium" / "paris_medium_posts.csv", embedder=embedder
+    )
+
+    def build(posts, index_kind="flat"):
+        write_posts(store.csv, posts)
+        dedup = ingest.make_dedup()
+        chunks, metadata, dup_rows = ingest.build_chunks([str(store.csv)], dedup)
+        embeddings = ingest.vectorize_chunks(chunks, out_path=str(vector_dir / "embeddings.new.npy"))
+        ingest.save_vector_store(
+            embeddings, metadata, chunks, index_kind=index_kind, index_params={}, dedup=dedup, dup_rows=dup_rows
+        )
+
+    store.build = build
+    store.current = lambda: pathlib.Path(current_dir(str(vector_dir)))
+    return store
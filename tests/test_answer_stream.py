@@ -0,0 +1,65 @@
+"""rag_qianfan.generate_answer_stream：千帆替身服务按 SSE 逐段推送，检查增量输出、缓存与耗时。"""
+import time
+
+import pytest
+from openai import OpenAI
+
+import rag_qianfan
+from cache import make_backend
+
+DOCS = [
+    {
+        "chunk": "Walk along the Seine at night.",
+        "metadata": {"city": "paris", "title": "Paris by night", "vibes": ["浪漫"]},
+        "score": 0.9,
+    }
+]
+
+
+@pytest.fixture
+def llm(stub_server, monkeypatch):
+    monkeypatch.setattr(rag_qianfan, "client", OpenAI(api_key="test-key", base_url=stub_server.url + "/v1"))
+    monkeypatch.setattr(rag_qianfan, "_llm_cache", make_backend("memory", maxsize=8, ttl=60))
+    monkeypatch.setattr(rag_qianfan, "retrieve", lambda query, top_k=5, filters=None: DOCS)
+    stub_server.respond = lambda r: (200, ["第一天：", "塞纳河", "夜游"])
+    stub_server.sse_delay = 0.2
+    return stub_server
+
+
+def test_stream_yields_tokens_incrementally(llm):
+    tokens, retrieved = rag_qianfan.generate_answer_stream("巴黎两天", 2, city="paris", rerank=False)
+    assert retrieved == DOCS
+    assert llm.requests == []  # 模型请求在读取 tokens 时才发出
+
+    t0 = time.perf_counter()
+    arrivals = []
+    for token in tokens:
+        arrivals.append((token, time.perf_counter() - t0))
+    assert [t for t, _ in arrivals] == ["第一天：", "塞纳河", "夜游"]
+    # 第一段不必等整段回答推送完，后面各段按服务端节奏陆续到达
+    assert arrivals[0][1] < 0.2
+    assert arrivals[2][1] - arrivals[0][1] >= 0.3
+
+    request = llm.requests[0]["json"]
+    assert request["stream"] is True
+    assert "Walk along the Seine" in request["messages"][1]["content"]
+
+
+def test_stream_fills_cache_and_timings_after_consumption(llm):
+    tokens, _ = rag_qianfan.generate_answer_stream("巴黎两天", 2, city="paris", rerank=False, use_cache=True)
+    first = next(tokens)
+    assert first == "第一天："
+    assert "llm_ms" not in rag_qianfan.last_timings()
+    assert rag_qianfan.llm_cache_stats()["size"] == 0
+
+    assert first + "".join(tokens) == "第一天：塞纳河夜游"
+    timings = rag_qianfan.last_timings()
+    assert 0 < timings["llm_first_token_ms"] < timings["llm_ms"]
+    assert timings["llm_ms"] >= 300
+    assert rag_qianfan.llm_cache_stats()["size"] == 1
+
+    # 同一问题再问一次：命中缓存，一次性返回整段回答，不再请求模型
+    tokens, _ = rag_qianfan.generate_answer_stream("巴黎两天", 2, city="paris", rerank=False, use_cache=True)
+    assert list(tokens) == ["第一天：塞纳河夜游"]
+    assert rag_qianfan.last_timings()["llm_ms"] == 0.0
+    assert len(llm.requests) == 1
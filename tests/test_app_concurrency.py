@@ -0,0 +1,57 @@
+"""app.py：点击生成后天气请求在后台线程里与检索 + 生成同时进行（用 streamlit 的 AppTest 跑脚本）。"""
+import os
+import time
+
+import pytest
+
+AppTest = pytest.importorskip("streamlit.testing.v1").AppTest
+
+import rag_qianfan  # noqa: E402
+import weather_client  # noqa: E402
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+DELAY = 0.6
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(rag_qianfan, "start_warmup", lambda: None)
+    monkeypatch.setattr(rag_qianfan, "readiness", lambda: {"state": "ready", "error": None})
+    calls = []
+
+    def slow_weather(city):
+        calls.append(("weather", time.monotonic()))
+        time.sleep(DELAY)
+        return f"{city}：晴，18°C"
+
+    def slow_answer(question, days, top_k=5, city=None):
+        calls.append(("retrieve", time.monotonic()))
+
+        def tokens():
+            time.sleep(DELAY)
+            yield "先去塞纳河散步，"
+            yield "晚上看铁塔。"
+
+        return tokens(), []
+
+    monkeypatch.setattr(weather_client, "get_weather_summary", slow_weather)
+    monkeypatch.setattr(rag_qianfan, "generate_answer_stream", slow_answer)
+    at = AppTest.from_file(APP, default_timeout=10)
+    at.calls = calls
+    return at
+
+
+def test_weather_runs_alongside_generation(app):
+    app.run()
+    t0 = time.monotonic()
+    app.button(key="generate").click().run()
+    elapsed = time.monotonic() - t0
+
+    assert not app.exception
+    assert app.session_state["answer"] == "先去塞纳河散步，晚上看铁塔。"
+    assert app.session_state["weather_info"] == "Paris：晴，18°C"
+    assert app.session_state["weather_future"] is None
+    assert "Paris：晴，18°C" in [t.value for t in app.text]
+    # 两个慢请求同时进行：总耗时明显少于两者之和
+    assert sorted(name for name, _ in app.calls) == ["retrieve", "weather"]
+    assert elapsed < 2 * DELAY
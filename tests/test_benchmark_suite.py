@@ -0,0 +1,85 @@
+"""benchmarks/suite.py：极小规模跑一遍全部用例写出 JSON，以及两份结果的对比与回归判定。"""
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SUITE = os.path.join(ROOT, "benchmarks", "suite.py")
+
+
+def run_suite(*args):
+    # 子进程里跑：suite 会改环境变量并给 ingest / rag_retrieval 装替身，不能影响其它测试
+    return subprocess.run([sys.executable, SUITE, *args], cwd=ROOT, capture_output=True, text=True, timeout=300)
+
+
+def test_tiny_run_writes_every_case(tmp_path):
+    out = tmp_path / "result.json"
+    proc = run_suite(
+        "--sizes", "200", "--queries", "3", "--repeat", "1", "--docs", "10", "--doc-words", "100",
+        "--trip-ops", "10", "--out", str(out),
+    )
+    assert proc.returncode == 0, proc.stderr
+    data = json.loads(out.read_text(encoding="utf-8"))
+
+    results = data["results"]
+    for name in ("chunk_text", "build_chunks", "save_vector_store", "search[n=200,dense]",
+                 "search[n=200,hybrid]", "parse_days", "trip_storage.add_items[20]"):
+        assert name in results
+    assert results["search[n=200,dense]"]["stat"] == "median_s"
+    assert results["build_chunks"]["stat"] == "min_s"
+    assert all(0 < r["min_s"] <= r["median_s"] <= r["p95_s"] for r in results.values())
+    assert data["env"]["args"]["sizes"] == [200]
+
+
+def write_result(path, results, commit):
+    env = {"commit": commit, "subject": f"commit {commit}"}
+    path.write_text(json.dumps({"env": env, "results": results}), encoding="utf-8")
+    return str(path)
+
+
+def case(min_s, median_s=None, stat="min_s"):
+    median_s = min_s if median_s is None else median_s
+    return {"min_s": min_s, "median_s": median_s, "p95_s": median_s, "stat": stat}
+
+
+def line_of(stdout, name):
+    return next(line for line in stdout.splitlines() if line.startswith(name + " "))
+
+
+def test_compare_flags_regressions_by_each_case_stat(tmp_path):
+    base = write_result(
+        tmp_path / "base.json",
+        {
+            "chunk_text": case(0.010),
+            "search[n=1000,dense]": case(0.001, 0.002, stat="median_s"),
+            "removed": case(0.5),
+        },
+        "aaaaaaaaaaaa",
+    )
+    same = write_result(
+        tmp_path / "same.json",
+        {
+            "chunk_text": case(0.0105),  # 5% 以内不算回归
+            "search[n=1000,dense]": case(0.005, 0.002, stat="median_s"),  # 只看 median
+            "added": case(0.1),
+        },
+        "bbbbbbbbbbbb",
+    )
+    proc = run_suite("--compare", base, same)
+    assert proc.returncode == 0, proc.stdout
+    assert "0 regression(s)" in proc.stdout
+    assert line_of(proc.stdout, "removed").split()[1:] == ["500.000", "-"]
+    assert line_of(proc.stdout, "added").split()[1:] == ["-", "100.000"]
+
+    slower = write_result(
+        tmp_path / "slower.json",
+        {"chunk_text": case(0.020), "search[n=1000,dense]": case(0.001, 0.001, stat="median_s")},
+        "cccccccccccc",
+    )
+    proc = run_suite("--compare", base, slower)
+    assert proc.returncode == 1
+    assert "REGRESSION" in line_of(proc.stdout, "chunk_text")
+    assert "faster" in line_of(proc.stdout, "search[n=1000,dense]")
+
+    assert run_suite("--compare", base, slower, "--threshold", "1.5").returncode == 0
@@ -0,0 +1,73 @@
+"""bm25：分词、倒排表打分与逐文档公式一致，以及按 docstore 行号过滤。"""
+import math
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from bm25 import B, K1, BM25Index, tokenize, write_bm25
+
+DOCS = [
+    "Sagrada Familia tickets sell out, book the Sagrada Familia tower online.",
+    "Park Güell at sunrise, then tapas in the Gothic Quarter.",
+    "Charles Bridge is empty at dawn; Prague castle after breakfast.",
+    "",
+    "Schönbrunn palace gardens are free, the palace tour is not.",
+    "巴塞罗那圣家堂要提前订票",
+]
+
+
+def bm25_scores(query, docs):
+    """逐文档按公式算分，作为对照。"""
+    tokenized = [tokenize(d) for d in docs]
+    n = len(docs)
+    avgdl = sum(map(len, tokenized)) / n
+    scores = np.zeros(n)
+    for term in set(tokenize(query)):
+        df = sum(term in t for t in tokenized)
+        if not df:
+            continue
+        idf = math.log1p((n - df + 0.5) / (df + 0.5))
+        for i, t in enumerate(tokenized):
+            tf = Counter(t)[term]
+            scores[i] += idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * len(t) / avgdl))
+    return scores
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = str(tmp_path / "bm25")
+    write_bm25(path, DOCS)
+    return BM25Index(path)
+
+
+def test_tokenize():
+    assert tokenize("The Charles-Bridge, at DAWN!") == ["charles", "bridge", "dawn"]
+    assert tokenize("Schönbrunn Café") == ["schonbrunn", "cafe"]
+    assert tokenize("圣家堂 tickets") == ["圣", "家", "堂", "tickets"]
+
+
+@pytest.mark.parametrize("query", ["Sagrada Familia", "palace sunrise", "Prague at dawn", "圣家堂", "schonbrunn"])
+def test_scores_match_formula(index, query):
+    expected = bm25_scores(query, DOCS)
+    positions, scores = index.search(query, k=len(DOCS))
+    assert positions.tolist() == [int(i) for i in np.argsort(-expected, kind="stable") if expected[i] > 0]
+    np.testing.assert_allclose(scores, expected[positions], rtol=1e-5)
+
+
+def test_k_allowed_and_misses(index):
+    positions, _ = index.search("palace Sagrada sunrise", k=2)
+    assert len(positions) == 2
+    positions, _ = index.search("palace Sagrada sunrise", k=10, allowed=np.array([1, 3]))
+    assert positions.tolist() == [1]
+    assert len(index.search("palace", allowed=np.array([0, 2]))[0]) == 0
+    assert len(index.search("the of and")[0]) == 0  # 只有停用词
+    assert len(index.search("Lisbon")[0]) == 0
+    assert len(index) == len(DOCS)
+
+
+def test_empty_corpus(tmp_path):
+    write_bm25(str(tmp_path / "bm25"), [])
+    index = BM25Index(str(tmp_path / "bm25"))
+    assert len(index) == 0
+    assert len(index.search("anything")[0]) == 0
@@ -0,0 +1,96 @@
+"""cache：进程内 LRU + TTL、SQLite 持久层与两级缓存；rag_retrieval 的查询向量缓存。"""
+import numpy as np
+import pytest
+
+import cache
+import rag_retrieval
+from cache import LRUCache, SQLiteCache, TieredCache, make_cache, make_key
+from conftest import HashEmbedder
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可手动拨动的 time.time。"""
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_make_key_is_stable_and_order_sensitive():
+    assert make_key("q", 5, None) == make_key("q", 5, None)
+    assert make_key("q", 5, None) != make_key(5, "q", None)
+    assert make_key("a\x1fb") != make_key("a", "b")
+
+
+def test_lru_evicts_least_recently_used():
+    lru = LRUCache(maxsize=2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1  # a 变成最近使用
+    lru.set("c", 3)
+    assert lru.get("b") is None
+    assert lru.get("a") == 1 and lru.get("c") == 3
+    stats = lru.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (3, 1, 1, 2)
+
+
+def test_lru_ttl(clock):
+    lru = LRUCache(maxsize=10, ttl=60)
+    lru.set("a", 1)
+    lru.set("b", 2, ttl=600)
+    clock[0] += 61
+    assert lru.get("a") is None
+    assert lru.get("b") == 2
+    assert lru.stats()["expirations"] == 1
+
+
+def test_sqlite_persists_and_expires(tmp_path, clock):
+    path = str(tmp_path / "c.sqlite")
+    SQLiteCache(path, ttl=60).set("k", {"v": np.arange(3)})
+    other = SQLiteCache(path, ttl=60)  # 另一个实例（进程）读同一个文件
+    np.testing.assert_array_equal(other.get("k")["v"], np.arange(3))
+    clock[0] += 61
+    assert other.get("k") is None
+    assert len(other) == 0
+
+
+def test_sqlite_evicts_least_recently_accessed(tmp_path, clock):
+    c = SQLiteCache(str(tmp_path / "c.sqlite"), maxsize=2, evict_every=1)
+    for key in ("a", "b"):
+        c.set(key, key)
+        clock[0] += 1
+    c.get("a")
+    clock[0] += 1
+    c.set("c", "c")
+    assert c.get("b") is None
+    assert c.get("a") == "a" and c.get("c") == "c"
+    assert c.stats()["evictions"] == 1
+
+
+def test_tiered_backfills_memory(tmp_path):
+    tiered = make_cache(maxsize=4, persist_path=str(tmp_path / "c.sqlite"))
+    assert isinstance(tiered, TieredCache)
+    tiered.set("k", "v")
+    tiered.memory.clear()
+    assert tiered.get("k") == "v"  # 从持久层读到，回填内存
+    assert tiered.memory.get("k") == "v"
+    assert set(tiered.stats()) == {"memory", "persistent"}
+    assert isinstance(make_cache(maxsize=4), LRUCache)
+
+
+def test_query_embeddings_are_cached(monkeypatch):
+    calls = []
+
+    class Counting(HashEmbedder):
+        def encode(self, texts, **kwargs):
+            calls.append(texts)
+            return super().encode(texts, **kwargs)
+
+    monkeypatch.setattr(rag_retrieval, "_embedder", Counting(16))
+    monkeypatch.setattr(rag_retrieval, "_query_cache", LRUCache(maxsize=8))
+    first = rag_retrieval.embed_query("Seine  at\nsunset")
+    # 全角字符 / 多余空白归一化后是同一条查询，命中缓存
+    np.testing.assert_array_equal(rag_retrieval.embed_query(" Ｓeine at sunset "), first)
+    # 批量编码跳过已缓存的，批内重复的只编码一次
+    rag_retrieval.embed_queries(["Seine at sunset", "Louvre", "Louvre "])
+    assert calls == ["Seine at sunset", ["Louvre"]]
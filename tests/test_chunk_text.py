@@ -0,0 +1,37 @@
+"""ingest.chunk_text 的 max_tokens 参数（tokenizer=None 时 TokenChunker 按空格计数）。"""
+import types
+
+import pytest
+
+import ingest
+
+
+@pytest.fixture
+def whitespace_embedder(monkeypatch):
+    monkeypatch.setattr(ingest, "_embedder", types.SimpleNamespace(tokenizer=None, max_seq_length=256))
+    monkeypatch.setattr(ingest, "_chunkers", {})
+
+
+def words(n, start=0):
+    return " ".join(f"w{i}" for i in range(start, start + n))
+
+
+def test_default_uses_model_limit(whitespace_embedder):
+    chunks = ingest.chunk_text(words(600))
+    assert max(len(c.split()) for c in chunks) == 254
+
+
+def test_max_tokens_is_honoured(whitespace_embedder):
+    text = ". ".join(words(15, start=i * 15) for i in range(12)) + "."
+    chunks = ingest.chunk_text(text, max_tokens=40)
+    assert len(chunks) > 1
+    assert all(len(c.split()) <= 40 for c in chunks)
+    # 不同 max_tokens 各用各的 chunker，默认 chunker 不受影响
+    assert set(ingest._chunkers) == {40}
+    assert ingest.chunk_text(text) == [text]
+
+
+def test_small_max_tokens_shrinks_overlap(whitespace_embedder):
+    chunks = ingest.chunk_text(words(50), max_tokens=10)
+    assert all(len(c.split()) <= 10 for c in chunks)
+    assert ingest.get_chunker(10).overlap == 5
@@ -0,0 +1,90 @@
+"""chunker：页面残留清理、句子切分，以及按 token 数在句子边界分块并重叠完整句子。"""
+import pytest
+
+from chunker import TokenChunker, split_sentences, strip_boilerplate
+
+MEDIUM_PAGE = """Sign up
+Sign in
+Member-only story
+Paris in Two Days
+Jane Doe
+Follow
+5 min read
+Listen
+Share
+We walked along the Seine.
+The Louvre was quiet.
+--
+Written by Jane Doe
+120 Followers
+Help
+Status
+About
+Careers"""
+
+
+def test_strip_medium_header_and_footer():
+    assert strip_boilerplate(MEDIUM_PAGE) == "We walked along the Seine.\nThe Louvre was quiet."
+
+
+@pytest.mark.parametrize(
+    "raw, expected",
+    [
+        ("[deleted]", ""),
+        (" [Removed] ", ""),
+        ("ERROR: ('Connection aborted.', RemoteDisconnected())", ""),
+        ("Tram 28&#x200B; is packed &amp; slow", "Tram 28 is packed & slow"),
+        ("Share your tips\nHelp me plan", "Share your tips\nHelp me plan"),  # 正文里的长行不动
+    ],
+)
+def test_strip_boilerplate_cases(raw, expected):
+    assert strip_boilerplate(raw) == expected
+
+
+def test_split_sentences_english_chinese_and_paragraphs():
+    text = "First day. Then the Louvre! Worth it? Yes\n\n第一天看塞纳河。晚上去铁塔！值得吗？值得"
+    assert split_sentences(text) == [
+        "First day.", "Then the Louvre!", "Worth it?", "Yes",
+        "第一天看塞纳河。", "晚上去铁塔！", "值得吗？", "值得",
+    ]
+    assert split_sentences("version 3.5 is out") == ["version 3.5 is out"]
+
+
+def sentence(i, words=4):
+    return " ".join([f"s{i}w{j}" for j in range(words - 1)] + [f"end{i}."])
+
+
+def test_chunks_end_on_sentence_boundaries_and_overlap_whole_sentences():
+    text = " ".join(sentence(i) for i in range(10))  # 10 句，每句 4 个词
+    chunks = TokenChunker(None, max_tokens=12, overlap=4).chunk(text)
+
+    for c in chunks:
+        assert len(c.split()) <= 12
+        assert c.split()[-1].startswith("end")  # 不在句中截断
+    for prev, cur in zip(chunks, chunks[1:]):
+        assert cur.startswith(prev.split(". ")[-1])  # 下一块以上一块的最后一句开头
+    covered = " ".join(chunks)
+    assert all(f"end{i}." in covered for i in range(10))
+
+
+def test_long_sentence_is_hard_split_with_overlap():
+    long = " ".join(f"w{i}" for i in range(25))
+    chunks = TokenChunker(None, max_tokens=10, overlap=2).chunk(f"Short one. {long}")
+    assert chunks[0] == "Short one."
+    pieces = [c.split() for c in chunks[1:]]
+    assert [len(p) for p in pieces] == [10, 10, 9]
+    assert pieces[1][:2] == pieces[0][-2:]
+    assert pieces[-1][-1] == "w24"
+
+
+def test_overlap_must_be_smaller_than_max_tokens():
+    with pytest.raises(ValueError):
+        TokenChunker(None, max_tokens=8, overlap=8)
+
+
+def test_iter_chunks_keeps_document_indexes_across_batches():
+    docs = ["One. Two.", "[deleted]", "Three.", "Four five six seven eight nine."]
+    out = list(TokenChunker(None, max_tokens=4, overlap=1, batch_docs=2).iter_chunks(iter(docs)))
+    assert [i for i, _ in out] == [0, 2, 3, 3]
+    assert out[0] == (0, "One. Two.")
+    assert out[1] == (2, "Three.")
@@ -0,0 +1,90 @@
+"""csv_loader：列名归一化、按列读取（pyarrow / pandas 两条路径结果相同）与多进程并行读取。"""
+import csv
+
+import numpy as np
+import pytest
+
+import csv_loader
+from csv_loader import ROW_COLUMNS, load_csv, load_csvs, resolve_columns, row_hash
+
+
+def write_csv(path, header, rows):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return str(path)
+
+
+@pytest.fixture
+def medium(tmp_path):
+    return write_csv(
+        tmp_path / "medium" / "paris_medium_posts.csv",
+        ["Title", "URL", "Content", "claps"],
+        [
+            ["Seine", "https://a", "Walk along the Seine.\nThen dinner.", "12"],
+            ["Empty", "https://b", "Sign up\nSign in\nShare", "0"],
+            ["", "", "Croissants at dawn, \"best\" ever, 3€", ""],
+            ["Deleted", "https://c", "", "1"],
+        ],
+    )
+
+
+@pytest.fixture
+def reddit(tmp_path):
+    return write_csv(
+        tmp_path / "reddit" / "lisbon_reddit_posts.csv",
+        ["id", "selftext", "score"],
+        [["x1", "Tram 28 is packed by 10am.", "5"], ["x2", "[deleted]", "0"]],
+    )
+
+
+def test_resolve_columns():
+    assert resolve_columns(["TITLE", "Url", "Content"]) == ("TITLE", "Url", "Content")
+    assert resolve_columns(["id", "selftext"]) == (None, None, "selftext")
+    assert resolve_columns(["title", "body", "url"]) == ("title", "url", "body")
+    assert resolve_columns(["only"]) == (None, None, None)
+
+
+def test_load_csv_columns_and_skipped_rows(medium):
+    rows = load_csv(medium)
+    assert set(rows) == set(ROW_COLUMNS)
+    assert rows["row"].tolist() == [0, 2]  # 行号是原文件里的位置，跳过的行不重新编号
+    assert rows["title"].tolist() == ["Seine", ""]
+    assert rows["text"].tolist() == ["Walk along the Seine.\nThen dinner.", 'Croissants at dawn, "best" ever, 3€']
+    assert rows["city"].tolist() == ["paris", "paris"]
+    assert rows["source_type"].tolist() == ["medium", "medium"]
+    assert rows["hash"][0] == row_hash("Seine", "https://a", "Walk along the Seine.\nThen dinner.")
+
+
+def test_reddit_without_title_or_url(reddit):
+    rows = load_csv(reddit)
+    assert rows["text"].tolist() == ["Tram 28 is packed by 10am."]
+    assert rows["title"].tolist() == [""] and rows["url"].tolist() == [""]
+    assert rows["city"].tolist() == ["lisbon"]
+    assert rows["source_type"].tolist() == ["reddit"]
+
+
+def test_pandas_fallback_matches_pyarrow(medium, monkeypatch):
+    expected = load_csv(medium)
+    monkeypatch.setattr(csv_loader, "HAS_PYARROW", False)
+    monkeypatch.setattr(csv_loader, "CHUNK_ROWS", 1)  # 每行一块，检查跨块的行号
+    rows = load_csv(medium)
+    for col in ROW_COLUMNS:
+        np.testing.assert_array_equal(rows[col], expected[col])
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_load_csvs_merges_files_and_reports_failures(medium, reddit, tmp_path, workers):
+    missing = str(tmp_path / "medium" / "rome_medium_posts.csv")
+    rows, failed = load_csvs([medium, missing, reddit], workers=workers)
+    assert failed == {missing}
+    assert rows["source"].tolist() == [medium, medium, reddit]
+    assert rows["row"].dtype == np.int64
+    assert len({len(rows[col]) for col in ROW_COLUMNS}) == 1
+
+
+def test_row_hash_changes_with_any_field():
+    base = row_hash("t", "u", "x")
+    assert len({base, row_hash("t2", "u", "x"), row_hash("t", "u2", "x"), row_hash("t", "u", "x2")}) == 4
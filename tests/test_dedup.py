@@ -0,0 +1,70 @@
+"""dedup：SimHash 签名稳定、近似重复距离小；分段索引与暴力比较结果一致；按城市去重并统计来源。"""
+import numpy as np
+
+import dedup
+from dedup import NearDupFilter, NearDupIndex, simhash
+
+ARTICLE = (
+    "We spent three days in Paris and walked everywhere. The Seine at sunset was the highlight, "
+    "followed by a long lunch in the Marais and an evening at the Louvre when the crowds were gone. "
+    "Buy a carnet of metro tickets and skip the taxis."
+)
+# 转帖：标点、大小写和空白不同，末尾多一句
+REPOST = ARTICLE.replace(",", "").replace(". ", "!  ").lower() + " Thanks for reading."
+OTHER = (
+    "Rome in August is hot and crowded. Start at the Colosseum early, hide in churches at noon, "
+    "and eat supper in Trastevere once the heat breaks."
+)
+
+
+def distance(a, b):
+    return (int(a) ^ int(b)).bit_count()
+
+
+def test_simhash_is_stable_and_near_duplicates_are_close(monkeypatch):
+    sigs = simhash([ARTICLE, REPOST, OTHER, "", "!!!"])
+    assert sigs.dtype == np.uint64
+    assert sigs[3] == 0 and sigs[4] == 0  # 没有词
+    assert distance(sigs[0], sigs[1]) <= 3
+    assert distance(sigs[0], sigs[2]) > 10
+    assert simhash([ARTICLE.upper()])[0] == sigs[0]  # 不区分大小写
+
+    monkeypatch.setattr(dedup, "BATCH", 2)  # 跨批次计算结果不变
+    np.testing.assert_array_equal(simhash([ARTICLE, REPOST, OTHER, "", "!!!"]), sigs)
+
+
+def test_index_matches_brute_force():
+    rng = np.random.default_rng(0)
+    base = [int(x) for x in rng.integers(1, 2**63, size=200, dtype=np.int64)]
+    # 每个基准签名再造一个翻转 0~6 位的变体
+    sigs = []
+    for b in base:
+        flips = rng.choice(64, size=rng.integers(0, 7), replace=False)
+        sigs += [b, b ^ sum(1 << int(f) for f in flips)]
+
+    keep = NearDupIndex(max_distance=3).filter(np.array(sigs, dtype=np.uint64))
+    kept = []
+    expected = []
+    for s in sigs:
+        dup = any(distance(s, k) <= 3 for k in kept)
+        expected.append(not dup)
+        if not dup:
+            kept.append(s)
+    assert keep.tolist() == expected
+
+
+def test_filter_is_per_city_and_counts_removed_by_source():
+    f = NearDupFilter(max_distance=3)
+    keep = f.filter(
+        [ARTICLE, REPOST, ARTICLE, OTHER, ""],
+        ["paris", "paris", "lyon", "rome", "paris"],
+        labels=["a.csv", "b.csv", "c.csv", "d.csv", "e.csv"],
+    )
+    assert keep.tolist() == [True, False, True, True, True]
+    assert f.removed == {"b.csv": 1}
+
+
+def test_seeded_chunks_are_never_removed():
+    f = NearDupFilter()
+    f.seed([ARTICLE], ["paris"])
+    assert f.filter([REPOST, OTHER], ["paris", "paris"]).tolist() == [False, True]
@@ -0,0 +1,79 @@
+"""doc_store：列式 mmap 存储按行还原 chunk / metadata，按 id 查行号，旧版文件可转换。"""
+import json
+import pickle
+
+import numpy as np
+import pytest
+
+from doc_store import DocStore, convert_legacy, write_doc_store
+
+CHUNKS = ["Seine at sunset", "卢浮宫排队很短", "", "Colosseum crowds"]
+METADATA = [
+    {"id": 10, "row": 1, "source": "a.csv", "title": "Seine", "url": "u1", "city": "paris",
+     "source_type": "medium", "row_hash": "h1", "vibes": ["浪漫", "适合步行"]},
+    {"id": 11, "row": 2, "source": "a.csv", "title": "卢浮宫", "url": "u2", "city": "paris",
+     "source_type": "medium", "row_hash": "h2", "vibes": []},
+    {"id": 12, "row": 2, "source": "a.csv", "title": "卢浮宫", "url": "u2", "city": "paris",
+     "source_type": "medium", "row_hash": "h2", "vibes": ["浪漫"]},
+    {"id": 20, "row": 1, "source": "b.csv", "title": "Colosseum", "url": "u3", "city": "rome",
+     "source_type": "reddit", "row_hash": "h3", "vibes": ["适合步行"]},
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    write_doc_store(str(tmp_path / "docstore"), CHUNKS, METADATA)
+    return DocStore(str(tmp_path / "docstore"))
+
+
+def test_round_trip(store):
+    assert len(store) == len(CHUNKS)
+    chunks, metadata = store.to_records()
+    assert chunks == CHUNKS
+    assert metadata == METADATA
+    assert store.chunk(1) == "卢浮宫排队很短"
+    assert store.value("city", 3) == "rome"
+
+
+def test_positions_by_id(store):
+    assert store.positions([20, 10, 99, -1]).tolist() == [3, 0, -1, -1]
+
+
+def test_positions_with_unsorted_ids(tmp_path):
+    metadata = [dict(md, id=i) for md, i in zip(METADATA, (5, 3, 9, 1))]
+    write_doc_store(str(tmp_path / "docstore"), CHUNKS, metadata)
+    store = DocStore(str(tmp_path / "docstore"))
+    assert store.positions([1, 3, 5, 9, 4]).tolist() == [3, 1, 0, 2, -1]
+
+
+def test_ids_by_value(store):
+    cities = store.ids_by_value("city")
+    assert {k: v.tolist() for k, v in cities.items()} == {"paris": [10, 11, 12], "rome": [20]}
+    vibes = store.ids_by_value("vibes")
+    assert {k: v.tolist() for k, v in vibes.items()} == {"浪漫": [10, 12], "适合步行": [10, 20]}
+
+
+def test_rewrite_replaces_directory(tmp_path, store):
+    write_doc_store(str(tmp_path / "docstore"), CHUNKS[:1], METADATA[:1])
+    assert len(DocStore(str(tmp_path / "docstore"))) == 1
+    assert not (tmp_path / "docstore.tmp").exists()
+    assert not (tmp_path / "docstore.old").exists()
+
+
+def test_rejects_misaligned_input(tmp_path):
+    with pytest.raises(ValueError):
+        write_doc_store(str(tmp_path / "docstore"), CHUNKS, METADATA[:2])
+    with pytest.raises(FileNotFoundError):
+        DocStore(str(tmp_path / "missing"))
+
+
+def test_convert_legacy(tmp_path):
+    legacy = [{k: v for k, v in md.items() if k != "id"} for md in METADATA]
+    (tmp_path / "metadata.json").write_text(json.dumps(legacy, ensure_ascii=False), encoding="utf-8")
+    with open(tmp_path / "chunks.pkl", "wb") as f:
+        pickle.dump(CHUNKS, f)
+    convert_legacy(str(tmp_path))
+
+    store = DocStore(str(tmp_path / "docstore"))
+    assert store.to_records()[0] == CHUNKS
+    np.testing.assert_array_equal(store.ids, np.arange(len(CHUNKS)))
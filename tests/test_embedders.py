@@ -0,0 +1,67 @@
+"""embedders：注册表、manifest 记录与兼容性检查；检索端拒绝加载用别的模型建的向量库。"""
+import json
+
+import pytest
+
+import rag_retrieval
+from embedders import EMBEDDERS, check_compatible, embedder_info, embedder_spec, load_embedder
+
+
+def test_registry_and_info():
+    assert embedder_info("minilm-onnx-int8") == {
+        "name": "minilm-onnx-int8",
+        "model": "sentence-transformers/all-MiniLM-L6-v2",
+        "dim": 384,
+        "backend": "onnx",
+    }
+    assert {spec["backend"] for spec in EMBEDDERS.values()} == {"torch", "onnx"}
+    with pytest.raises(ValueError):
+        embedder_spec("bge-large")
+
+
+def test_check_compatible():
+    minilm = embedder_info("minilm")
+    check_compatible(minilm, "minilm", dim=384)
+    check_compatible(minilm, "minilm-onnx-int8", dim=384)  # 同一模型换后端可以
+    check_compatible(None, "minilm")  # 旧版向量库按 minilm 处理
+    with pytest.raises(RuntimeError, match="RAG_EMBEDDER=minilm"):
+        check_compatible(minilm, "multilingual")
+    with pytest.raises(RuntimeError):
+        check_compatible(None, "multilingual")
+    with pytest.raises(RuntimeError):
+        check_compatible(minilm, "minilm", dim=768)
+
+
+def test_load_embedder_passes_backend(monkeypatch):
+    import sentence_transformers
+
+    calls = []
+    monkeypatch.setattr(sentence_transformers, "SentenceTransformer", lambda *a, **kw: calls.append((a, kw)))
+    load_embedder("minilm-onnx-int8")
+    load_embedder("multilingual")
+    assert calls[0] == (
+        ("sentence-transformers/all-MiniLM-L6-v2",),
+        {"backend": "onnx", "model_kwargs": {"file_name": EMBEDDERS["minilm-onnx-int8"]["file_name"]}},
+    )
+    assert calls[1] == (("sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",), {})
+
+
+@pytest.fixture
+def built(vector_store, monkeypatch):
+    vector_store.build([("seine", "We walked along the Seine at sunset.")])
+    monkeypatch.setattr(rag_retrieval, "_snapshot", None)
+    rag_retrieval.clear_caches()
+    yield vector_store
+    rag_retrieval.clear_caches()
+
+
+def test_retrieval_refuses_store_from_other_model(built, monkeypatch):
+    manifest = json.loads((built.current() / "manifest.json").read_text(encoding="utf-8"))
+    assert manifest["embedder"] == embedder_info("minilm")
+
+    monkeypatch.setattr(rag_retrieval, "EMBEDDER", "multilingual")
+    with pytest.raises(RuntimeError, match="multilingual"):
+        rag_retrieval.load_vector_store(str(built.dir))
+
+    monkeypatch.setattr(rag_retrieval, "EMBEDDER", "minilm-onnx-int8")
+    assert len(rag_retrieval.load_vector_store(str(built.dir)).store) == 1
@@ -0,0 +1,85 @@
+"""rag_retrieval 过滤检索：city / source_type / vibes 条件在 FAISS 内部生效，满足条件的够多时凑满 top_k。"""
+import pytest
+
+import ingest
+import rag_retrieval
+from conftest import write_posts
+
+PARIS = [
+    ("seine", "We walked along the Seine at sunset and watched the boats drift under the bridges."),
+    ("louvre", "The Louvre queue was short on a rainy morning and the glass pyramid glowed."),
+]
+ROME = [
+    ("colosseum", "The Colosseum at sunset was crowded but the light on the stones was beautiful."),
+    ("trastevere", "Dinner in Trastevere: cheap pasta, loud streets and a romantic walk home."),
+]
+ROME_REDDIT = [
+    ("metro", "Is the Rome metro safe at night? Locals said yes, just watch your pockets."),
+    ("gelato", "Best gelato near the Pantheon, skip the places with mountains of neon ice cream."),
+]
+VIBES = {"seine": ["浪漫"], "trastevere": ["浪漫", "适合步行"], "colosseum": ["适合步行"]}
+
+
+@pytest.fixture(params=["flat", "ivf_flat", "hnsw"])
+def retrieval(vector_store, monkeypatch, request):
+    data = vector_store.csv.parent.parent
+    files = {
+        vector_store.csv: PARIS,
+        data / "medium" / "rome_medium_posts.csv": ROME,
+        data / "reddit" / "rome_reddit_posts.csv": ROME_REDDIT,
+    }
+    for path, posts in files.items():
+        write_posts(path, posts)
+    # 按标题给 vibes（items 为 ("标题\n正文", 城市)）
+    monkeypatch.setattr(
+        ingest, "extract_vibes_batch", lambda items: [VIBES.get(text.split("\n")[0], []) for text, _ in items]
+    )
+    chunks, metadata, _ = ingest.build_chunks([str(p) for p in files], None)
+    embeddings = ingest.vectorize_chunks(chunks)
+    ingest.save_vector_store(embeddings, metadata, chunks, index_kind=request.param, index_params={})
+
+    monkeypatch.setattr(rag_retrieval, "_snapshot", None)
+    monkeypatch.setattr(rag_retrieval, "_embedder", vector_store.embedder)
+    rag_retrieval.clear_caches()
+    rag_retrieval.load_vector_store(str(vector_store.dir))
+    yield rag_retrieval
+    rag_retrieval.clear_caches()
+
+
+def titles(results):
+    return sorted(r["metadata"]["title"] for r in results)
+
+
+def test_city_filter(retrieval):
+    results = retrieval.search("sunset walk", top_k=10, filters={"city": "Rome"}, hybrid=False)
+    assert titles(results) == ["colosseum", "gelato", "metro", "trastevere"]
+
+
+def test_fields_intersect_and_lists_union(retrieval):
+    f = {"city": ["rome", "paris"], "source_type": "reddit"}
+    assert titles(retrieval.search("sunset walk", top_k=10, filters=f, hybrid=False)) == ["gelato", "metro"]
+    f = {"city": "rome", "vibes": ["浪漫", "夜景好看"]}
+    assert titles(retrieval.search("sunset walk", top_k=10, filters=f, hybrid=False)) == ["trastevere"]
+    f = {"vibes": "浪漫"}
+    assert titles(retrieval.search("sunset walk", top_k=10, filters=f, hybrid=False)) == ["seine", "trastevere"]
+
+
+def test_filter_fills_top_k_when_enough_match(retrieval):
+    results = retrieval.search("pasta", top_k=3, filters={"city": "rome"}, hybrid=False)
+    assert len(results) == 3
+    assert all(r["metadata"]["city"] == "rome" for r in results)
+
+
+def test_unknown_value_returns_nothing(retrieval):
+    assert retrieval.search("sunset", top_k=3, filters={"city": "tokyo"}) == []
+    assert retrieval.filter_ids({}) is None
+    assert retrieval.filter_ids({"city": ""}) is None
+
+
+def test_batch_groups_by_filter(retrieval):
+    out = retrieval.search_batch(
+        ["sunset", "sunset", "gelato"], top_k=10, filters=[{"city": "paris"}, None, {"source_type": "reddit"}], hybrid=False
+    )
+    assert titles(out[0]) == ["louvre", "seine"]
+    assert len(out[1]) == 6
+    assert titles(out[2]) == ["gelato", "metro"]
@@ -0,0 +1,76 @@
+"""ingest 全量构建：所有文件写进新的版本目录，写完才发布（见 store_generations.py）。"""
+import os
+
+import numpy as np
+import pytest
+
+import ingest
+import store_generations
+from conftest import write_posts
+
+POSTS = [
+    ("seine", "We walked along the Seine at sunset and watched the boats drift under the bridges."),
+    ("louvre", "The Louvre queue was short on a rainy morning and the glass pyramid glowed."),
+]
+MORE = POSTS + [("bakery", "Croissants from a corner bakery near Montmartre were the best breakfast.")]
+
+
+def test_build_moves_embeddings_into_place(vector_store):
+    vector_store.build(POSTS)
+    assert np.load(vector_store.current() / "embeddings.npy").shape[0] == 2
+    assert not (vector_store.dir / "embeddings.new.npy").exists()
+
+
+def test_failed_build_keeps_old_embeddings(vector_store, monkeypatch):
+    vector_store.build(POSTS)
+    before = np.load(vector_store.current() / "embeddings.npy")
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(ingest, "write_store_files", fail)
+    with pytest.raises(OSError):
+        vector_store.build(MORE)
+    np.testing.assert_array_equal(np.load(vector_store.current() / "embeddings.npy"), before)
+    # 写了一半的版本目录被删掉，只剩当前版本
+    assert sorted(p.name for p in vector_store.dir.glob("gen-*")) == [vector_store.current().name]
+
+
+def test_in_memory_embeddings_are_saved(vector_store):
+    chunks = [text for _, text in MORE]
+    metadata = [{"source": "s", "row": i, "title": t, "city": "paris"} for i, (t, _) in enumerate(MORE)]
+    embeddings = ingest.vectorize_chunks(chunks)
+    ingest.save_vector_store(embeddings, metadata, chunks, index_kind="flat", index_params={})
+    np.testing.assert_array_equal(np.load(vector_store.current() / "embeddings.npy"), embeddings)
+
+
+def test_publish_keeps_previous_generation_only(vector_store):
+    vector_store.build(POSTS)
+    first = vector_store.current()
+    vector_store.build(MORE)
+    second = vector_store.current()
+    vector_store.build(POSTS)
+
+    assert second != first
+    assert not first.exists()
+    assert second.exists()
+    assert sorted(p.name for p in vector_store.dir.glob("gen-*")) == [second.name, vector_store.current().name]
+
+
+def test_incremental_update_migrates_legacy_layout(vector_store):
+    vector_store.build(POSTS)
+    # 模拟旧版布局：构建产物直接放在 VECTOR_DIR 下，没有 CURRENT
+    gen = vector_store.current()
+    for p in gen.iterdir():
+        os.replace(p, vector_store.dir / p.name)
+    gen.rmdir()
+    (vector_store.dir / store_generations.POINTER).unlink()
+    assert vector_store.current() == vector_store.dir
+
+    write_posts(vector_store.csv, MORE)
+    metadata = ingest.update_vector_store([str(vector_store.csv)])
+    assert sorted(md["title"] for md in metadata) == ["bakery", "louvre", "seine"]
+    assert vector_store.current() != vector_store.dir
+    assert np.load(vector_store.current() / "embeddings.npy").shape[0] == 3
+    for name in store_generations.LEGACY_FILES:
+        assert not (vector_store.dir / name).exists()
@@ -0,0 +1,64 @@
+"""rag_retrieval 混合检索：按 rrf_score 排序，score 始终是稠密检索分数。"""
+import pytest
+
+import rag_retrieval
+
+POSTS = [
+    ("seine", "We walked along the Seine at sunset and watched the boats drift under the bridges."),
+    ("louvre", "The Louvre queue was short on a rainy morning and the glass pyramid glowed."),
+    ("bakery", "Croissants from a corner bakery near Montmartre were the best breakfast."),
+    ("metro", "The metro is cheap and fast, buy a carnet of tickets at any station."),
+    ("picnic", "A picnic by the Seine with cheese and wine is the classic Paris evening."),
+]
+
+
+@pytest.fixture
+def retrieval(vector_store, monkeypatch):
+    vector_store.build(POSTS)
+    monkeypatch.setattr(rag_retrieval, "_snapshot", None)
+    monkeypatch.setattr(rag_retrieval, "_embedder", vector_store.embedder)
+    rag_retrieval.clear_caches()
+    rag_retrieval.load_vector_store(str(vector_store.dir))
+    yield rag_retrieval
+    rag_retrieval.clear_caches()
+
+
+def dense_scores(query):
+    return {r["metadata"]["title"]: r["score"] for r in rag_retrieval.search(query, top_k=len(POSTS), hybrid=False)}
+
+
+def test_hybrid_keeps_dense_score_and_adds_rrf_score(retrieval):
+    query = "Seine evening picnic"
+    results = retrieval.search(query, top_k=3, hybrid=True)
+    dense = dense_scores(query)
+
+    assert [r["metadata"]["title"] for r in results][:2] == ["picnic", "seine"]
+    rrf = [r["rrf_score"] for r in results]
+    assert rrf == sorted(rrf, reverse=True)
+    for r in results:
+        assert r["score"] == pytest.approx(dense[r["metadata"]["title"]])
+
+
+@pytest.mark.parametrize("with_embeddings", [True, False])
+def test_bm25_only_hits_get_dense_score_from_embeddings(retrieval, with_embeddings):
+    vs = retrieval.load_vector_store()
+    if not with_embeddings:
+        vs = vs._replace(embeddings=None)
+    query = "metro tickets by the Seine"
+    qvec = retrieval.embed_query(query)
+    D, I = retrieval._search_matrix(vs.index, qvec.reshape(1, -1), 1, None, None, None)
+    top_dense = vs.store.metadata(vs.store.positions(I[0])[0])["title"]
+
+    # 稠密一路只给 1 条，其余结果都只被 BM25 召回
+    results = retrieval._fuse(vs, query, qvec, D[0], I[0], None, 3)
+    dense = dense_scores(query)
+    assert len(results) == 3
+    for r in results:
+        title = r["metadata"]["title"]
+        if title == top_dense:
+            assert r["score"] == pytest.approx(dense[title])
+        elif with_embeddings:
+            assert r["bm25_score"] is not None
+            assert r["score"] == pytest.approx(dense[title])
+        else:
+            assert r["score"] is None
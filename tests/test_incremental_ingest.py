@@ -0,0 +1,62 @@
+"""ingest.update_vector_store：被去重掉的整行，在它重复的那份 chunk 被删 / 被改后要重新进库。"""
+import json
+
+import numpy as np
+
+import ingest
+from conftest import write_posts
+from doc_store import DocStore
+
+ORIGINAL = "We walked along the Seine at sunset and watched the boats drift under the old stone bridges."
+ORIGINAL_TOO = "Croissants from a corner bakery near Montmartre were the best breakfast of the whole trip."
+OTHER = "The Louvre queue was short on a rainy weekday morning, and the glass pyramid glowed in the mist."
+
+
+def incremental(store, posts):
+    write_posts(store.csv, posts)
+    assert ingest.update_vector_store([str(store.csv)]) is not None
+    titles = sorted(md["title"] for md in DocStore(str(store.current() / "docstore")).to_records()[1])
+    dup_rows = json.loads((store.current() / "manifest.json").read_text(encoding="utf-8"))["dup_rows"]
+    return titles, dup_rows
+
+
+def test_copy_is_restored_when_original_is_deleted(vector_store):
+    vector_store.build([("original", ORIGINAL), ("copy", ORIGINAL), ("other", OTHER)])
+    titles, dup_rows = incremental(vector_store, [("original", ORIGINAL), ("copy", ORIGINAL), ("other", OTHER)])
+    assert titles == ["original", "other"]
+    assert [r[1] for r in dup_rows] == [1]
+
+    titles, dup_rows = incremental(vector_store, [("copy", ORIGINAL), ("other", OTHER)])
+    assert titles == ["copy", "other"]
+    assert dup_rows == []
+    assert np.load(vector_store.current() / "embeddings.npy").shape[0] == 2
+
+
+def test_copy_is_restored_when_original_is_edited(vector_store):
+    vector_store.build([("original", ORIGINAL), ("copy", ORIGINAL)])
+    titles, dup_rows = incremental(vector_store, [("original", ORIGINAL_TOO), ("copy", ORIGINAL)])
+    assert titles == ["copy", "original"]
+    assert dup_rows == []
+
+
+def test_copy_stays_deduplicated_while_original_remains(vector_store):
+    vector_store.build([("original", ORIGINAL), ("copy", ORIGINAL), ("other", OTHER)])
+    titles, dup_rows = incremental(vector_store, [("original", ORIGINAL), ("copy", ORIGINAL)])
+    assert titles == ["original"]
+    assert [r[:2] for r in dup_rows] == [[str(vector_store.csv), 1]]
+
+
+def test_missing_embeddings_forces_full_build(vector_store):
+    vector_store.build([("original", ORIGINAL), ("other", OTHER)])
+    (vector_store.current() / "embeddings.npy").unlink()
+    write_posts(vector_store.csv, [("original", ORIGINAL), ("other", OTHER), ("new", ORIGINAL_TOO)])
+    assert ingest.update_vector_store([str(vector_store.csv)]) is None
+
+
+def test_incremental_keeps_embeddings_aligned(vector_store):
+    vector_store.build([("original", ORIGINAL), ("other", OTHER)])
+    titles, _ = incremental(vector_store, [("other", OTHER), ("new", ORIGINAL_TOO)])
+    assert titles == ["new", "other"]
+    embeddings = np.load(vector_store.current() / "embeddings.npy")
+    assert embeddings.shape[0] == 2
+    np.testing.assert_array_equal(embeddings[1], vector_store.embedder.encode([ORIGINAL_TOO])[0])
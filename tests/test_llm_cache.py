@@ -0,0 +1,101 @@
+"""rag_qianfan.generate_answer 的回答缓存（key 含模型、温度与完整 prompt）及各缓存后端。"""
+import os
+
+import pytest
+from openai import OpenAI
+
+import cache
+import rag_qianfan
+from cache import DiskCache, make_backend
+from conftest import chat_completion
+
+DOCS = [
+    {
+        "chunk": "Walk along the Seine at night.",
+        "metadata": {"city": "paris", "title": "Paris by night", "vibes": ["浪漫"]},
+        "score": 0.9,
+    }
+]
+
+
+@pytest.fixture
+def llm(stub_server, monkeypatch):
+    monkeypatch.setattr(rag_qianfan, "client", OpenAI(api_key="test-key", base_url=stub_server.url + "/v1"))
+    monkeypatch.setattr(rag_qianfan, "_llm_cache", make_backend("memory", maxsize=8, ttl=60))
+    monkeypatch.setattr(rag_qianfan, "retrieve", lambda query, top_k=5, filters=None: DOCS)
+    stub_server.respond = lambda r: (200, chat_completion(f"第{len(stub_server.requests)}版行程"))
+    return stub_server
+
+
+def ask(question="巴黎两天", **kwargs):
+    content, _ = rag_qianfan.generate_answer(question, 2, city="paris", rerank=False, **kwargs)
+    return content
+
+
+def test_same_prompt_hits_cache(llm):
+    assert ask() == "第1版行程"
+    assert ask() == "第1版行程"
+    assert len(llm.requests) == 1
+    assert rag_qianfan.last_timings()["llm_ms"] == 0.0
+
+
+def test_key_covers_prompt_model_and_temperature(llm):
+    ask()
+    ask("巴黎三天")
+    ask(temperature=0.7)
+    ask(model="ernie-4.0-8k")
+    assert len(llm.requests) == 4
+    assert ask(temperature=0.7) == "第3版行程"
+
+
+def test_use_cache_switches(llm, monkeypatch):
+    ask(use_cache=False)
+    ask(use_cache=False)
+    assert len(llm.requests) == 2
+    assert rag_qianfan.llm_cache_stats()["size"] == 0
+
+    monkeypatch.setattr(rag_qianfan, "LLM_CACHE_SAMPLED", False)
+    ask(temperature=0.3)
+    ask(temperature=0.3)
+    assert len(llm.requests) == 4  # 采样回答默认不缓存
+    ask(temperature=0.3, use_cache=True)
+    ask(temperature=0.3, use_cache=True)
+    assert len(llm.requests) == 5
+
+
+def test_backend_off(llm, monkeypatch):
+    monkeypatch.setattr(rag_qianfan, "_llm_cache", make_backend("off"))
+    ask()
+    ask()
+    assert len(llm.requests) == 2
+    assert rag_qianfan.llm_cache_stats() == {}
+
+
+def test_disk_cache_round_trip_and_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    disk = make_backend("disk", path=str(tmp_path / "llm"), ttl=60)
+    disk.set("key/with:odd chars", "回答")
+    assert DiskCache(str(tmp_path / "llm")).get("key/with:odd chars") == "回答"
+    assert not list((tmp_path / "llm").rglob("*.tmp"))
+    now[0] += 61
+    assert disk.get("key/with:odd chars") is None
+    assert len(disk) == 0
+
+
+def test_disk_cache_evicts_oldest(tmp_path):
+    disk = DiskCache(str(tmp_path / "llm"), maxsize=2, evict_every=1)
+    for i, key in enumerate("abc"):
+        disk.set(key, key)
+        fp = disk._file(key)
+        os.utime(fp, (i, i))  # 文件修改时间即最近访问时间
+    assert len(disk) == 2
+    assert disk.get("a") is None
+    assert disk.stats()["evictions"] == 1
+
+
+def test_make_backend_rejects_bad_config(tmp_path):
+    with pytest.raises(ValueError):
+        make_backend("disk")
+    with pytest.raises(ValueError):
+        make_backend("redis", path=str(tmp_path))
@@ -0,0 +1,38 @@
+"""metrics 的缓存统计：各来源返回的嵌套 stats 逐层展开。"""
+import pytest
+
+import metrics
+from cache import LRUCache, make_cache
+
+
+@pytest.fixture
+def sources(monkeypatch, tmp_path):
+    monkeypatch.setattr(metrics, "_sources", {})
+    tiered = make_cache(8, None, str(tmp_path / "cache"))  # 设置了 RAG_CACHE_PATH 时的两级缓存
+    tiered.get("missing")
+    lru = LRUCache(maxsize=8)
+    lru.set("k", 1)
+    lru.get("k")
+    metrics.register_source("retrieval", lambda: {"query_embeddings": tiered.stats(), "results": lru.stats()})
+    metrics.register_source("llm", lru.stats)
+    metrics.register_source("weather", lambda: {"geocode_size": 3, "forecast": lru.stats()})
+    metrics.register_source("broken", lambda: 1 / 0)
+
+
+def test_nested_stats_are_flattened_with_dots(sources):
+    caches = metrics._cache_stats()
+    assert sorted(caches) == [
+        "llm",
+        "retrieval.query_embeddings.memory",
+        "retrieval.query_embeddings.persistent",
+        "retrieval.results",
+        "weather.forecast",
+    ]
+    assert caches["retrieval.query_embeddings.persistent"]["misses"] == 1
+    assert caches["llm"]["hits"] == 1
+
+
+def test_prometheus_text_labels_every_cache(sources):
+    text = metrics.prometheus_text()
+    assert 'rag_cache_misses_total{cache="retrieval.query_embeddings.persistent"} 1' in text
+    assert 'rag_cache_hits_total{cache="weather.forecast"} 1' in text
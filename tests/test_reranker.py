@@ -0,0 +1,78 @@
+"""reranker：按交叉编码器分数重排、分数缓存，以及延迟预算用完或模型不可用时保持检索原顺序。"""
+import time
+
+import pytest
+
+import reranker
+from cache import make_cache
+from reranker import rerank
+
+CANDIDATES = [{"chunk": f"chunk {i}", "metadata": {"title": f"t{i}"}, "score": float(i)} for i in range(10)]
+
+
+class FakeCrossEncoder:
+    """分数为 chunk 编号（越大越相关）；每批 predict 停 delay 秒。"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+
+    def predict(self, pairs, **kwargs):
+        self.batches.append(len(pairs))
+        time.sleep(self.delay)
+        return [float(chunk.split()[-1]) for _, chunk in pairs]
+
+
+@pytest.fixture
+def model(monkeypatch):
+    fake = FakeCrossEncoder()
+    monkeypatch.setattr(reranker, "_model", fake)
+    monkeypatch.setattr(reranker, "_model_error", None)
+    monkeypatch.setattr(reranker, "_score_cache", make_cache(64))
+    return fake
+
+
+def titles(results):
+    return [r["metadata"]["title"] for r in results]
+
+
+def test_reorders_by_score_and_caches(model):
+    results, info = rerank("best chunk", CANDIDATES, top_k=3, batch_size=4)
+    assert titles(results) == ["t9", "t8", "t7"]
+    assert [r["rerank_score"] for r in results] == [9.0, 8.0, 7.0]
+    assert "rerank_score" not in CANDIDATES[9]  # 原 dict 不变
+    assert model.batches == [4, 4, 2]
+    assert info["scored"] == 10 and info["batches"] == 3 and not info["fallback"]
+
+    # 查询里的空白差异命中同一缓存，不再调用模型
+    results, info = rerank("  best   chunk ", CANDIDATES, top_k=3, batch_size=4)
+    assert titles(results) == ["t9", "t8", "t7"]
+    assert info["cached"] == 10 and info["scored"] == 0
+    assert model.batches == [4, 4, 2]
+
+
+def test_budget_stops_between_batches(model):
+    model.delay = 0.1
+    results, info = rerank("q", CANDIDATES, top_k=10, budget_ms=250, batch_size=4)
+    assert info["fallback"]
+    assert info["batches"] == 2 and info["scored"] == 8
+    # 打过分的前缀按分数排，其余按检索顺序接在后面
+    assert titles(results) == ["t7", "t6", "t5", "t4", "t3", "t2", "t1", "t0", "t8", "t9"]
+    assert [r["rerank_score"] for r in results[-2:]] == [None, None]
+
+
+def test_unscored_gap_keeps_retrieval_order(model):
+    reranker._score_cache.set(reranker._score_key("q", "chunk 5"), 5.0)
+    results, info = rerank("q", CANDIDATES[4:7], top_k=3, budget_ms=0)
+    assert info["cached"] == 1 and info["scored"] == 0 and info["fallback"]
+    assert titles(results) == ["t4", "t5", "t6"]
+
+
+def test_model_unavailable_falls_back(monkeypatch):
+    monkeypatch.setattr(reranker, "_model", None)
+    monkeypatch.setattr(reranker, "_model_error", OSError("offline"))
+    monkeypatch.setattr(reranker, "_score_cache", make_cache(64))
+    results, info = rerank("q", CANDIDATES, top_k=2)
+    assert titles(results) == ["t0", "t1"]
+    assert info["fallback"] and info["scored"] == 0
+    assert not reranker.warm_up()
@@ -0,0 +1,107 @@
+"""retrieval_server：并发请求攒成 micro-batch 按参数分组执行；HTTP 接口与 RetrievalClient 的结果同进程内检索一致。"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import rag_retrieval
+from retrieval_client import RetrievalClient, RetrievalError
+from retrieval_server import MicroBatcher, RetrievalService, make_handler
+
+POSTS = [
+    ("seine", "We walked along the Seine at sunset and watched the boats drift under the bridges."),
+    ("louvre", "The Louvre queue was short on a rainy morning and the glass pyramid glowed."),
+    ("bakery", "Croissants from a corner bakery near Montmartre were the best breakfast."),
+    ("metro", "The metro is cheap and fast, buy a carnet of tickets at any station."),
+]
+
+
+def test_micro_batcher_groups_concurrent_requests():
+    calls = []
+    gate = threading.Event()
+
+    def fn(key, items):
+        gate.wait(5)
+        calls.append((key, list(items)))
+        if key == "bad":
+            raise ValueError("boom")
+        return [f"{key}:{item}" for item in items]
+
+    batcher = MicroBatcher(fn, max_batch=8, max_wait_ms=200)
+    jobs = [("a", 1), ("b", 2), ("a", 3), ("bad", 4), ("a", 5)]
+    with ThreadPoolExecutor(len(jobs)) as pool:
+        futures = [pool.submit(batcher.submit, key, item, 5) for key, item in jobs]
+        gate.set()
+        assert [f.result() for f in futures if f is not futures[3]] == ["a:1", "b:2", "a:3", "a:5"]
+        with pytest.raises(ValueError):
+            futures[3].result()
+
+    assert sorted(key for key, _ in calls) == ["a", "b", "bad"]  # 每组一次调用
+    assert sorted(dict(calls)["a"]) == [1, 3, 5]
+    assert batcher.stats() == {"batches": 1, "requests": 5, "avg_batch": 5.0, "max_batch": 5}
+
+
+def test_micro_batcher_respects_max_batch():
+    batcher = MicroBatcher(lambda key, items: items, max_batch=2, max_wait_ms=100)
+    with ThreadPoolExecutor(5) as pool:
+        assert sorted(pool.map(lambda i: batcher.submit("k", i, 5), range(5))) == list(range(5))
+    assert batcher.stats()["max_batch"] <= 2
+    assert batcher.stats()["requests"] == 5
+
+
+@pytest.fixture
+def server(vector_store, monkeypatch):
+    vector_store.build(POSTS)
+    monkeypatch.chdir(vector_store.dir.parent)  # warm_up 加载默认的 ./vector_store
+    monkeypatch.setattr(rag_retrieval, "_snapshot", None)
+    monkeypatch.setattr(rag_retrieval, "_embedder", vector_store.embedder)
+    rag_retrieval.clear_caches()
+
+    service = RetrievalService(max_batch=8, max_wait_ms=20)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(service))
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield service, RetrievalClient(f"http://127.0.0.1:{httpd.server_address[1]}", timeout=10)
+    httpd.shutdown()
+    httpd.server_close()
+    rag_retrieval.clear_caches()
+
+
+def test_health_reports_warm_up(server):
+    service, client = server
+    assert client.health()["state"] == "loading"
+    service.warm_up()
+    health = client.health()
+    assert health["ready"] and set(health["timings"]) == {"embedder_ms", "index_ms", "first_query_ms"}
+
+
+def test_client_results_match_in_process_search(server):
+    service, client = server
+    service.warm_up()
+    queries = ["Seine sunset", "metro tickets", "bakery breakfast", "Louvre pyramid"]
+    with ThreadPoolExecutor(len(queries)) as pool:
+        remote = list(pool.map(lambda q: client.search(q, top_k=2, hybrid=False), queries))
+
+    rag_retrieval.clear_caches()
+    for q, results in zip(queries, remote):
+        local = rag_retrieval.search(q, top_k=2, hybrid=False)
+        assert [r["metadata"]["title"] for r in results] == [r["metadata"]["title"] for r in local]
+        assert [r["score"] for r in results] == pytest.approx([r["score"] for r in local])
+    stats = client.stats()["batching"]
+    assert stats["requests"] == len(queries) and stats["batches"] <= len(queries)
+
+
+def test_bad_requests(server):
+    service, client = server
+    service.warm_up()
+    with pytest.raises(RetrievalError, match="400"):
+        client.search("   ")
+    status, _ = client._request("GET", "/nope")
+    assert status == 404
+    assert client.search("Seine", top_k=1, filters={"city": "rome"}) == []
+
+
+def test_unreachable_server():
+    health = RetrievalClient("http://127.0.0.1:9", timeout=1).health()
+    assert health["state"] == "unreachable" and not health["ready"]
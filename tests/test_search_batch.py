@@ -0,0 +1,49 @@
+"""rag_retrieval.search_batch：只编码没命中结果缓存的查询，结果与逐条 search 相同。"""
+import pytest
+
+import rag_retrieval
+
+POSTS = [
+    ("seine", "We walked along the Seine at sunset and watched the boats drift under the bridges."),
+    ("louvre", "The Louvre queue was short on a rainy morning and the glass pyramid glowed."),
+    ("bakery", "Croissants from a corner bakery near Montmartre were the best breakfast."),
+    ("metro", "The metro is cheap and fast, buy a carnet of tickets at any station."),
+]
+
+
+@pytest.fixture
+def retrieval(vector_store, monkeypatch):
+    vector_store.build(POSTS)
+    monkeypatch.setattr(rag_retrieval, "_snapshot", None)
+    monkeypatch.setattr(rag_retrieval, "_embedder", vector_store.embedder)
+    rag_retrieval.clear_caches()
+    rag_retrieval.load_vector_store(str(vector_store.dir))
+    yield rag_retrieval
+    rag_retrieval.clear_caches()
+
+
+def test_only_uncached_queries_are_embedded(retrieval, monkeypatch):
+    retrieval.search("Seine sunset", top_k=2, hybrid=False)
+    calls = []
+    embed = retrieval.embed_queries
+
+    def recording(queries, **kwargs):
+        calls.append(list(queries))
+        return embed(queries, **kwargs)
+
+    monkeypatch.setattr(retrieval, "embed_queries", recording)
+    queries = ["Seine sunset", "bakery croissants", "metro tickets"]
+    filters = [None, None, {"city": "paris"}]
+    out = retrieval.search_batch(queries, top_k=2, filters=filters, hybrid=False)
+
+    assert sorted(calls) == [["bakery croissants"], ["metro tickets"]]
+    assert all(out)
+    for q, f, results in zip(queries, filters, out):
+        assert results == retrieval.search(q, top_k=2, filters=f, hybrid=False)
+
+
+def test_fully_cached_batch_embeds_nothing(retrieval, monkeypatch):
+    queries = ["Louvre pyramid", "bakery croissants"]
+    first = retrieval.search_batch(queries, top_k=2)
+    monkeypatch.setattr(retrieval, "embed_queries", lambda *a, **k: pytest.fail("embedded a cached query"))
+    assert retrieval.search_batch(queries, top_k=2) == first
@@ -0,0 +1,78 @@
+"""ingest 重写向量库时：embeddings.npy 原子替换，不改写检索端已 mmap 的旧文件；检索端发现后重新加载。"""
+import numpy as np
+import pytest
+
+import ingest
+import rag_retrieval
+from conftest import write_posts
+
+BEFORE = [
+    ("seine", "We walked along the Seine at sunset and watched the boats drift under the bridges."),
+    ("louvre", "The Louvre queue was short on a rainy morning and the glass pyramid glowed."),
+]
+AFTER = BEFORE + [("bakery", "Croissants from a corner bakery near Montmartre were the best breakfast.")]
+
+
+@pytest.fixture
+def retrieval(vector_store, monkeypatch):
+    vector_store.build(BEFORE)
+    monkeypatch.setattr(rag_retrieval, "_snapshot", None)
+    monkeypatch.setattr(rag_retrieval, "_embedder", vector_store.embedder)
+    monkeypatch.setattr(rag_retrieval, "STORE_CHECK_INTERVAL", 0.0)
+    rag_retrieval.clear_caches()
+    rag_retrieval.load_vector_store(str(vector_store.dir))
+    yield rag_retrieval
+    rag_retrieval.clear_caches()
+
+
+def titles(results):
+    return [r["metadata"]["title"] for r in results]
+
+
+@pytest.mark.parametrize("rebuild", ["full", "incremental"])
+def test_rewrite_replaces_files_and_reloads(retrieval, vector_store, rebuild):
+    assert "bakery" not in titles(retrieval.search("croissants bakery breakfast", top_k=3))
+    old_embeddings = retrieval.load_vector_store().embeddings
+    snapshot = np.array(old_embeddings)
+
+    if rebuild == "full":
+        vector_store.build(AFTER)
+    else:
+        write_posts(vector_store.csv, AFTER)
+        ingest.update_vector_store([str(vector_store.csv)])
+
+    # 旧 mmap 指向的是被替换掉的文件，内容不变
+    np.testing.assert_array_equal(old_embeddings, snapshot)
+    assert not list(vector_store.dir.glob("*.tmp"))
+
+    results = retrieval.search("croissants bakery breakfast", top_k=3)
+    assert titles(results)[0] == "bakery"
+    embeddings = retrieval.load_vector_store().embeddings
+    assert embeddings is not old_embeddings
+    assert embeddings.shape[0] == 3
+
+
+def test_no_reload_while_files_unchanged(retrieval):
+    vs = retrieval.load_vector_store()
+    retrieval.search("Seine", top_k=1)
+    assert retrieval.load_vector_store() is vs
+
+
+def test_failed_reload_keeps_serving_old_snapshot(retrieval, vector_store, monkeypatch):
+    vs = retrieval.load_vector_store()
+    vector_store.build(AFTER)
+
+    load = retrieval._load_vector_store
+    broken = [True]
+
+    def half_written(vector_dir):
+        if broken[0]:
+            raise FileNotFoundError(f"docstore not found: {vector_dir}/docstore")
+        return load(vector_dir)
+
+    monkeypatch.setattr(retrieval, "_load_vector_store", half_written)
+    assert retrieval.load_vector_store() is vs
+    assert "bakery" not in titles(retrieval.search("croissants bakery breakfast", top_k=3))
+
+    broken[0] = False
+    assert titles(retrieval.search("croissants bakery breakfast", top_k=3))[0] == "bakery"
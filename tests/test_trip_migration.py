@@ -0,0 +1,108 @@
+"""trip_storage：_migration_1 合并重复行程并加唯一索引；get_trips_with_items 分页。"""
+import sqlite3
+
+import pytest
+
+import trip_storage
+
+
+@pytest.fixture
+def db_path(monkeypatch, tmp_path):
+    trip_storage.close_all()
+    path = str(tmp_path / "trips.db")
+    monkeypatch.setattr(trip_storage, "DB_PATH", path)
+    yield path
+    trip_storage.close_all()
+
+
+def seed_legacy(path, trips, items):
+    """迁移前的表结构（没有唯一约束，user_version=0），trips 为 [(city, start, end), ...]。"""
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE trips(
+            id INTEGER PRIMARY KEY AUTOINCREMENT, city TEXT, start_date TEXT, end_date TEXT, title TEXT
+        );
+        CREATE TABLE items(
+            id INTEGER PRIMARY KEY AUTOINCREMENT, trip_id INTEGER, name TEXT, day TEXT, time TEXT, note TEXT
+        );
+        """
+    )
+    conn.executemany(
+        "INSERT INTO trips (city, start_date, end_date, title) VALUES (?, ?, ?, ?)",
+        [(c, s, e, f"{c} {s}") for c, s, e in trips],
+    )
+    conn.executemany("INSERT INTO items (trip_id, name, day, time, note) VALUES (?, ?, '', '', '')", items)
+    conn.commit()
+    conn.close()
+
+
+def test_migration_merges_duplicate_trips(db_path):
+    seed_legacy(
+        db_path,
+        [
+            ("paris", "2026-05-01", "2026-05-03"),  # 1
+            ("paris", "2026-05-01", "2026-05-03"),  # 2：与 1 重复
+            ("rome", "2026-06-01", "2026-06-02"),  # 3
+            ("paris", "2026-05-01", "2026-05-03"),  # 4：与 1 重复
+            ("paris", None, None),  # 5
+            ("paris", None, None),  # 6：日期为空也算重复
+        ],
+        [(1, "Louvre"), (2, "Orsay"), (3, "Colosseum"), (4, "Seine"), (6, "Montmartre")],
+    )
+    trip_storage.init_db()
+
+    with trip_storage.connection() as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == len(trip_storage.MIGRATIONS)
+        assert [r[0] for r in conn.execute("SELECT id FROM trips ORDER BY id")] == [1, 3, 5]
+        indexes = {r[1]: r[2] for r in conn.execute("PRAGMA index_list(trips)")}
+    assert indexes["trips_city_dates"] == 1
+    assert [i[1] for i in trip_storage.get_items(1)] == ["Louvre", "Orsay", "Seine"]
+    assert [i[1] for i in trip_storage.get_items(3)] == ["Colosseum"]
+    assert [i[1] for i in trip_storage.get_items(5)] == ["Montmartre"]
+
+    with pytest.raises(sqlite3.IntegrityError):
+        with trip_storage.transaction() as cur:
+            cur.execute(
+                "INSERT INTO trips (city, start_date, end_date, title) VALUES ('rome', '2026-06-01', '2026-06-02', 'x')"
+            )
+    assert trip_storage.create_or_get_trip("rome", "2026-06-01", "2026-06-02") == 3
+
+
+def test_migration_runs_once(db_path):
+    trip_storage.init_db()
+    trip_id = trip_storage.create_or_get_trip("paris", "2026-05-01", "2026-05-03")
+    trip_storage.init_db()
+    assert trip_storage.create_or_get_trip("paris", "2026-05-01", "2026-05-03") == trip_id
+    assert trip_storage.count_trips() == 1
+
+
+def test_get_trips_with_items_pages(db_path):
+    trip_storage.init_db()
+    # 同一天出发的两条按 id 倒序；没有收藏项的行程也要出现
+    trips = {
+        "a": trip_storage.create_or_get_trip("paris", "2026-05-01", "2026-05-03"),
+        "b": trip_storage.create_or_get_trip("rome", "2026-07-01", "2026-07-05"),
+        "c": trip_storage.create_or_get_trip("prague", "2026-05-01", "2026-05-02"),
+        "d": trip_storage.create_or_get_trip("vienna", "2026-03-10", "2026-03-12"),
+        "e": trip_storage.create_or_get_trip("lisbon", "2026-08-01", "2026-08-04"),
+    }
+    trip_storage.add_items(trips["a"], [("Louvre", "Day 1", ""), ("Orsay", "Day 2", "")])
+    trip_storage.add_item(trips["c"], "Charles Bridge", "Day 1", "")
+    trip_storage.add_item(trips["a"], "Seine", "Day 2", "")
+    trip_storage.add_item(trips["d"], "Belvedere", "Day 1", "")
+
+    expected = [t[0] for t in trip_storage.get_all_trips()]
+    assert expected == [trips[k] for k in ("e", "b", "c", "a", "d")]
+
+    pages = [trip_storage.get_trips_with_items(limit=2, offset=o) for o in (0, 2, 4, 6)]
+    assert [len(p) for p in pages] == [2, 2, 1, 0]
+    flat = [trip for page in pages for trip in page]
+    assert [trip[0][0] for trip in flat] == expected
+
+    items = {trip[0][0]: [i[1] for i in trip[1]] for trip in flat}
+    assert items[trips["a"]] == ["Louvre", "Orsay", "Seine"]
+    assert items[trips["c"]] == ["Charles Bridge"]
+    assert items[trips["d"]] == ["Belvedere"]
+    assert items[trips["b"]] == [] and items[trips["e"]] == []
+    assert flat[0][0] == (trips["e"], "lisbon", "2026-08-01", "2026-08-04", "lisbon 行程（2026-08-01）")
@@ -0,0 +1,59 @@
+"""trip_storage 连接池：不同线程（Streamlit 的每次 rerun）轮流操作时复用同一个连接。"""
+import threading
+
+import pytest
+
+import trip_storage
+
+
+@pytest.fixture
+def db(monkeypatch, tmp_path):
+    trip_storage.close_all()
+    monkeypatch.setattr(trip_storage, "DB_PATH", str(tmp_path / "trips.db"))
+    trip_storage.init_db()
+    yield
+    trip_storage.close_all()
+
+
+def run_in_thread(fn, *args):
+    result = []
+    t = threading.Thread(target=lambda: result.append(fn(*args)))
+    t.start()
+    t.join()
+    return result[0]
+
+
+def test_connection_is_reused_across_threads(db):
+    trip_id = run_in_thread(trip_storage.create_or_get_trip, "paris", "2026-05-01", "2026-05-03")
+    run_in_thread(trip_storage.add_item, trip_id, "Louvre", "Day 1", "")
+    assert run_in_thread(trip_storage.create_or_get_trip, "paris", "2026-05-01", "2026-05-03") == trip_id
+    assert [i[1] for i in run_in_thread(trip_storage.get_items, trip_id)] == ["Louvre"]
+
+    assert len(trip_storage._pool[trip_storage.DB_PATH]) == 1
+
+
+def test_pool_keeps_at_most_pool_size_idle_connections(db, monkeypatch):
+    monkeypatch.setattr(trip_storage, "POOL_SIZE", 2)
+    barrier = threading.Barrier(4)
+
+    def hold():
+        with trip_storage.connection():
+            barrier.wait()
+
+    threads = [threading.Thread(target=hold) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(trip_storage._pool[trip_storage.DB_PATH]) == 2
+
+
+def test_failed_transaction_rolls_back_and_returns_connection(db):
+    trip_id = trip_storage.create_or_get_trip("rome", "2026-06-01", "2026-06-02")
+    with pytest.raises(RuntimeError):
+        with trip_storage.transaction() as cur:
+            cur.execute("INSERT INTO items (trip_id, name, day, time, note) VALUES (?, 'x', '', '', '')", (trip_id,))
+            raise RuntimeError("boom")
+    assert trip_storage.get_items(trip_id) == []
+    assert trip_storage._local.conn is None
+    assert len(trip_storage._pool[trip_storage.DB_PATH]) == 1
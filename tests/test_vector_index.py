@@ -0,0 +1,90 @@
+"""vector_index：各索引类型的构建、查询期参数与按 id 删除。"""
+import faiss
+import numpy as np
+import pytest
+
+from vector_index import (
+    INDEX_KINDS,
+    base_index,
+    build_index,
+    default_nlist,
+    exhaustive_params,
+    make_search_params,
+    supports_remove,
+)
+
+N, DIM, K = 2000, 32, 10
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(40, DIM)).astype(np.float32)
+    xb = centers[rng.integers(0, len(centers), size=N)] + 0.3 * rng.normal(size=(N, DIM)).astype(np.float32)
+    xq = xb[rng.choice(N, size=50, replace=False)] + 0.05 * rng.normal(size=(50, DIM)).astype(np.float32)
+    ids = np.arange(N, dtype=np.int64) * 3 + 7  # 不连续的 id，检查 IDMap 映射
+    return xb, xq, ids
+
+
+def recall(I, gt):
+    return np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(I, gt)])
+
+
+@pytest.mark.parametrize("kind", INDEX_KINDS)
+def test_every_kind_finds_neighbours_by_id(data, kind):
+    xb, xq, ids = data
+    _, gt = build_index(xb, ids, kind="flat").search(xq, K)
+    index = build_index(xb, ids, kind=kind, pq_m=8)
+
+    params = exhaustive_params(index) if kind != "flat" else None
+    _, I = index.search(xq, K, params=params)
+    assert set(np.unique(I)) <= set(ids.tolist())
+    assert recall(I, gt) >= (0.6 if kind == "ivf_pq" else 0.95)
+
+
+def test_search_params_match_index_type(data):
+    xb, _, ids = data
+    ivf = build_index(xb, ids, kind="ivf_flat")
+    hnsw = build_index(xb, ids, kind="hnsw")
+    flat = build_index(xb, ids, kind="flat")
+
+    assert isinstance(make_search_params(ivf, nprobe=4), faiss.SearchParametersIVF)
+    assert make_search_params(ivf, nprobe=4).nprobe == 4
+    assert make_search_params(hnsw, ef_search=64).efSearch == 64
+    assert make_search_params(flat, nprobe=4, ef_search=64) is None
+    assert exhaustive_params(ivf).nprobe == base_index(ivf).nlist
+    assert exhaustive_params(flat) is None
+
+
+def test_more_probes_do_not_lower_recall(data):
+    xb, xq, ids = data
+    _, gt = build_index(xb, ids, kind="flat").search(xq, K)
+    index = build_index(xb, ids, kind="ivf_flat")
+    recalls = [
+        recall(index.search(xq, K, params=make_search_params(index, nprobe=p))[1], gt) for p in (1, 8, 64)
+    ]
+    assert recalls == sorted(recalls)
+    assert recalls[-1] >= 0.95
+
+
+def test_remove_ids_except_hnsw(data):
+    xb, xq, ids = data
+    for kind in INDEX_KINDS:
+        index = build_index(xb, ids, kind=kind, pq_m=8)
+        assert supports_remove(index) == (kind != "hnsw")
+    index = build_index(xb, ids, kind="ivf_flat")
+    _, I = index.search(xq[:1], 1)
+    index.remove_ids(I[0])
+    _, I2 = index.search(xq[:1], K, params=exhaustive_params(index))
+    assert I[0][0] not in I2[0]
+    assert index.ntotal == N - 1
+
+
+def test_invalid_options_are_rejected(data):
+    xb, _, _ = data
+    with pytest.raises(ValueError):
+        build_index(xb, kind="annoy")
+    with pytest.raises(ValueError):
+        build_index(xb, kind="ivf_pq", pq_m=5)
+    assert default_nlist(N) == min(int(4 * np.sqrt(N)), N // 39)
+    assert default_nlist(10) == 1
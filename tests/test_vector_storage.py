@@ -0,0 +1,129 @@
+"""vector_index 的 cosine 度量与 fp16 / int8 标量量化存储，以及 rag_retrieval 用原始向量的精确重排。"""
+import faiss
+import numpy as np
+import pytest
+
+import ingest
+import rag_retrieval
+from conftest import write_posts
+from vector_index import add_vectors, base_index, build_index, exact_scores, prepare_vectors
+
+N, DIM, K = 2000, 32, 10
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(1)
+    xb = rng.normal(size=(N, DIM)).astype(np.float32) * rng.uniform(0.5, 5, size=(N, 1)).astype(np.float32)
+    xq = rng.normal(size=(20, DIM)).astype(np.float32)
+    return xb, xq
+
+
+def unit(x):
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def recall(I, gt):
+    return np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(I, gt)])
+
+
+def test_cosine_scores_are_cosine_similarity(data):
+    xb, xq = data
+    index = build_index(xb, metric="cosine")
+    D, I = index.search(prepare_vectors(index, xq), K)
+
+    expected = unit(xq) @ unit(xb).T
+    np.testing.assert_allclose(D, np.take_along_axis(expected, I, axis=1), rtol=1e-5, atol=1e-5)
+    np.testing.assert_array_equal(I[:, 0], expected.argmax(axis=1))
+    assert (np.diff(D, axis=1) <= 0).all()  # 越大越相似
+
+    # 增量加入的向量同样归一化：放大后的查询向量本身得分为 1
+    add_vectors(index, xq[:1] * 10, [N])
+    D, I = index.search(prepare_vectors(index, xq[:1]), 1)
+    assert I[0, 0] == N and D[0, 0] == pytest.approx(1.0, abs=1e-5)
+
+
+@pytest.mark.parametrize("kind", ["flat", "ivf_flat", "hnsw"])
+@pytest.mark.parametrize("sq, bytes_per_dim, min_recall", [("fp16", 2, 0.98), ("int8", 1, 0.8)])
+def test_scalar_quantized_storage(data, kind, sq, bytes_per_dim, min_recall):
+    xb, xq = data
+    exact = build_index(xb, metric="cosine")
+    _, gt = exact.search(prepare_vectors(exact, xq), K)
+
+    index = build_index(xb, kind=kind, metric="cosine", sq=sq)
+    base = base_index(index)
+    storage = faiss.downcast_index(base.storage) if kind == "hnsw" else base
+    assert storage.code_size == DIM * bytes_per_dim
+    if kind == "ivf_flat":
+        base.nprobe = base.nlist
+    elif kind == "hnsw":
+        base.hnsw.efSearch = 256
+    _, I = index.search(prepare_vectors(index, xq), K)
+    assert recall(I, gt) >= min_recall
+
+
+@pytest.mark.parametrize("metric", ["l2", "cosine"])
+def test_exact_scores_match_float32_index(data, metric):
+    xb, xq = data
+    index = build_index(xb, metric=metric)
+    qmat = prepare_vectors(index, xq)
+    D, I = index.search(qmat, K)
+    for row in range(len(xq)):
+        np.testing.assert_allclose(exact_scores(index, qmat[row], xb[I[row]]), D[row], rtol=1e-4, atol=1e-3)
+
+
+def test_invalid_storage_options_are_rejected(data):
+    xb, _ = data
+    with pytest.raises(ValueError):
+        build_index(xb, metric="dot")
+    with pytest.raises(ValueError):
+        build_index(xb, sq="int4")
+    with pytest.raises(ValueError):
+        build_index(xb, kind="ivf_pq", sq="fp16", pq_m=8)
+
+
+# ---------- 检索端精确重排 ----------
+POSTS = [
+    ("seine", "We walked along the Seine at sunset and watched the boats drift under the bridges."),
+    ("louvre", "The Louvre queue was short on a rainy morning and the glass pyramid glowed."),
+    ("bakery", "Croissants from a corner bakery near Montmartre were the best breakfast."),
+    ("metro", "The metro is cheap and fast, buy a carnet of tickets at any station."),
+    ("picnic", "A picnic by the Seine with cheese and wine is the classic Paris evening."),
+    ("tower", "The Eiffel Tower sparkles every hour after dark, watch it from the Trocadero."),
+]
+
+
+@pytest.fixture
+def quantized(vector_store, monkeypatch):
+    write_posts(vector_store.csv, POSTS)
+    chunks, metadata, _ = ingest.build_chunks([str(vector_store.csv)], None)
+    embeddings = ingest.vectorize_chunks(chunks)
+    ingest.save_vector_store(
+        embeddings, metadata, chunks, index_kind="flat", index_params={"metric": "cosine", "sq": "int8"}
+    )
+    monkeypatch.setattr(rag_retrieval, "_snapshot", None)
+    monkeypatch.setattr(rag_retrieval, "_embedder", vector_store.embedder)
+    rag_retrieval.clear_caches()
+    rag_retrieval.load_vector_store(str(vector_store.dir))
+    yield embeddings, metadata
+    rag_retrieval.clear_caches()
+
+
+def test_exact_rerank_uses_full_precision_vectors(quantized, vector_store):
+    embeddings, metadata = quantized
+    query = "Seine sunset picnic with wine"
+    qvec = unit(vector_store.embedder.encode([query]))[0]
+    expected = unit(embeddings) @ qvec
+    titles = [md["title"] for md in metadata]
+
+    results = rag_retrieval.search(query, top_k=3, hybrid=False, exact_rerank=True)
+    assert [r["metadata"]["title"] for r in results][:2] == ["picnic", "seine"]
+    # 按原始向量的余弦相似度排序（并列时顺序不定，只比分数）
+    assert [r["score"] for r in results] == pytest.approx(np.sort(expected)[::-1][:3], abs=1e-5)
+    for r in results:
+        assert r["score"] == pytest.approx(expected[titles.index(r["metadata"]["title"])], abs=1e-5)
+
+    # 不重排时分数来自 int8 编码，只是近似
+    approx = rag_retrieval.search(query, top_k=3, hybrid=False, exact_rerank=False)
+    for r in approx:
+        assert r["score"] == pytest.approx(expected[titles.index(r["metadata"]["title"])], abs=0.05)
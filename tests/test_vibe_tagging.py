@@ -0,0 +1,104 @@
+"""ingest 的千帆打标签客户端：指向本地 OpenAI 兼容替身服务，检查连接复用、超时、重试与解析。"""
+import functools
+
+import pytest
+from openai import APITimeoutError
+
+import ingest
+import vibe_tagger
+from conftest import chat_completion
+
+
+@pytest.fixture
+def tagging(stub_server, monkeypatch, tmp_path):
+    monkeypatch.setattr(ingest, "QIANFAN_BASE_URL", stub_server.url + "/v1")
+    monkeypatch.setattr(ingest, "_qianfan_client", None)
+    monkeypatch.setattr(ingest, "VIBE_CACHE_PATH", str(tmp_path / "vibes.sqlite"))
+    monkeypatch.setattr(ingest, "TAG_RATE_PER_SEC", 1000.0)
+    monkeypatch.setattr(ingest, "TAG_WORKERS", 1)
+    # 退避间隔缩短到毫秒级，测试不必真的等
+    monkeypatch.setattr(
+        vibe_tagger, "call_with_retry", functools.partial(vibe_tagger.call_with_retry, base_delay=0.001)
+    )
+    return stub_server
+
+
+def test_request_city_vibes_parses_and_reuses_connection(tagging):
+    tagging.respond = lambda r: (200, chat_completion('["浪漫", " 美食 ", 3, ""]'))
+    for _ in range(3):
+        assert ingest.request_city_vibes("Walking along the Seine", "paris") == ["浪漫", "美食"]
+
+    assert [r["path"] for r in tagging.requests] == ["/v1/chat/completions"] * 3
+    assert tagging.requests[0]["json"]["model"] == ingest.TAG_MODEL
+    assert "paris" in tagging.requests[0]["json"]["messages"][1]["content"]
+    assert len(tagging.ports) == 1  # 三次请求走同一条 keep-alive 连接
+
+
+@pytest.mark.parametrize("content", ["这座城市很浪漫", '{"vibes": ["浪漫"]}'])
+def test_request_city_vibes_unparseable_output(tagging, content):
+    tagging.respond = lambda r: (200, chat_completion(content))
+    with pytest.raises(ValueError):
+        ingest.request_city_vibes("text", "paris")
+    assert ingest.extract_city_vibes("text", "paris") == []
+
+
+def test_request_timeout_is_not_retried_by_sdk(tagging, monkeypatch):
+    monkeypatch.setattr(ingest, "TAG_TIMEOUT", 0.2)
+    tagging.delay = 1.0
+    tagging.respond = lambda r: (200, chat_completion('["浪漫"]'))
+    with pytest.raises(APITimeoutError):
+        ingest.request_city_vibes("text", "paris")
+    assert len(tagging.requests) == 1
+
+
+def test_extract_vibes_batch_retries_transient_errors_then_caches(tagging):
+    def respond(request):
+        if len(tagging.requests) <= 2:
+            return 500, {"error": {"message": "busy"}}
+        return 200, chat_completion('["夜景好看"]')
+
+    tagging.respond = respond
+    items = [("Night view from the bridge", "paris"), ("Night view from the bridge", "paris"), ("Old town", "rome")]
+    assert ingest.extract_vibes_batch(items) == [["夜景好看"]] * 3
+    assert len(tagging.requests) == 4  # 两次 500 + 两条不同内容各成功一次
+
+    assert ingest.extract_vibes_batch(items) == [["夜景好看"]] * 3
+    assert len(tagging.requests) == 4  # 全部命中磁盘缓存
+
+
+def test_extract_vibes_batch_gives_up_on_auth_errors_without_caching(tagging):
+    tagging.respond = lambda r: (401, {"error": {"message": "bad key"}})
+    assert ingest.extract_vibes_batch([("text", "paris")]) == [[]]
+    assert len(tagging.requests) == 1  # 鉴权失败不重试
+
+    tagging.respond = lambda r: (200, chat_completion('["浪漫"]'))
+    assert ingest.extract_vibes_batch([("text", "paris")]) == [["浪漫"]]  # 失败结果没有写进缓存
+
+
+def test_unparseable_output_is_not_cached(tagging):
+    tagging.respond = lambda r: (200, chat_completion("这座城市很浪漫"))
+    assert ingest.extract_vibes_batch([("text", "paris")]) == [[]]
+    assert len(tagging.requests) == 1  # 解析失败不重试
+
+    tagging.respond = lambda r: (200, chat_completion('["浪漫"]'))
+    assert ingest.extract_vibes_batch([("text", "paris")]) == [["浪漫"]]
+
+
+def test_every_attempt_takes_a_token():
+    class CountingBucket:
+        taken = 0
+
+        def acquire(self):
+            self.taken += 1
+
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionError("busy")
+        return "ok"
+
+    bucket = CountingBucket()
+    assert vibe_tagger.call_with_retry(flaky, retries=4, base_delay=0.001, bucket=bucket) == "ok"
+    assert bucket.taken == len(calls) == 3
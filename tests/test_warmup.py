@@ -0,0 +1,72 @@
+"""启动预热：每个进程只在后台预热一次，readiness / wait_ready 反映进度；检索端预热加载模型和向量库。"""
+import threading
+
+import pytest
+
+import rag_qianfan
+import rag_retrieval
+
+
+@pytest.fixture
+def warmup(monkeypatch):
+    """把预热状态重置为 cold，检索 / 重排预热换成计数的替身。"""
+    monkeypatch.setattr(rag_qianfan, "_warmup", {"state": "cold", "error": None, "timings": {}})
+    monkeypatch.setattr(rag_qianfan, "_warmup_done", threading.Event())
+    monkeypatch.setattr(rag_qianfan, "_retrieval_client", None)
+    monkeypatch.setattr(rag_qianfan, "RERANK", True)
+    calls = []
+    release = threading.Event()
+
+    def fake_retrieval():
+        calls.append("retrieval")
+        release.wait(5)
+        return {"embedder_ms": 1.0, "index_ms": 2.0, "first_query_ms": 3.0}
+
+    monkeypatch.setattr(rag_qianfan, "warm_up_retrieval", fake_retrieval)
+    monkeypatch.setattr(rag_qianfan, "warm_up_reranker", lambda: calls.append("reranker") or True)
+    return calls, release
+
+
+def test_warms_up_once_in_background(warmup):
+    calls, release = warmup
+    assert rag_qianfan.readiness()["state"] == "cold"
+    assert not rag_qianfan.wait_ready(0)
+
+    assert rag_qianfan.start_warmup()
+    assert not rag_qianfan.start_warmup()  # 其它会话再调用不会重复加载
+    assert rag_qianfan.readiness() == {"ready": False, "state": "loading", "error": None, "timings": {}}
+    assert not rag_qianfan.wait_ready(0.05)
+
+    release.set()
+    assert rag_qianfan.wait_ready(5)
+    status = rag_qianfan.readiness()
+    assert status["ready"] and status["state"] == "ready"
+    assert set(status["timings"]) == {"embedder_ms", "index_ms", "first_query_ms", "reranker_ms", "total_ms"}
+    assert calls == ["retrieval", "reranker"]
+    assert not rag_qianfan.start_warmup()
+
+
+def test_failed_warmup_reports_error(warmup, monkeypatch):
+    def broken():
+        raise FileNotFoundError("vector_store/index.faiss")
+
+    monkeypatch.setattr(rag_qianfan, "warm_up_retrieval", broken)
+    rag_qianfan.start_warmup()
+    assert not rag_qianfan.wait_ready(5)
+    status = rag_qianfan.readiness()
+    assert status["state"] == "error" and "index.faiss" in status["error"]
+    assert "total_ms" in status["timings"]
+
+
+def test_retrieval_warm_up_loads_model_and_store(vector_store, monkeypatch):
+    vector_store.build([("seine", "We walked along the Seine at sunset."), ("louvre", "The Louvre was quiet.")])
+    monkeypatch.chdir(vector_store.dir.parent)  # 默认的 ./vector_store
+    monkeypatch.setattr(rag_retrieval, "_snapshot", None)
+    monkeypatch.setattr(rag_retrieval, "_embedder", vector_store.embedder)
+    rag_retrieval.clear_caches()
+
+    timings = rag_retrieval.warm_up()
+    assert set(timings) == {"embedder_ms", "index_ms", "first_query_ms"}
+    assert rag_retrieval._snapshot is not None
+    assert len(rag_retrieval._snapshot.store) == 2
+    assert rag_retrieval.cache_stats()["results"]["size"] == 0  # 预热不写查询缓存
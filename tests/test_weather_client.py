@@ -0,0 +1,93 @@
+"""weather_client：open-meteo 换成本地替身服务，检查地理编码缓存、预报 TTL 与并发单飞。"""
+import json
+import threading
+import time
+
+import pytest
+
+import weather_client
+from cache import LRUCache
+
+DAILY = {
+    "time": ["2026-10-17"],
+    "temperature_2m_max": [18.0],
+    "temperature_2m_min": [9.0],
+    "precipitation_probability_max": [20],
+}
+
+
+@pytest.fixture
+def weather(stub_server, monkeypatch, tmp_path):
+    monkeypatch.setattr(weather_client, "GEOCODE_URL", stub_server.url + "/v1/search")
+    monkeypatch.setattr(weather_client, "FORECAST_URL", stub_server.url + "/v1/forecast")
+    monkeypatch.setattr(weather_client, "GEOCODE_CACHE_PATH", str(tmp_path / "geocode.json"))
+    monkeypatch.setattr(weather_client, "_geocode_cache", None)
+    monkeypatch.setattr(weather_client, "_forecast_cache", LRUCache(maxsize=16, ttl=0.5))
+
+    def respond(request):
+        if request["path"] == "/v1/search":
+            if request["query"]["name"] == "Atlantis":
+                return 200, {}
+            return 200, {"results": [{"latitude": 48.8566, "longitude": 2.3522}]}
+        return 200, {"daily": DAILY}
+
+    stub_server.respond = respond
+    return stub_server
+
+
+def paths(stub):
+    return [r["path"] for r in stub.requests]
+
+
+def test_geocode_is_cached_on_disk(weather, tmp_path):
+    assert weather_client.geocode("Paris") == (48.8566, 2.3522)
+    assert weather_client.geocode("  paris ") == (48.8566, 2.3522)
+    assert paths(weather) == ["/v1/search"]
+
+    # 新进程：从磁盘读回缓存，仍然不请求上游
+    weather_client._geocode_cache = None
+    assert weather_client.geocode("PARIS") == (48.8566, 2.3522)
+    assert paths(weather) == ["/v1/search"]
+    assert json.loads((tmp_path / "geocode.json").read_text(encoding="utf-8")) == {"paris": [48.8566, 2.3522]}
+
+
+def test_geocode_unknown_city_is_not_cached(weather):
+    assert weather_client.geocode("Atlantis") is None
+    assert weather_client.geocode("Atlantis") is None
+    assert paths(weather) == ["/v1/search", "/v1/search"]
+
+
+def test_forecast_is_cached_for_ttl(weather):
+    for _ in range(3):
+        assert weather_client.get_forecast(48.8566, 2.3522, "2026-10-17", "2026-10-23") == DAILY
+    assert paths(weather) == ["/v1/forecast"]
+    assert len(weather.ports) == 1
+
+    # 日期范围不同是另一个 key
+    weather_client.get_forecast(48.8566, 2.3522, "2026-10-18", "2026-10-24")
+    assert paths(weather) == ["/v1/forecast"] * 2
+
+    time.sleep(0.6)  # 超过 TTL 后重新请求
+    weather_client.get_forecast(48.8566, 2.3522, "2026-10-17", "2026-10-23")
+    assert paths(weather) == ["/v1/forecast"] * 3
+
+
+def test_concurrent_calls_share_one_upstream_request(weather):
+    weather.delay = 0.3  # 让第一个请求在途时其余线程都已经到达
+    barrier = threading.Barrier(8)
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(weather_client.get_weather_summary("Paris"))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(set(results)) == 1
+    assert "2026-10-17: 最高 18.0°C / 最低 9.0°C" in results[0]
+    assert sorted(paths(weather)) == ["/v1/forecast", "/v1/search"]
+    assert weather_client._key_locks == {}  # 请求结束后单飞锁被回收
@@ -1,122 +1,299 @@
+import atexit
+import os
 import sqlite3
+import threading
+from contextlib import contextmanager
 
-DB_PATH = "trips.db"
+from metrics import timed
 
+DB_PATH = os.getenv("TRIPS_DB_PATH", "trips.db")
 
-def get_conn():
-    return sqlite3.connect(DB_PATH)
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",  # 读写互不阻塞，多个会话同时写也不容易 "database is locked"
+    "PRAGMA synchronous=NORMAL",  # WAL 下 NORMAL 足够安全，且省掉每次提交的 fsync
+    "PRAGMA cache_size=-8000",  # 8MB 页缓存
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+# ======================
+# 连接池：Streamlit 每次 rerun 都换一个新的脚本线程，按线程缓存的连接只能用一次 rerun，
+# 所以连接放在进程级的池里，每次操作借出、用完归还，跨 rerun / 会话复用
+# ======================
+POOL_SIZE = 8  # 池里最多保留的空闲连接数；并发更高时临时新建，归还时多出的直接关闭
+
+_pool: dict = {}  # DB_PATH -> 空闲连接列表（后进先出，最近用过的页缓存更热）
+_pool_lock = threading.Lock()
+# 当前线程借出的连接与事务嵌套深度：同一线程里的嵌套调用共用一个连接
+_local = threading.local()
+
+
+def _open_conn():
+    # isolation_level=None：自己用 BEGIN/COMMIT 控制事务边界；
+    # check_same_thread=False：连接会在不同线程间流转，但同一时刻只借给一个线程
+    conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None, check_same_thread=False)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+@contextmanager
+def connection():
+    """从池里借一个连接，退出时归还；已经借了连接的线程（嵌套调用）直接复用。"""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        yield conn
+        return
+
+    path = DB_PATH
+    with _pool_lock:
+        idle = _pool.get(path)
+        conn = idle.pop() if idle else None
+    if conn is None:
+        conn = _open_conn()
+    _local.conn = conn
+    try:
+        yield conn
+    finally:
+        _local.conn = None
+        with _pool_lock:
+            idle = _pool.setdefault(path, [])
+            if len(idle) < POOL_SIZE:
+                idle.append(conn)
+                conn = None
+        if conn is not None:
+            conn.close()
+
+
+def close_all():
+    """关闭池里所有空闲连接（进程退出时自动调用）。"""
+    with _pool_lock:
+        conns = [c for idle in _pool.values() for c in idle]
+        _pool.clear()
+    for conn in conns:
+        conn.close()
+
+
+atexit.register(close_all)
+
+
+@contextmanager
+def transaction():
+    """
+    写事务：BEGIN IMMEDIATE 一开始就拿写锁，避免读后升级写锁时的死锁；
+    嵌套调用时复用外层事务，多次写入只提交一次。
+    """
+    with connection() as conn:
+        depth = getattr(_local, "tx_depth", 0)
+        if depth:
+            _local.tx_depth = depth + 1
+            try:
+                yield conn.cursor()
+            finally:
+                _local.tx_depth = depth
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        _local.tx_depth = 1
+        try:
+            yield conn.cursor()
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            _local.tx_depth = 0
 
 
 def init_db():
-    conn = get_conn()
-    cur = conn.cursor()
+    with transaction() as cur:
+        cur.execute(
+            """
+        CREATE TABLE IF NOT EXISTS trips(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            city TEXT,
+            start_date TEXT,
+            end_date TEXT,
+            title TEXT
+        );
+        """
+        )
+
+        cur.execute(
+            """
+        CREATE TABLE IF NOT EXISTS items(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            trip_id INTEGER,
+            name TEXT,
+            day TEXT,
+            time TEXT,
+            note TEXT,
+            FOREIGN KEY(trip_id) REFERENCES trips(id)
+        );
+        """
+        )
+
+        migrate(cur)
 
+
+# ======================
+# 结构迁移：按 PRAGMA user_version 逐个执行，已执行过的跳过
+# ======================
+def _migration_1(cur):
+    """给 trips(city, start_date, end_date) 加唯一约束，给 items(trip_id) 加索引。"""
+    # 先合并历史上重复的行程：收藏项挂到最早的那条上，再删掉多余的
     cur.execute(
         """
-    CREATE TABLE IF NOT EXISTS trips(
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        city TEXT,
-        start_date TEXT,
-        end_date TEXT,
-        title TEXT
-    );
-    """
+        UPDATE items SET trip_id = (
+            SELECT MIN(t2.id) FROM trips t1 JOIN trips t2
+              ON t2.city IS t1.city
+             AND t2.start_date IS t1.start_date
+             AND t2.end_date IS t1.end_date
+            WHERE t1.id = items.trip_id
+        )
+        WHERE trip_id IN (SELECT id FROM trips)
+        """
     )
-
     cur.execute(
         """
-    CREATE TABLE IF NOT EXISTS items(
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        trip_id INTEGER,
-        name TEXT,
-        day TEXT,
-        time TEXT,
-        note TEXT,
-        FOREIGN KEY(trip_id) REFERENCES trips(id)
-    );
-    """
+        DELETE FROM trips WHERE id NOT IN (
+            SELECT MIN(id) FROM trips GROUP BY city, start_date, end_date
+        )
+        """
+    )
+    cur.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS trips_city_dates "
+        "ON trips(city, start_date, end_date)"
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS items_trip_id ON items(trip_id, id)")
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS trips_start_date ON trips(start_date DESC, id DESC)"
     )
 
-    conn.commit()
-    conn.close()
 
+MIGRATIONS = [_migration_1]
 
-def create_or_get_trip(city: str, start_date: str, end_date: str) -> int:
-    """根据城市+日期获取已有行程，否则创建一个新行程并返回 id"""
-    conn = get_conn()
-    cur = conn.cursor()
 
-    cur.execute(
-        "SELECT id FROM trips WHERE city=? AND start_date=? AND end_date=?",
-        (city, start_date, end_date),
-    )
-    row = cur.fetchone()
+def migrate(cur):
+    (version,) = cur.execute("PRAGMA user_version").fetchone()
+    for i, step in enumerate(MIGRATIONS[version:], start=version + 1):
+        step(cur)
+        cur.execute(f"PRAGMA user_version={i}")
 
+
+@timed("sqlite")
+def create_or_get_trip(city: str, start_date: str, end_date: str) -> int:
+    """根据城市+日期获取已有行程，否则创建一个新行程并返回 id"""
+    # 常见情况是行程已存在（每次 rerun 都会调用），先不拿写锁直接读
+    with connection() as conn:
+        row = conn.execute(
+            "SELECT id FROM trips WHERE city=? AND start_date=? AND end_date=?",
+            (city, start_date, end_date),
+        ).fetchone()
     if row:
-        trip_id = row[0]
-    else:
-        title = f"{city} 行程（{start_date}）"
+        return row[0]
+
+    # 唯一约束保证并发会话同时创建时也只会有一条
+    title = f"{city} 行程（{start_date}）"
+    with transaction() as cur:
         cur.execute(
-            "INSERT INTO trips (city, start_date, end_date, title) VALUES (?, ?, ?, ?)",
+            "INSERT INTO trips (city, start_date, end_date, title) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(city, start_date, end_date) DO NOTHING",
             (city, start_date, end_date, title),
         )
-        conn.commit()
-        trip_id = cur.lastrowid
-
-    conn.close()
-    return trip_id
+        cur.execute(
+            "SELECT id FROM trips WHERE city=? AND start_date=? AND end_date=?",
+            (city, start_date, end_date),
+        )
+        return cur.fetchone()[0]
 
 
+@timed("sqlite")
 def add_item(trip_id: int, name: str, day: str, time: str):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO items (trip_id, name, day, time, note) VALUES (?, ?, ?, ?, ?)",
-        (trip_id, name, day, time, ""),
-    )
-    conn.commit()
-    conn.close()
+    with transaction() as cur:
+        cur.execute(
+            "INSERT INTO items (trip_id, name, day, time, note) VALUES (?, ?, ?, ?, ?)",
+            (trip_id, name, day, time, ""),
+        )
+
+
+@timed("sqlite")
+def add_items(trip_id: int, items):
+    """批量收藏：items 为 [(name, day, time), ...]，一个事务内写完。"""
+    with transaction() as cur:
+        cur.executemany(
+            "INSERT INTO items (trip_id, name, day, time, note) VALUES (?, ?, ?, ?, ?)",
+            [(trip_id, name, day, time, "") for name, day, time in items],
+        )
 
 
+@timed("sqlite")
 def get_all_trips():
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT id, city, start_date, end_date, title FROM trips "
-        "ORDER BY start_date DESC, id DESC"
-    )
-    trips = cur.fetchall()
-    conn.close()
-    return trips
+    with connection() as conn:
+        return conn.execute(
+            "SELECT id, city, start_date, end_date, title FROM trips "
+            "ORDER BY start_date DESC, id DESC"
+        ).fetchall()
 
 
+@timed("sqlite")
+def count_trips() -> int:
+    with connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM trips").fetchone()[0]
+
+
+@timed("sqlite")
+def get_trips_with_items(limit: int = 20, offset: int = 0):
+    """
+    一次查询取出一页行程及其全部收藏项（替代 get_all_trips + 每个行程一次 get_items）。
+    返回 [((id, city, start_date, end_date, title), [(item_id, name, day, time, note), ...]), ...]，
+    行程顺序与 get_all_trips 相同。
+    """
+    with connection() as conn:
+        rows = conn.execute(
+            """
+            WITH page AS (
+                SELECT id, city, start_date, end_date, title FROM trips
+                ORDER BY start_date DESC, id DESC
+                LIMIT ? OFFSET ?
+            )
+            SELECT p.id, p.city, p.start_date, p.end_date, p.title,
+                   i.id, i.name, i.day, i.time, i.note
+            FROM page p LEFT JOIN items i ON i.trip_id = p.id
+            ORDER BY p.start_date DESC, p.id DESC, i.id ASC
+            """,
+            (limit, offset),
+        ).fetchall()
+    result = []
+    for row in rows:
+        trip, item = row[:5], row[5:]
+        if not result or result[-1][0][0] != trip[0]:
+            result.append((trip, []))
+        if item[0] is not None:
+            result[-1][1].append(item)
+    return result
+
+
+@timed("sqlite")
 def get_items(trip_id: int):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT id, name, day, time, note FROM items WHERE trip_id=? ORDER BY id ASC",
-        (trip_id,),
-    )
-    items = cur.fetchall()
-    conn.close()
-    return items
+    with connection() as conn:
+        return conn.execute(
+            "SELECT id, name, day, time, note FROM items WHERE trip_id=? ORDER BY id ASC",
+            (trip_id,),
+        ).fetchall()
 
 
+@timed("sqlite")
 def delete_item(item_id: int):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM items WHERE id=?", (item_id,))
-    conn.commit()
-    conn.close()
+    with transaction() as cur:
+        cur.execute("DELETE FROM items WHERE id=?", (item_id,))
 
 
+@timed("sqlite")
 def update_note(item_id: int, note: str):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("UPDATE items SET note=? WHERE id=?", (note, item_id))
-    conn.commit()
-    conn.close()
+    with transaction() as cur:
+        cur.execute("UPDATE items SET note=? WHERE id=?", (note, item_id))
 
 
 # 初始化数据库
-init_db()
\ No newline at end of file
+init_db()
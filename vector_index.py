@@ -0,0 +1,174 @@
+# vector_index.py
+"""
+FAISS 索引工厂：Flat / IVF-Flat / IVF-PQ / HNSW，外面统一包一层 IndexIDMap2，
+ingest 负责构建，rag_retrieval 通过 make_search_params 传入查询期参数。
+
+metric="cosine" 时向量先做 L2 归一化、用内积索引，score 即余弦相似度（越大越相似，
+不同查询之间可比）；sq="fp16" / "int8" 时用标量量化存储（每条 384 维向量 768B / 384B，
+原来 float32 是 1.5KB），精度损失可在查询时用 embeddings.npy 的原始向量重排找回。
+"""
+import math
+
+import numpy as np
+import faiss
+
+INDEX_KINDS = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+METRICS = ("l2", "cosine")
+SQ_TYPES = {
+    "fp16": faiss.ScalarQuantizer.QT_fp16,
+    "int8": faiss.ScalarQuantizer.QT_8bit,
+}
+
+
+def default_nlist(n: int) -> int:
+    """IVF 聚类中心数：经验值 4*sqrt(n)，并保证每个中心至少约 39 个训练样本。"""
+    nlist = int(4 * math.sqrt(max(n, 1)))
+    return max(1, min(nlist, n // 39 or 1))
+
+
+def build_index(
+    embeddings,
+    ids=None,
+    kind: str = "flat",
+    nlist: int | None = None,
+    pq_m: int = 16,
+    pq_nbits: int = 8,
+    hnsw_m: int = 32,
+    ef_construction: int = 200,
+    metric: str = "l2",
+    sq: str | None = None,
+    train_size: int = 50000,
+    add_block: int = 65536,
+    seed: int = 0,
+):
+    """
+    根据 kind 构建索引并加入向量，返回 IndexIDMap2。
+    - metric：l2（欧式距离）或 cosine（归一化后内积）；
+    - sq：fp16 / int8 标量量化存储，None 为 float32（ivf_pq 自带量化，不支持 sq）；
+    - 需要训练的索引（IVF 系列、int8）只在最多 train_size 条随机样本上训练；
+    - 按 add_block 分块 add，embeddings 可以是 np.memmap。
+    """
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"Unknown index kind: {kind}，可选 {INDEX_KINDS}")
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric: {metric}，可选 {METRICS}")
+    if sq is not None and sq not in SQ_TYPES:
+        raise ValueError(f"Unknown sq: {sq}，可选 {tuple(SQ_TYPES)}")
+    if sq is not None and kind == "ivf_pq":
+        raise ValueError("ivf_pq 已经是乘积量化，不能再叠加 sq")
+
+    n, dim = embeddings.shape
+    if ids is None:
+        ids = np.arange(n, dtype=np.int64)
+
+    mt = faiss.METRIC_INNER_PRODUCT if metric == "cosine" else faiss.METRIC_L2
+    qtype = SQ_TYPES.get(sq)
+    if kind == "flat":
+        base = faiss.IndexFlat(dim, mt) if qtype is None else faiss.IndexScalarQuantizer(dim, qtype, mt)
+    elif kind in ("ivf_flat", "ivf_pq"):
+        nlist = nlist or default_nlist(n)
+        quantizer = faiss.IndexFlat(dim, mt)
+        if kind == "ivf_flat" and qtype is None:
+            base = faiss.IndexIVFFlat(quantizer, dim, nlist, mt)
+        elif kind == "ivf_flat":
+            base = faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, qtype, mt)
+        else:
+            if dim % pq_m != 0:
+                raise ValueError(f"pq_m={pq_m} 必须整除向量维度 {dim}")
+            # 样本太少时降低每个子量化器的码本大小
+            while pq_nbits > 4 and 2**pq_nbits > n:
+                pq_nbits -= 1
+            base = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, pq_nbits, mt)
+    else:
+        if qtype is None:
+            base = faiss.IndexHNSWFlat(dim, hnsw_m, mt)
+        else:
+            base = faiss.IndexHNSWSQ(dim, qtype, hnsw_m, mt)
+        base.hnsw.efConstruction = ef_construction
+
+    if not base.is_trained:
+        rng = np.random.default_rng(seed)
+        sample_idx = np.sort(rng.choice(n, size=min(n, train_size), replace=False))
+        sample = prepare_vectors(base, embeddings[sample_idx])
+        print(f"Training {kind} index on {len(sample)} vectors...")
+        base.train(sample)
+
+    index = faiss.IndexIDMap2(base)
+    for start in range(0, n, add_block):
+        end = min(start + add_block, n)
+        add_vectors(index, embeddings[start:end], ids[start:end])
+
+    return index
+
+
+def is_cosine(index) -> bool:
+    return index.metric_type == faiss.METRIC_INNER_PRODUCT
+
+
+def prepare_vectors(index, x) -> np.ndarray:
+    """转成连续 float32（总是拷贝一份）；余弦索引再做 L2 归一化。查询向量也要经过这里。"""
+    x = np.array(x, dtype=np.float32, order="C")
+    if is_cosine(index):
+        faiss.normalize_L2(x)
+    return x
+
+
+def add_vectors(index, x, ids):
+    index.add_with_ids(prepare_vectors(index, x), np.asarray(ids, dtype=np.int64))
+
+
+def exact_scores(index, qvec: np.ndarray, vecs: np.ndarray) -> np.ndarray:
+    """
+    单条查询对一组原始 float32 向量重算分数，与索引同一度量：余弦索引为内积（越大越好），
+    L2 索引为平方欧式距离（越小越好，与 faiss 返回的一致）。qvec 需已经过 prepare_vectors。
+    """
+    vecs = prepare_vectors(index, vecs)
+    if is_cosine(index):
+        return vecs @ qvec
+    return ((vecs - qvec) ** 2).sum(axis=1)
+
+
+def base_index(index):
+    """取出 IDMap 包装下的实际索引。"""
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def supports_remove(index) -> bool:
+    """HNSW 不支持按 id 删除，增量更新时需要整体重建。"""
+    return not isinstance(base_index(index), faiss.IndexHNSW)
+
+
+def make_search_params(index, nprobe: int | None = None, ef_search: int | None = None, sel=None):
+    """
+    组装查询期参数：IVF 用 nprobe，HNSW 用 efSearch，sel 为可选的 IDSelector。
+    都没给时返回 None，走索引自身的默认值。
+    """
+    base = base_index(index)
+    kwargs = {}
+    if sel is not None:
+        kwargs["sel"] = sel
+
+    if isinstance(base, faiss.IndexIVF):
+        if nprobe is not None:
+            kwargs["nprobe"] = int(nprobe)
+        return faiss.SearchParametersIVF(**kwargs) if kwargs else None
+    if isinstance(base, faiss.IndexHNSW):
+        if ef_search is not None:
+            kwargs["efSearch"] = int(ef_search)
+        return faiss.SearchParametersHNSW(**kwargs) if kwargs else None
+    return faiss.SearchParameters(**kwargs) if kwargs else None
+
+
+def exhaustive_params(index, sel=None):
+    """
+    过滤检索时近似索引可能凑不满 k 个结果（IVF 探测的桶里候选不够、HNSW 图被过滤截断），
+    此时用穷举参数再查一次：IVF 探测全部桶，HNSW 放大 efSearch。
+    """
+    base = base_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        return make_search_params(index, nprobe=base.nlist, sel=sel)
+    if isinstance(base, faiss.IndexHNSW):
+        return make_search_params(index, ef_search=max(1024, base.hnsw.efSearch), sel=sel)
+    return None
@@ -0,0 +1,163 @@
+# vibe_tagger.py
+"""
+并发打标签的基础设施：令牌桶限流、指数退避重试、按内容哈希的磁盘缓存。
+ingest.build_chunks 用它来批量调用千帆抽取 vibes。
+"""
+import hashlib
+import json
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from tqdm import tqdm
+
+
+class TokenBucket:
+    """简单的线程安全令牌桶：每秒补充 rate 个令牌，最多攒 capacity 个。"""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._last) * self.rate
+                )
+                self._last = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def call_with_retry(
+    fn,
+    *args,
+    retries: int = 4,
+    base_delay: float = 1.0,
+    max_delay: float = 30.0,
+    retry_on: tuple = (Exception,),
+    bucket: TokenBucket | None = None,
+    **kwargs,
+):
+    """
+    失败时按 base_delay * 2^n（带抖动）退避重试，超过 retries 次后抛出最后一次异常。
+    bucket：给出时每次尝试（包括重试）前先取一个令牌，429 / 超时后的重试同样受限流约束。
+    """
+    for attempt in range(retries + 1):
+        if bucket is not None:
+            bucket.acquire()
+        try:
+            return fn(*args, **kwargs)
+        except retry_on as e:
+            if attempt == retries:
+                raise
+            delay = min(max_delay, base_delay * (2**attempt))
+            delay *= 0.5 + random.random() / 2
+            print(f"[retry {attempt + 1}/{retries}] {e!r}，{delay:.1f}s 后重试")
+            time.sleep(delay)
+
+
+class VibeCache:
+    """
+    基于 SQLite 的 vibes 缓存，key 为 (namespace, city, text) 的 sha256。
+    namespace 一般是模型名，换模型后自动失效。
+    """
+
+    def __init__(self, path: str, namespace: str = ""):
+        self.path = path
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vibes(key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self._conn.commit()
+
+    def key(self, text: str, city: str) -> str:
+        raw = "\0".join([self.namespace, city, text])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM vibes WHERE key=?", (key,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, vibes: list[str]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO vibes (key, value) VALUES (?, ?)",
+                (key, json.dumps(vibes, ensure_ascii=False)),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def tag_all(
+    items: list[tuple[str, str]],
+    tag_fn,
+    cache: VibeCache | None = None,
+    max_workers: int = 8,
+    rate_per_sec: float = 5.0,
+    retries: int = 4,
+    retry_on: tuple = (Exception,),
+) -> list[list[str]]:
+    """
+    对 [(text, city), ...] 批量打标签，返回与输入等长的 vibes 列表。
+    - 命中缓存的直接返回，不再请求模型；
+    - 同一批里内容相同的只请求一次；
+    - 其余请求在线程池里并发执行，带重试，每次尝试都受令牌桶限流；
+    - 重试仍失败（或 tag_fn 抛出其他异常，比如模型输出无法解析）的条目返回 []，
+      且不写缓存，下次重建时会再试。
+    """
+    results: list[list[str] | None] = [None] * len(items)
+    pending: dict[str, list[int]] = {}
+
+    for i, (text, city) in enumerate(items):
+        key = cache.key(text, city) if cache else str(i)
+        hit = cache.get(key) if cache else None
+        if hit is not None:
+            results[i] = hit
+        else:
+            pending.setdefault(key, []).append(i)
+
+    print(f"Vibe tagging: {len(items) - sum(map(len, pending.values()))} cached, "
+          f"{len(pending)} to request")
+
+    bucket = TokenBucket(rate_per_sec)
+
+    def work(idx: int):
+        text, city = items[idx]
+        return call_with_retry(
+            tag_fn, text, city, retries=retries, retry_on=retry_on, bucket=bucket
+        )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        futures = {ex.submit(work, idxs[0]): key for key, idxs in pending.items()}
+        for fut in tqdm(as_completed(futures), total=len(futures), desc="Tagging vibes"):
+            key = futures[fut]
+            try:
+                vibes = fut.result()
+                if cache:
+                    cache.set(key, vibes)
+            except Exception as e:
+                print("extract_city_vibes error:", e)
+                vibes = []
+            for i in pending[key]:
+                results[i] = vibes
+
+    return results
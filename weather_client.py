@@ -0,0 +1,195 @@
+# weather_client.py
+"""
+open-meteo 天气客户端：
+- 共用一个带连接池的 requests.Session；
+- 城市 -> 经纬度 永久缓存在磁盘（GEOCODE_CACHE_PATH）；
+- 预报按 (lat, lon, 日期范围) 在进程内缓存 FORECAST_TTL 秒；
+- 同一个 key 并发请求时只有一个线程真正访问上游（single-flight）。
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cache import LRUCache
+from metrics import register_source, timed
+
+GEOCODE_URL = os.getenv("GEOCODE_URL", "https://geocoding-api.open-meteo.com/v1/search")
+FORECAST_URL = os.getenv("FORECAST_URL", "https://api.open-meteo.com/v1/forecast")
+GEOCODE_CACHE_PATH = os.getenv("GEOCODE_CACHE_PATH", "./geocode_cache.json")
+FORECAST_TTL = 3600  # 预报每小时更新一次，缓存一小时足够
+REQUEST_TIMEOUT = 5
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    global _session
+    with _session_lock:
+        if _session is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            _session = s
+    return _session
+
+
+# ======================
+# 单飞锁：同一个 key 同时只允许一个线程去请求上游
+# ======================
+# key -> [锁, 持有或等待该锁的线程数]；计数归零时删掉，表不会随查询过的城市 / 日期无限增长
+_key_locks: dict = {}
+_key_locks_guard = threading.Lock()
+
+
+@contextmanager
+def _single_flight(key):
+    with _key_locks_guard:
+        entry = _key_locks.get(key)
+        if entry is None:
+            entry = _key_locks[key] = [threading.Lock(), 0]
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _key_locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _key_locks[key]
+
+
+# ======================
+# 地理编码（永久磁盘缓存）
+# ======================
+_geocode_cache = None
+_geocode_file_lock = threading.Lock()
+
+
+def _load_geocode_cache() -> dict:
+    global _geocode_cache
+    if _geocode_cache is None:
+        with _geocode_file_lock:  # 并发的首次调用只读一次文件，大家拿到同一个 dict
+            if _geocode_cache is None:
+                try:
+                    with open(GEOCODE_CACHE_PATH, "r", encoding="utf-8") as f:
+                        _geocode_cache = json.load(f)
+                except (FileNotFoundError, json.JSONDecodeError):
+                    _geocode_cache = {}
+    return _geocode_cache
+
+
+def _save_geocode_cache():
+    tmp = GEOCODE_CACHE_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(_geocode_cache, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, GEOCODE_CACHE_PATH)
+
+
+@timed("weather")
+def geocode(city: str):
+    """返回 (lat, lon)；找不到该城市时返回 None。网络错误直接抛出，不写缓存。"""
+    key = " ".join(city.strip().lower().split())
+    cache = _load_geocode_cache()
+    if key in cache:
+        return tuple(cache[key])
+
+    with _single_flight(("geo", key)):
+        if key in cache:  # 等锁期间别的线程已经查到了
+            return tuple(cache[key])
+        resp = get_session().get(
+            GEOCODE_URL,
+            params={"name": city, "count": 1, "language": "en", "format": "json"},
+            timeout=REQUEST_TIMEOUT,
+        )
+        data = resp.json()
+        if "results" not in data or len(data["results"]) == 0:
+            return None
+        latlon = (data["results"][0]["latitude"], data["results"][0]["longitude"])
+        with _geocode_file_lock:
+            cache[key] = list(latlon)
+            _save_geocode_cache()
+        return latlon
+
+
+# ======================
+# 天气预报（TTL 缓存）
+# ======================
+_forecast_cache = LRUCache(maxsize=1024, ttl=FORECAST_TTL)
+
+
+@timed("weather")
+def get_forecast(lat: float, lon: float, start_date: str, end_date: str):
+    """返回 open-meteo 的 daily 字段；接口无数据时返回 None。"""
+    key = (round(lat, 4), round(lon, 4), start_date, end_date)
+    daily = _forecast_cache.get(key)
+    if daily is not None:
+        return daily
+
+    with _single_flight(("forecast", key)):
+        daily = _forecast_cache.get(key)
+        if daily is not None:
+            return daily
+        resp = get_session().get(
+            FORECAST_URL,
+            params={
+                "latitude": lat,
+                "longitude": lon,
+                "daily": "temperature_2m_max,temperature_2m_min,precipitation_probability_max",
+                "timezone": "auto",
+                "start_date": start_date,
+                "end_date": end_date,
+            },
+            timeout=REQUEST_TIMEOUT,
+        )
+        w = resp.json()
+        if "daily" not in w:
+            return None
+        _forecast_cache.set(key, w["daily"])
+        return w["daily"]
+
+
+def cache_stats() -> dict:
+    return {"geocode_size": len(_load_geocode_cache()), "forecast": _forecast_cache.stats()}
+
+
+register_source("weather", cache_stats)
+
+
+@timed("weather")
+def get_weather_summary(city: str):
+    """
+    统一返回：从今天开始未来 7 天的天气概览
+    """
+    try:
+        today = datetime.today().date()
+        start_date = today.strftime("%Y-%m-%d")
+        end_date = (today + timedelta(days=6)).strftime("%Y-%m-%d")
+
+        latlon = geocode(city)
+        if latlon is None:
+            return "未能找到该城市的天气信息。"
+
+        daily = get_forecast(latlon[0], latlon[1], start_date, end_date)
+        if daily is None:
+            return "天气接口暂无数据。"
+
+        lines = []
+        for date, tmax, tmin, rain in zip(
+            daily["time"],
+            daily["temperature_2m_max"],
+            daily["temperature_2m_min"],
+            daily["precipitation_probability_max"],
+        ):
+            lines.append(f"{date}: 最高 {tmax}°C / 最低 {tmin}°C，降水概率约 {rain}%")
+
+        return "未来 7 天天气概览：\n" + "\n".join(lines)
+
+    except Exception as e:
+        return f"获取天气失败：{e}"